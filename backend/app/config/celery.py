@@ -13,5 +13,44 @@ class CeleryConfig:
 
     broker_connection_retry_on_startup = True
 
+    beat_schedule = {
+        "inventory-flush-stock-writeback": {
+            "task": "inventory.flush_stock_writeback",
+            "schedule": settings.STOCK_WRITEBACK_INTERVAL_SECONDS,
+        },
+        "inventory-reconcile-stock": {
+            "task": "inventory.reconcile_stock",
+            "schedule": settings.STOCK_RECONCILE_INTERVAL_SECONDS,
+        },
+        "inventory-sweep-expired-holds": {
+            "task": "inventory.sweep_expired_holds",
+            "schedule": settings.STOCK_HOLD_SWEEP_INTERVAL_SECONDS,
+        },
+        "inventory-consume-stock-events": {
+            "task": "inventory.consume_stock_events",
+            "schedule": settings.STOCK_EVENT_INTERVAL_SECONDS,
+        },
+        "discounts-settle-usage": {
+            "task": "discounts.settle_usage",
+            "schedule": settings.DISCOUNT_SETTLE_INTERVAL_SECONDS,
+        },
+        "outbox-relay": {
+            "task": "outbox.relay",
+            "schedule": settings.OUTBOX_RELAY_INTERVAL_SECONDS,
+        },
+        "orders-expire-pending": {
+            "task": "orders.expire_pending",
+            "schedule": settings.ORDER_EXPIRE_INTERVAL_SECONDS,
+        },
+        "orders-create-partitions": {
+            "task": "orders.create_partitions",
+            "schedule": settings.ORDER_PARTITION_INTERVAL_SECONDS,
+        },
+        "orders-archive-partitions": {
+            "task": "orders.archive_partitions",
+            "schedule": settings.ORDER_PARTITION_INTERVAL_SECONDS,
+        },
+    }
+
 
 celery_settings = CeleryConfig()
\ No newline at end of file
@@ -58,6 +58,56 @@ class Settings(BaseSettings):
     REDIS_DB_BACKEND: int = 1
     REDIS_DB_CACHE: int = 2
 
+    # Gom delta kho trong bảng stock_delta rồi ghi xuống product_size theo chu kỳ (mỗi transaction tối đa 1 batch)
+    STOCK_WRITEBACK_INTERVAL_SECONDS: float = 2.0
+    STOCK_WRITEBACK_BATCH_SIZE: int = 5000
+
+    # Nạp tồn kho lên Redis lúc khởi động và đối soát định kỳ với Postgres
+    STOCK_SYNC_CHUNK_SIZE: int = 1000
+    STOCK_RECONCILE_INTERVAL_SECONDS: float = 300.0
+
+    # Giữ kho tạm cho phiên checkout
+    STOCK_HOLD_TTL_SECONDS: int = 900
+    STOCK_HOLD_SWEEP_INTERVAL_SECONDS: float = 30.0
+
+    # Phiên checkout đã tính giá (Redis), place_order dùng lại thay vì tính lại
+    CHECKOUT_SESSION_TTL_SECONDS: int = 900
+
+    # Lượt dùng mã giảm giá đếm trên Redis, delta (discount_usage_delta) ghi xuống discount.used_count theo chu kỳ
+    DISCOUNT_SETTLE_INTERVAL_SECONDS: float = 5.0
+    DISCOUNT_SETTLE_BATCH_SIZE: int = 5000
+
+    # Tự huỷ đơn pending quá hạn (chưa xác nhận / chưa chuyển khoản) và hoàn kho theo batch
+    ORDER_PENDING_EXPIRE_HOURS: float = 72.0
+    ORDER_EXPIRE_BATCH_SIZE: int = 200
+    ORDER_EXPIRE_INTERVAL_SECONDS: float = 600.0
+    # Hoàn kho / trả lượt mã trên Redis của đơn đã huỷ (orders.release_reservations): key đánh dấu release_id
+    # giữ đủ lâu để outbox gửi trùng / task retry không hoàn 2 lần
+    RESERVATION_RELEASE_MARKER_TTL_SECONDS: int = 604800
+
+    # Sự kiện ngưỡng tồn kho (Redis Stream) và worker xử lý theo batch
+    STOCK_LOW_THRESHOLD: int = 5
+    STOCK_EVENT_STREAM_MAXLEN: int = 10000
+    STOCK_EVENT_BATCH_SIZE: int = 500
+    STOCK_EVENT_INTERVAL_SECONDS: float = 1.0
+
+    # Idempotency-Key cho các API tạo/chuyển trạng thái đơn
+    IDEMPOTENCY_TTL_SECONDS: int = 3600
+    IDEMPOTENCY_LOCK_TTL_SECONDS: int = 60  # bản ghi "processing", được gia hạn mỗi 1/3 TTL khi handler còn chạy
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+
+    # Transactional outbox: relay đẩy task của đơn hàng lên Celery theo batch
+    OUTBOX_RELAY_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_RELAY_BATCH_SIZE: int = 500
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETENTION_HOURS: int = 24
+
+    # Partition theo tháng của order / order_item: tạo trước các tháng tới, lưu trữ partition cũ
+    ORDER_PARTITION_MONTHS_AHEAD: int = 3
+    ORDER_PARTITION_INTERVAL_SECONDS: float = 86400.0
+    ORDER_ARCHIVE_AFTER_MONTHS: int = 12
+    ORDER_ARCHIVE_TABLESPACE: str | None = None
+
     @property
     def redis_url_broker(self) -> str:
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB_BROKER}"
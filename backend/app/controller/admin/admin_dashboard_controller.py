@@ -2,6 +2,9 @@ from fastapi import APIRouter, Depends, Query, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...config.db import get_db
 from ...services.admin.admin_dashboard_service import admin_dashboard_service
+from ...services.common.inventory_service import inventory_service
+from ...schemas.product import StockShardingUpdate, StockShardingResponse
+from ...utils.task_dispatcher import task_dispatcher
 
 router = APIRouter(
     prefix="/admin/dashboard",
@@ -114,4 +117,61 @@ async def carriers(db: AsyncSession = Depends(get_db)):
     - Số lượng đơn hàng phụ trách.
     - Tỷ lệ phần trăm trên tổng số đơn toàn hệ thống.
     """
-    return await admin_dashboard_service.get_carrier_stats(db)
\ No newline at end of file
+    return await admin_dashboard_service.get_carrier_stats(db)
+
+
+@router.get("/inventory-writeback")
+async def inventory_writeback(db: AsyncSession = Depends(get_db)):
+    """
+    **Theo dõi worker ghi kho (write-back) từ bảng stock_delta xuống product_size.**
+
+    ### Kết quả trả về:
+    - `pending_sizes`, `pending_rows`, `pending_lag_ms`: Số size / dòng delta đang chờ ghi và thời gian chờ của delta cũ nhất.
+    - `last_flush_lag_ms`, `max_flush_lag_ms`: Độ trễ của lần flush gần nhất / lớn nhất.
+    - `flush_count`: Tổng số lần flush thành công.
+    """
+    return await inventory_service.get_writeback_metrics(db)
+
+
+
+@router.get("/inventory-reconcile")
+async def inventory_reconcile():
+    """
+    **Kết quả đối soát tồn kho Redis với Database lần gần nhất.**
+
+    ### Kết quả trả về:
+    - `checked`, `missing`: Số size đã kiểm tra / số key thiếu trên Redis (đã được nạp lại).
+    - `drifted`, `total_abs_drift`: Số size bị lệch và tổng độ lệch.
+    - `repaired`: Số size đã được tự sửa (Redis nhiều hơn kỳ vọng, lệch lặp lại ở 2 lần đối soát liên tiếp).
+    - `needs_review`, `review`: Các size Redis ít hơn kỳ vọng ({size_id: độ lệch}), không tự cộng kho, cần kiểm tra tay.
+    """
+    return await inventory_service.get_reconcile_metrics()
+
+
+@router.get("/task-dispatcher")
+async def task_dispatcher_metrics():
+    """
+    **Theo dõi hàng đợi gửi task Celery của API server (tính riêng cho process đang trả lời).**
+
+    ### Kết quả trả về:
+    - `queue_depth`, `max_queue_depth`: Số task đang chờ publish / lớn nhất từng ghi nhận.
+    - `enqueued`, `published`: Tổng số task đã nhận / đã publish lên broker.
+    - `retried`, `dropped`: Số lần thử lại và số task bị bỏ sau khi thử lại quá số lần.
+    - `last_batch_size`, `last_publish_ms`: Kích thước và thời gian publish của batch gần nhất.
+    """
+    return task_dispatcher.get_metrics()
+
+
+@router.put("/inventory/sizes/{size_id}/shards", response_model=StockShardingResponse)
+async def set_stock_shards(
+    size_id: int,
+    payload: StockShardingUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    **Bật / tắt chia shard tồn kho cho size flash-sale.**
+
+    Tồn kho của size được chia đều ra `shards` key trên Redis để giảm tranh chấp khi nhiều buyer cùng đặt.
+    `shards = 1` gộp các shard về lại 1 key. Tổng tồn kho không thay đổi.
+    """
+    return await inventory_service.set_stock_shards(db, size_id, payload.shards)
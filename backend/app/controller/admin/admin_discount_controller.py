@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Query, status, Body
 from ...middleware.auth import require_admin
-from ...schemas.discount import DiscountCreate, DiscountResponse, DiscountUpdate
+from ...schemas.discount import DiscountBulkCreate, DiscountBulkJobResponse, DiscountCreate, DiscountResponse, DiscountUpdate
 
 from ...services.admin.admin_discount_management_service import AdminDiscountService, get_discount_service
 
@@ -45,6 +45,32 @@ async def admin_create_discount(
     return await service.create(payload)
 
 
+@router.post("/bulk", response_model=DiscountBulkJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def admin_create_discount_bulk(
+    payload: DiscountBulkCreate,
+    service: AdminDiscountService = Depends(get_discount_service)
+):
+    """
+    **Sinh hàng loạt mã giảm giá dùng riêng cho một chiến dịch.**
+
+    Tạo `quantity` mã ngẫu nhiên, không trùng, cùng thông số (mặc định mỗi mã dùng 1 lần).
+    Mã chiến dịch không hiện trong danh sách mã công khai của buyer.
+
+    ### Lưu ý:
+    - Việc sinh mã chạy nền, theo dõi bằng `GET /admin/discounts/bulk/{job_id}`
+    - Khi `status` = `done`, tải danh sách mã (CSV) qua `download_url`
+    """
+    return await service.create_bulk(payload)
+
+
+@router.get("/bulk/{job_id}", response_model=DiscountBulkJobResponse)
+async def admin_get_discount_bulk_job(
+    job_id: str,
+    service: AdminDiscountService = Depends(get_discount_service)
+):
+    """Trạng thái job sinh mã hàng loạt và link tải file danh sách mã"""
+    return await service.get_bulk_job(job_id)
+
 @router.patch("/{discount_id}", response_model=DiscountResponse)
 async def admin_update_discount(
     discount_id: int,
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, Query
+from ...middleware.auth import require_admin
+from ...schemas.order import OrderExportFilter
+from ...services.common.order_export_service import order_export_service
+
+router = APIRouter(
+    prefix="/admin/orders",
+    tags=["admin-orders"],
+    dependencies=[Depends(require_admin)]
+)
+
+
+@router.get("/export")
+async def admin_export_orders(
+    filters: OrderExportFilter = Depends(),
+    seller_id: int | None = Query(None, ge=1),
+):
+    """
+    **Xuất lịch sử đơn hàng toàn hệ thống dưới dạng file.**
+
+    Dữ liệu được stream từ Database theo từng khối, không giới hạn số dòng.
+
+    ### Tham số:
+    - **status**, **date_from**, **date_to**: Lọc theo trạng thái và khoảng ngày đặt hàng.
+    - **seller_id**: Chỉ xuất đơn của một Shop (bỏ trống để xuất tất cả).
+    - **format**: `csv` (mặc định) hoặc `ndjson`.
+    - **gzip**: `true` để nén gzip trong lúc tải (file `.gz`).
+    """
+    return order_export_service.export(filters, seller_id=seller_id)
@@ -3,7 +3,7 @@ from typing import List
 from sqlalchemy.orm import Session, Query as SAQuery
 from ...middleware.auth import require_buyer
 from ...schemas.common import Page
-from ...schemas.carrier import CarrierOut, CarrierCalculateResponse, CarrierCalculateRequest
+from ...schemas.carrier import CarrierOut, CarrierCalculateResponse, CarrierCalculateRequest, CarrierQuote, CarrierQuoteRequest
 from ...services.buyer.buyer_carrier_service import (
     BuyerCarrierService,
     get_buyer_carrier_service
@@ -53,6 +53,25 @@ async def calculate_shipping(
         weight=payload.weight
     )
 
+# ===================== BÁO GIÁ SHIP CỦA MỌI ĐƠN VỊ VẬN CHUYỂN =====================
+@router.post(
+    "/quotes",
+    response_model=List[CarrierQuote]
+)
+async def quote_all_carriers(
+    payload: CarrierQuoteRequest,
+    service: BuyerCarrierService = Depends(get_buyer_carrier_service)
+):
+    """
+    API tính phí vận chuyển của tất cả đơn vị vận chuyển trong 1 lần gọi.
+
+    Chức năng:
+    - Dùng cho trang checkout thay vì gọi `/calculate` cho từng đơn vị vận chuyển
+    - `weight`: tổng khối lượng đơn hàng
+    - `seller_weights`: giỏ hàng nhiều shop, mỗi shop giao 1 kiện riêng -> trả thêm phí của từng shop
+    """
+    return await service.quote_all(payload)
+
 # ===================== CARRIER ÁP DỤNG CHO ĐƠN HÀNG =====================
 @router.post(
     "/available",
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query
+from typing import Dict, List
 from ...schemas.address import AddressUpdate
 from ...schemas.common import OrderStatus
 from ...middleware.auth import require_buyer
-from ...schemas.order import OrderCreate, OrderDetailResponse, OrderResponse, SellerOrderDetail, OrderCreateNew, BuyerOrderTrackingItem
+from ...schemas.order import OrderCreate, OrderDetailResponse, SellerOrderDetail, OrderCreateNew, BuyerOrderTrackingPage, CheckoutHoldRequest, CheckoutHoldResponse, CheckoutResponse, CheckoutSessionCreate, CheckoutSessionDiscountUpdate, CheckoutSessionResponse
 from ...services.buyer.buyer_order_service import (
     BuyerOrderService, 
     get_buyer_order_service
 )
+from ...services.common.idempotency_service import idempotency_service
 
 
 router = APIRouter(
@@ -33,39 +34,119 @@ async def get_selected_cart_items(
     items = await service.get_selected_cart_items(shopping_cart_item_ids)
     return items
 
+# ===== GIỮ KHO TẠM KHI VÀO TRANG THANH TOÁN =====
+@router.post("/checkout-hold", response_model=CheckoutHoldResponse)
+async def create_checkout_hold(
+    payload: CheckoutHoldRequest,
+    buyer=Depends(require_buyer),
+    service: BuyerOrderService = Depends(get_buyer_order_service)
+):
+    """
+    Giữ kho cho các sản phẩm đang thanh toán trong một khoảng thời gian ngắn.
+
+    - Truyền `hold_id` trả về vào API tạo đơn để dùng phần kho đã giữ
+    - Hết hạn mà chưa đặt hàng, kho sẽ tự động được trả lại
+    """
+    return await service.create_checkout_hold(
+        buyer_id=buyer["user"].buyer_id,
+        cart_item_ids=payload.cart_item_ids
+    )
+
+
+@router.delete("/checkout-hold/{hold_id}")
+async def release_checkout_hold(
+    hold_id: str,
+    buyer=Depends(require_buyer),
+    service: BuyerOrderService = Depends(get_buyer_order_service)
+):
+    """
+    Huỷ phiên giữ kho khi người dùng rời trang thanh toán.
+    """
+    return await service.release_checkout_hold(buyer["user"].buyer_id, hold_id)
+
+# ===== PHIÊN CHECKOUT: TÍNH GIÁ 1 LẦN CHO TRANG THANH TOÁN =====
+@router.post("/checkout-session", response_model=CheckoutSessionResponse)
+async def create_checkout_session(
+    payload: CheckoutSessionCreate,
+    buyer=Depends(require_buyer),
+    service: BuyerOrderService = Depends(get_buyer_order_service)
+):
+    """
+    Tính giá các sản phẩm đang thanh toán, phí ship của mọi đơn vị vận chuyển và mã giảm giá (nếu có).
+
+    - Truyền `checkout_session_id` trả về vào API tạo đơn để dùng lại kết quả, không tính lại từ giỏ hàng
+    - Phiên hết hạn sau một khoảng thời gian ngắn, hoặc khi giá / giỏ hàng thay đổi (API tạo đơn trả 409)
+    """
+    return await service.create_checkout_session(buyer["user"].buyer_id, payload)
+
+
+@router.get("/checkout-session/{checkout_session_id}", response_model=CheckoutSessionResponse)
+async def get_checkout_session(
+    checkout_session_id: str,
+    buyer=Depends(require_buyer),
+    service: BuyerOrderService = Depends(get_buyer_order_service)
+):
+    """
+    Lấy lại phiên checkout đã tính (tải lại trang thanh toán).
+    """
+    return await service.get_checkout_session(buyer["user"].buyer_id, checkout_session_id)
+
+
+@router.put("/checkout-session/{checkout_session_id}/discount", response_model=CheckoutSessionResponse)
+async def update_checkout_session_discount(
+    checkout_session_id: str,
+    payload: CheckoutSessionDiscountUpdate,
+    buyer=Depends(require_buyer),
+    service: BuyerOrderService = Depends(get_buyer_order_service)
+):
+    """
+    Đổi hoặc bỏ (`discount_id` = null) mã giảm giá của phiên checkout.
+    """
+    return await service.update_checkout_session_discount(
+        buyer["user"].buyer_id, checkout_session_id, payload.discount_id
+    )
+
 # ===== TẠO ĐƠN =====
 @router.post(
     "",
-    response_model=OrderResponse  # trả về order vừa tạo
+    response_model=CheckoutResponse  # phiên checkout + các đơn con theo seller
 )
 async def create_order(
     payload: OrderCreateNew,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     buyer=Depends(require_buyer),
     service: BuyerOrderService = Depends(get_buyer_order_service)
 ):
     """
     Tạo đơn hàng từ các sản phẩm được chọn trong giỏ hàng.
 
-    - User chỉ cần chọn sản phẩm muốn mua (cart_item_ids)
+    - User chỉ cần chọn sản phẩm muốn mua (cart_item_ids), hoặc gửi `checkout_session_id` đã tạo ở trang thanh toán
     - Backend tự tính subtotal, shipping, discount, total_price
+    - Sản phẩm của nhiều shop được tách thành nhiều đơn (mỗi shop 1 đơn), phí ship tính riêng từng shop
     - Xóa các sản phẩm đã mua khỏi giỏ hàng
+    - Gửi kèm header `Idempotency-Key` để retry an toàn: cùng key sẽ nhận lại kết quả của lần đặt đầu tiên
     """
-    return await service.place_order(
-        buyer_id=buyer["user"].buyer_id,
-        payload=payload
+    buyer_id = buyer["user"].buyer_id
+    return await idempotency_service.run(
+        scope=f"buyer:{buyer_id}:place_order",
+        idempotency_key=idempotency_key,
+        payload=payload,
+        handler=lambda: service.place_order(buyer_id=buyer_id, payload=payload)
     )
 
 
 # ===================== DANH SÁCH ĐƠN HÀNG CỦA BUYER THEO TRẠNG THÁI =====================
 @router.get(
     "/tracking",
-    response_model=List[BuyerOrderTrackingItem]
+    response_model=BuyerOrderTrackingPage
 )
 async def list_buyer_orders(
     tab: OrderStatus | None = Query(
         None,
         title="Trạng thái đơn hàng",
     ),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="`next_cursor` của trang trước để lấy các đơn cũ hơn"),
     buyer=Depends(require_buyer),
     service: BuyerOrderService = Depends(get_buyer_order_service),
 ):
@@ -82,12 +163,32 @@ async def list_buyer_orders(
     - `delivered`: Giao hàng thành công.
     - `cancelled`: Đã hủy.
     - **Nếu không truyền**: Trả về toàn bộ lịch sử đơn hàng.
+
+    ### Phân trang:
+    Kết quả sắp theo ngày đặt mới nhất, mỗi trang `limit` đơn.
+    Truyền `next_cursor` vào `cursor` để lấy trang tiếp theo (khi `has_more` = true).
     """
     return await service.list_orders_tracking(
         buyer_id=buyer["user"].buyer_id,
-        tab=tab
+        tab=tab,
+        limit=limit,
+        cursor=cursor
     )
 
+# ===================== SỐ ĐƠN THEO TỪNG TAB (BADGE) =====================
+@router.get("/tab-counts", response_model=Dict[str, int])
+async def get_order_tab_counts(
+    buyer=Depends(require_buyer),
+    service: BuyerOrderService = Depends(get_buyer_order_service),
+):
+    """
+    **Số lượng đơn hàng của từng tab trên màn hình "Đơn mua".**
+
+    Trả về dạng `{"all": 12, "pending": 1, "processing": 2, ...}` để hiển thị badge,
+    không cần gọi danh sách đơn cho từng tab.
+    """
+    return await service.get_order_tab_counts(buyer["user"].buyer_id)
+
 # ===== DETAIL =====
 @router.get("/{order_id}", response_model=OrderDetailResponse)
 async def order_detail(
@@ -128,6 +229,7 @@ async def update_order_shipping_address(
 @router.patch("/{order_id}/cancel")
 async def cancel_order(
     order_id: int,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     buyer=Depends(require_buyer),
     service: BuyerOrderService = Depends(get_buyer_order_service)
 ):
@@ -136,12 +238,19 @@ async def cancel_order(
 
     **Điều kiện:** Buyer chỉ được phép hủy khi đơn hàng chưa chuyển sang trạng thái giao hàng.
     """
-    return await service.cancel_order(buyer["user"].buyer_id, order_id)
+    buyer_id = buyer["user"].buyer_id
+    return await idempotency_service.run(
+        scope=f"buyer:{buyer_id}:cancel_order",
+        idempotency_key=idempotency_key,
+        payload={"order_id": order_id},
+        handler=lambda: service.cancel_order(buyer_id, order_id)
+    )
 
 # ===================== BUYER XÁC NHẬN ĐÃ NHẬN HÀNG =====================
 @router.patch("/{order_id}/confirm")
 async def confirm_received(
     order_id: int,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     buyer=Depends(require_buyer),
     service: BuyerOrderService = Depends(get_buyer_order_service)
 ):
@@ -150,4 +259,10 @@ async def confirm_received(
 
     Dùng khi người dùng đã nhận được sản phẩm và hài lòng. Trạng thái đơn hàng sẽ chuyển sang `completed`.
     """
-    return await service.confirm_received(buyer["user"].buyer_id, order_id)
\ No newline at end of file
+    buyer_id = buyer["user"].buyer_id
+    return await idempotency_service.run(
+        scope=f"buyer:{buyer_id}:confirm_received",
+        idempotency_key=idempotency_key,
+        payload={"order_id": order_id},
+        handler=lambda: service.confirm_received(buyer_id, order_id)
+    )
\ No newline at end of file
@@ -59,4 +59,24 @@ async def chat_socket_endpoint(
 
     except Exception as e:
         print(f"[WS] Error: {e}")
-        socket_manager.disconnect_socket(websocket, user_id, role)
\ No newline at end of file
+        socket_manager.disconnect_socket(websocket, user_id, role)
+
+
+@router.websocket("/products/{product_id}")
+async def product_stock_socket_endpoint(websocket: WebSocket, product_id: int):
+    """
+    Kênh cập nhật tồn kho realtime cho trang sản phẩm (không cần đăng nhập).
+    Server đẩy {"type": "STOCK_UPDATE", ...} khi size của sản phẩm sắp hết / hết / có hàng lại.
+    """
+    await socket_manager.connect_socket(websocket, product_id, "product")
+
+    try:
+        while True:
+            await websocket.receive_text()
+
+    except WebSocketDisconnect:
+        socket_manager.disconnect_socket(websocket, product_id, "product")
+
+    except Exception as e:
+        print(f"[WS] Product {product_id} Error: {e}")
+        socket_manager.disconnect_socket(websocket, product_id, "product")
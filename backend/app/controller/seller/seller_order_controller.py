@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, status
 from ...middleware.auth import require_seller
 
 from ...services.seller.seller_order_service import get_seller_order_service, SellerOrderService
+from ...services.common.idempotency_service import idempotency_service
+from ...services.common.order_export_service import order_export_service
 
 from ...schemas.seller_order import (
     SellerOrderFilter,
@@ -9,6 +11,7 @@ from ...schemas.seller_order import (
     SellerCancelReason
 )
 from ...schemas.common import Page
+from ...schemas.order import OrderExportFilter
 
 router = APIRouter(
     prefix="/seller/orders",
@@ -34,6 +37,23 @@ async def list_orders(
     return await service.list_orders(seller_id, filters)
 
 
+@router.get(
+    "/export",
+    summary="Xuất lịch sử đơn hàng (CSV / NDJSON)",
+    status_code=status.HTTP_200_OK
+)
+async def export_orders(
+        filters: OrderExportFilter = Depends(),
+        seller_info: dict = Depends(require_seller),
+):
+    """
+    Tải toàn bộ đơn hàng của Shop (lọc theo trạng thái, khoảng ngày) dưới dạng file.
+    Dữ liệu được stream theo từng khối, `gzip=true` để nén trong lúc tải.
+    """
+    seller_id = seller_info["user"].seller_id
+    return order_export_service.export(filters, seller_id=seller_id)
+
+
 @router.get(
     "/{order_id}",
     response_model=SellerOrderDetailResponse,
@@ -59,6 +79,7 @@ async def get_order_detail(
 )
 async def confirm_order(
         order_id: int,
+        idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         seller_info: dict = Depends(require_seller),
         service: SellerOrderService = Depends(get_seller_order_service)
 ):
@@ -67,7 +88,12 @@ async def confirm_order(
     Hệ thống sẽ gửi thông báo cho Buyer.
     """
     seller_id = seller_info["user"].seller_id
-    return await service.confirm_order(seller_id, order_id)
+    return await idempotency_service.run(
+        scope=f"seller:{seller_id}:confirm_order",
+        idempotency_key=idempotency_key,
+        payload={"order_id": order_id},
+        handler=lambda: service.confirm_order(seller_id, order_id)
+    )
 
 
 @router.put(
@@ -77,6 +103,7 @@ async def confirm_order(
 )
 async def ship_order(
         order_id: int,
+        idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         seller_info: dict = Depends(require_seller),
         service: SellerOrderService = Depends(get_seller_order_service)
 ):
@@ -84,7 +111,12 @@ async def ship_order(
     Chuyển trạng thái sang Đã Giao (Shipped) khi bàn giao cho ĐVVC.
     """
     seller_id = seller_info["user"].seller_id
-    return await service.mark_as_shipped(seller_id, order_id)
+    return await idempotency_service.run(
+        scope=f"seller:{seller_id}:ship_order",
+        idempotency_key=idempotency_key,
+        payload={"order_id": order_id},
+        handler=lambda: service.mark_as_shipped(seller_id, order_id)
+    )
 
 
 @router.put(
@@ -95,6 +127,7 @@ async def ship_order(
 async def cancel_order(
         order_id: int,
         payload: SellerCancelReason,
+        idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
         seller_info: dict = Depends(require_seller),
         service: SellerOrderService = Depends(get_seller_order_service)
 ):
@@ -103,4 +136,9 @@ async def cancel_order(
     Hệ thống sẽ tự động hoàn lại số lượng tồn kho (Redis + DB).
     """
     seller_id = seller_info["user"].seller_id
-    return await service.cancel_order(seller_id, order_id, payload.reason)
\ No newline at end of file
+    return await idempotency_service.run(
+        scope=f"seller:{seller_id}:cancel_order",
+        idempotency_key=idempotency_key,
+        payload={"order_id": order_id, "reason": payload.reason},
+        handler=lambda: service.cancel_order(seller_id, order_id, payload.reason)
+    )
\ No newline at end of file
@@ -7,6 +7,7 @@ from ...schemas.product import (
     ProductCreate, ProductDetail, ProductImageResponse, ProductResponse,
     ProductSizeCreate, ProductSizeResponse, ProductSizeUpdate, ProductUpdate,
     ProductVariantCreate, ProductVariantResponse, ProductVariantUpdate,
+    StockShardingUpdate, StockShardingResponse,
 )
 
 from ...services.seller.seller_product_service import (
@@ -226,6 +227,30 @@ async def update_size(
     )
 
 
+@router.put("/{product_id}/variants/{variant_id}/sizes/{size_id}/stock-shards", response_model=StockShardingResponse)
+async def set_size_stock_shards(
+    product_id: int,
+    variant_id: int,
+    size_id: int,
+    payload: StockShardingUpdate,
+    seller_info=Depends(require_seller),
+    service: SellerProductService = Depends(get_seller_product_service)
+):
+    """
+    **Bật / tắt chia shard tồn kho cho size flash-sale.**
+
+    Dùng cho size bán rất nhanh (flash-sale): tồn kho được chia ra nhiều key để giảm tranh chấp.
+    Gửi `shards = 1` để tắt.
+    """
+    return await service.set_size_stock_shards(
+        seller_id=seller_info["user"].seller_id,
+        product_id=product_id,
+        variant_id=variant_id,
+        size_id=size_id,
+        shards=payload.shards
+    )
+
+
 @router.delete("/{product_id}/variants/{variant_id}/sizes/{size_id}")
 async def delete_size(
     product_id: int,
@@ -7,7 +7,10 @@ from .config.mongo import init_mongo
 from .config.db import AsyncSessionLocal
 
 from .utils.socket_manager import socket_manager
+from .utils.celery_client import celery_app
+from .utils.task_dispatcher import task_dispatcher
 from .services.admin.admin_dashboard_service import admin_dashboard_service
+from .services.common.inventory_service import inventory_service
 
 
 logger = logging.getLogger("uvicorn.startup")
@@ -53,12 +56,33 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f">>> [LIFESPAN] Admin Sync Failed (App will continue): {e}")
 
+    try:
+        async with AsyncSessionLocal() as db:
+            created = await inventory_service.warm_up_stock(db)
+        logger.info(f">>> [LIFESPAN] Stock warm-up done ({created} new keys).")
+    except Exception as e:
+        logger.warning(f">>> [LIFESPAN] Stock warm-up Failed (App will continue): {e}")
+
+    try:
+        # Beat chỉ chạy sau 1 chu kỳ -> tạo ngay partition đơn hàng cho tháng hiện tại và các tháng tới
+        celery_app.send_task("orders.create_partitions")
+        logger.info(">>> [LIFESPAN] Order partition job queued.")
+    except Exception as e:
+        logger.warning(f">>> [LIFESPAN] Queue order partition job Failed (App will continue): {e}")
+
     listener_task = asyncio.create_task(socket_manager.run_redis_listener())
     logger.info(">>> [LIFESPAN] Redis Listener Started.")
 
+    # Gửi task Celery từ request qua hàng đợi trong process, không chặn event loop
+    task_dispatcher.start(celery_app)
+    logger.info(">>> [LIFESPAN] Celery Task Dispatcher Started.")
+
     yield
     logger.info(">>> [LIFESPAN] SHUTTING DOWN...")
 
+    await task_dispatcher.stop()
+    logger.info(">>> [LIFESPAN] Celery Task Dispatcher Stopped.")
+
     if listener_task:
         listener_task.cancel()
         try:
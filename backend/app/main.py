@@ -15,6 +15,7 @@ from .controller.admin.admin_discount_controller import router as admin_manage_d
 from .controller.admin.admin_carrier_controller import router as admin_manage_carrier_router
 from .controller.admin.admin_notification_controller import router as admin_notify_router
 from .controller.admin.admin_dashboard_controller import router as admin_dashboard_router
+from .controller.admin.admin_order_controller import router as admin_order_router
 
 
 # IMPORT SELLER CONTROLLER
@@ -82,6 +83,7 @@ app.include_router(admin_manage_discount_router)
 app.include_router(admin_manage_carrier_router)
 app.include_router(admin_notify_router)
 app.include_router(admin_dashboard_router)
+app.include_router(admin_order_router)
 
 
 
@@ -1,7 +1,9 @@
 from .address import Address, SellerAddress, BuyerAddress
 from .cart import ShoppingCart, ShoppingCartItem
-from .catalog import Category, Carrier, Product, ProductVariant, ProductSize, ProductImage, Discount
-from .order import Order, OrderItem
+from .catalog import Category, Carrier, Product, ProductVariant, ProductSize, ProductImage, Discount, DiscountUsageDelta
+from .inventory import StockDelta
+from .order import Checkout, Order, OrderItem
+from .outbox import OutboxMessage
 from .review import Review
 from .users import Buyer, Seller, Admin
 
@@ -9,8 +11,10 @@ __all__ = [
     "Address", "SellerAddress", "BuyerAddress",
     "ShoppingCart", "ShoppingCartItem",
     "Category", "Carrier", "Product", "ProductVariant",
-    "ProductSize", "ProductImage", "Discount",
-    "Order", "OrderItem",
+    "ProductSize", "ProductImage", "Discount", "DiscountUsageDelta",
+    "StockDelta",
+    "Checkout", "Order", "OrderItem",
+    "OutboxMessage",
     "Review",
     "Buyer", "Seller", "Admin"
 ]
\ No newline at end of file
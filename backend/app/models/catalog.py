@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Numeric, Text, DateTime, Date,
-    ForeignKey
+    Column, BigInteger, Integer, String, Boolean, Numeric, Text, DateTime, Date,
+    ForeignKey, Index, text
 )
 
 from sqlalchemy.orm import relationship
@@ -118,5 +118,29 @@ class Discount(Base):
     usage_limit = Column(Integer)
     used_count = Column(Integer, nullable=False, default=0)
     is_active = Column(Boolean, nullable=False, default=True)
+    # Mã sinh hàng loạt cho 1 chiến dịch (phát riêng cho từng người) -> không hiện trong danh sách mã công khai
+    campaign = Column(String(100))
 
-    orders = relationship("Order", back_populates="discount")
\ No newline at end of file
+    __table_args__ = (
+        Index("idx_discount_campaign", "campaign", postgresql_where=text("campaign IS NOT NULL")),
+    )
+
+    orders = relationship("Order", back_populates="discount")
+
+
+class DiscountUsageDelta(Base):
+    """
+    Lượt dùng mã giảm giá (+1 khi đặt đơn, -1 khi huỷ đơn trả lượt) chờ ghi xuống discount.used_count.
+    Được ghi cùng transaction với đơn hàng; worker discounts.settle_usage gom net delta theo mã,
+    xoá dòng đã áp dụng và cập nhật discount trong cùng 1 transaction.
+    """
+    __tablename__ = "discount_usage_delta"
+
+    delta_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    discount_id = Column(Integer, ForeignKey("discount.discount_id", ondelete="CASCADE"), nullable=False)
+    delta = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_discount_usage_delta_discount", "discount_id"),
+    )
@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer
+from sqlalchemy.sql import func
+from ..config.db import Base
+
+
+class StockDelta(Base):
+    """
+    Delta kho (write-back) chờ ghi xuống product_size.available_units.
+    Được ghi cùng transaction với đơn hàng; worker flush_stock_writeback gom net delta theo size,
+    xoá dòng đã áp dụng và cập nhật product_size trong cùng 1 transaction.
+    """
+    __tablename__ = "stock_delta"
+
+    delta_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    size_id = Column(Integer, ForeignKey("product_size.size_id", ondelete="CASCADE"), nullable=False)
+    delta = Column(Integer, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -1,14 +1,39 @@
 from sqlalchemy import (
-    Column, Integer,Numeric, Text, DateTime, ForeignKey,
-    CheckConstraint
+    Column, Integer,Numeric, String, Text, DateTime, ForeignKey,
+    CheckConstraint, Index, text
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..config.db import Base
 from .enums import PaymentMethodEnum, OrderStatusEnum, PaymentStatusEnum
 
+class Checkout(Base):
+    # Phiên thanh toán: 1 lần đặt hàng của buyer, tách thành nhiều đơn (mỗi seller 1 đơn)
+    __tablename__ = "checkout"
+
+    checkout_id = Column(Integer, primary_key=True, autoincrement=True)
+    buyer_id = Column(Integer, ForeignKey("buyer.buyer_id"), nullable=False)
+    payment_method = Column(PaymentMethodEnum, nullable=False)
+    subtotal = Column(Numeric(10, 2), nullable=False)
+    shipping_price = Column(Numeric(10, 2), nullable=False, default=0)
+    discount_amount = Column(Numeric(10, 2), nullable=False, default=0)
+    total_price = Column(Numeric(10, 2), nullable=False)
+    discount_id = Column(Integer, ForeignKey("discount.discount_id"))
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        CheckConstraint(
+            "total_price = subtotal + shipping_price - discount_amount",
+            name="ck_checkout_total_logic"
+        ),
+    )
+
+    buyer = relationship("Buyer")
+    orders = relationship("Order", back_populates="checkout")
+
 class Order(Base):
-    # Bảng đơn hàng
+    # Bảng đơn hàng, partition theo tháng của order_date (migrations/006_order_partitioning.sql).
+    # Khoá chính trong DB là (order_id, order_date); ORM vẫn định danh theo order_id (duy nhất nhờ sequence)
     __tablename__ = "order"
 
     order_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -19,13 +44,15 @@ class Order(Base):
     shipping_price = Column(Numeric(10, 2), nullable=False, default=0)
     discount_amount = Column(Numeric(10, 2), nullable=False, default=0)
     total_price = Column(Numeric(10, 2), nullable=False)
-    order_date = Column(DateTime, server_default=func.now())
+    order_date = Column(DateTime, nullable=False, server_default=func.now())  # khoá partition
     delivery_date = Column(DateTime)
     order_status = Column(OrderStatusEnum, nullable=False, default="pending")
     payment_status = Column(PaymentStatusEnum, nullable=False, default="pending")
     discount_id = Column(Integer, ForeignKey("discount.discount_id"))
     carrier_id = Column(Integer, ForeignKey("carrier.carrier_id"), nullable=False)
     notes = Column(Text)
+    checkout_id = Column(Integer, ForeignKey("checkout.checkout_id"))
+    seller_id = Column(Integer, ForeignKey("seller.seller_id"), nullable=False)  # mỗi đơn thuộc về 1 seller
 
     __table_args__ = (
         CheckConstraint(
@@ -36,6 +63,13 @@ class Order(Base):
             "total_price = subtotal + shipping_price - discount_amount",
             name="ck_order_total_logic"
         ),
+        # Trang quản lý đơn / dashboard của seller lọc theo seller_id (+ trạng thái), sắp theo ngày
+        Index("idx_order_seller_status_date", "seller_id", "order_status", order_date.desc()),
+        Index("idx_order_seller_date", "seller_id", order_date.desc()),
+        # Trang "Đơn mua" của buyer: phân trang keyset theo (order_date, order_id)
+        Index("idx_order_buyer_date", "buyer_id", order_date.desc(), order_id.desc()),
+        # Job orders.expire_pending: chỉ quét các đơn còn pending, cũ nhất trước
+        Index("idx_order_pending_date", order_date, postgresql_where=text("order_status = 'pending'")),
     )
 
     buyer = relationship("Buyer", back_populates="orders")
@@ -43,9 +77,10 @@ class Order(Base):
     discount = relationship("Discount", back_populates="orders")
     carrier = relationship("Carrier", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    checkout = relationship("Checkout", back_populates="orders")
 
 class OrderItem(Base):
-    # Sản phẩm trong đơn hàng
+    # Sản phẩm trong đơn hàng, partition cùng khoá với order (FK (order_id, order_date) trong DB)
     __tablename__ = "order_item"
 
     order_item_id = Column(Integer, primary_key=True, autoincrement=True)
@@ -57,10 +92,22 @@ class OrderItem(Base):
     unit_price = Column(Numeric(10, 2), nullable=False)
     total_price = Column(Numeric(10, 2), nullable=False)
 
+    # Snapshot lúc đặt hàng: lịch sử đơn không phụ thuộc việc sửa/xoá sản phẩm, ảnh, variant
+    product_name = Column(String(255))
+    variant_name = Column(String(100))
+    size_name = Column(String(20))
+    image_url = Column(String(500))                  # object key của ảnh primary
+    list_price = Column(Numeric(10, 2))              # base_price + price_adjustment (chưa giảm giá)
+    shop_name = Column(String(255))
+
+    # = order.order_date của đơn, khoá partition; luôn lọc/join kèm cột này để Postgres bỏ qua partition khác
+    order_date = Column(DateTime, nullable=False)
+
     __table_args__ = (
         CheckConstraint("quantity > 0", name="ck_order_item_qty_pos"),
         CheckConstraint("unit_price >= 0 AND total_price >= 0", name="ck_order_item_price_nonneg"),
         CheckConstraint("total_price = quantity * unit_price", name="ck_order_item_total_logic"),
+        Index("idx_order_item_order_id", "order_id", "order_item_id"),
     )
 
     order = relationship("Order", back_populates="items")
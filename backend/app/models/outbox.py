@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+from ..config.db import Base
+
+
+class OutboxMessage(Base):
+    """
+    Transactional outbox: task Celery cần chạy sau khi đơn thay đổi,
+    được ghi cùng transaction với thay đổi của đơn và được relay đẩy lên broker sau.
+    """
+    __tablename__ = "outbox_message"
+
+    outbox_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    task_name = Column(String(255), nullable=False)
+    args = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+    kwargs = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    published_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    last_error = Column(Text)
+
+    __table_args__ = (
+        # Relay chỉ quét các dòng chưa publish
+        Index(
+            "idx_outbox_message_pending", "outbox_id",
+            postgresql_where=text("published_at IS NULL")
+        ),
+    )
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from decimal import Decimal
+from typing import Annotated
 from pydantic import BaseModel, Field
 from .common import ORMBase
 
@@ -36,6 +37,19 @@ class CarrierCalculateResponse(BaseModel):
     carrier_id: int
     shipping_fee: int
 
+# (Request) — báo giá ship của mọi carrier trong 1 lần gọi
+class CarrierQuoteRequest(BaseModel):
+    weight: Decimal = Field(0, ge=0)                          # tổng khối lượng (kg), giỏ 1 shop
+    seller_weights: dict[int, Annotated[Decimal, Field(ge=0)]] | None = None  # giỏ nhiều shop: khối lượng từng shop, mỗi shop 1 kiện
+
+# (Response)
+class CarrierQuote(BaseModel):
+    carrier_id: int
+    carrier_name: str
+    carrier_avt_url: str | None = None
+    shipping_fee: int                                         # tổng phí ship
+    seller_fees: dict[int, int] | None = None                 # phí từng shop (khi gửi seller_weights)
+
 class CarrierResponse(ORMBase):
     carrier_id: int
     carrier_name: str
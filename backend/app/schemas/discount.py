@@ -25,6 +25,29 @@ class DiscountUpdate(BaseModel):
     usage_limit: int | None = None
     is_active: bool | None = None
 
+# Request sinh hang loat ma dung 1 lan cho 1 chien dich (cung thong so)
+class DiscountBulkCreate(BaseModel):
+    campaign: str = Field(..., min_length=1, max_length=100)
+    quantity: int = Field(..., ge=1, le=200_000)
+    prefix: str = Field("", max_length=20, pattern=r"^[A-Za-z0-9]*$")
+    code_length: int = Field(10, ge=6, le=30)   # so ky tu ngau nhien sau prefix
+    discount_percent: Decimal = Field(..., ge=0, le=100)
+    min_order_value: Decimal = Field(0, ge=0)
+    max_discount: Decimal | None = Field(None, ge=0)
+    start_date: date
+    end_date: date
+    usage_limit: int = Field(1, ge=1)
+
+# Response trang thai job sinh ma
+class DiscountBulkJobResponse(BaseModel):
+    job_id: str
+    status: str                     # queued | running | done | failed
+    campaign: str
+    requested: int
+    created: int = 0
+    download_url: str | None = None # file CSV danh sach ma (khi done)
+    error: str | None = None
+
 # Response tra ve discount
 class DiscountResponse(ORMBase):
     discount_id: int
@@ -37,6 +60,7 @@ class DiscountResponse(ORMBase):
     usage_limit: int | None = None
     used_count: int
     is_active: bool
+    campaign: str | None = None
 
 # Request dùng để kiểm tra mã giảm giá người dùng nhập.
 class ValidateDiscountRequest(BaseModel):
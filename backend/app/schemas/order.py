@@ -2,6 +2,7 @@
 from __future__ import annotations
 from datetime import datetime
 from decimal import Decimal
+from typing import Literal
 from pydantic import BaseModel, Field
 from .common import ORMBase, PaymentMethod, OrderStatus, PaymentStatus
 
@@ -21,6 +22,14 @@ class OrderUpdateStatus(BaseModel):
     delivery_date: datetime | None = None
     notes: str | None = None
 
+# (Request) — xuất lịch sử đơn hàng dạng file (seller / admin)
+class OrderExportFilter(BaseModel):
+    status: OrderStatus | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+    format: Literal["csv", "ndjson"] = "csv"
+    gzip: bool = False  # nén gzip trong lúc stream, tải về file .gz
+
 # (Response)
 class OrderResponse(ORMBase):
     order_id: int
@@ -38,6 +47,18 @@ class OrderResponse(ORMBase):
     discount_id: int | None = None
     carrier_id: int
     notes: str | None = None
+    checkout_id: int | None = None
+
+# (Response) — 1 lần đặt hàng, tách thành nhiều đơn theo seller
+class CheckoutResponse(BaseModel):
+    checkout_id: int
+    order_id: int  # đơn đầu tiên, giữ tương thích với client cũ
+    subtotal: Decimal
+    shipping_price: Decimal
+    discount_amount: Decimal
+    total_price: Decimal
+    created_at: datetime | None = None
+    orders: list[OrderResponse]
 
 # (Response) — chi tiết từng dòng hàng trong đơn
 class OrderItemResponse(ORMBase):
@@ -81,7 +102,64 @@ class OrderCreateNew(BaseModel):
     payment_method: str
     discount_id: Optional[int] = None
     notes: Optional[str] = None
-    cart_item_ids: List[int]  # danh sách sản phẩm muốn mua
+    cart_item_ids: List[int] = []  # danh sách sản phẩm muốn mua (bỏ trống nếu dùng checkout_session_id)
+    hold_id: Optional[str] = None  # phiên giữ kho tạo lúc vào trang thanh toán
+    checkout_session_id: Optional[str] = None  # phiên checkout đã tính giá sẵn, không tính lại từ giỏ hàng
+
+class CheckoutHoldRequest(BaseModel):
+    cart_item_ids: List[int]
+
+class CheckoutHoldResponse(BaseModel):
+    hold_id: str | None
+    expires_at: datetime | None
+
+# (Request) — tạo phiên checkout: tính giá 1 lần cho trang thanh toán
+class CheckoutSessionCreate(BaseModel):
+    cart_item_ids: List[int]
+    discount_id: Optional[int] = None
+
+class CheckoutSessionDiscountUpdate(BaseModel):
+    discount_id: Optional[int] = None  # None -> bỏ mã giảm giá
+
+# (Response) — phiên checkout
+class CheckoutSessionLine(BaseModel):
+    shopping_cart_item_id: int
+    product_id: int
+    product_name: str
+    variant_id: int | None = None
+    variant_name: str | None = None
+    size_id: int | None = None
+    size_name: str | None = None
+    quantity: int
+    unit_price: Decimal
+    list_price: Decimal
+    total_price: Decimal
+    weight: Decimal
+    public_image_url: str | None = None
+    seller_id: int
+    shop_name: str | None = None
+
+class CheckoutCarrierQuote(BaseModel):
+    carrier_id: int
+    carrier_name: str
+    carrier_avt_url: str | None = None
+    shipping_price: Decimal  # tổng phí ship (mỗi shop 1 kiện)
+    total_price: Decimal     # subtotal + shipping_price - discount_amount
+
+class CheckoutSessionDiscount(BaseModel):
+    discount_id: int
+    code: str
+    discount_percent: Decimal
+    discount_amount: Decimal
+
+class CheckoutSessionResponse(BaseModel):
+    checkout_session_id: str
+    expires_at: datetime
+    items: List[CheckoutSessionLine]
+    subtotal: Decimal
+    total_weight: Decimal
+    discount: CheckoutSessionDiscount | None = None
+    carriers: List[CheckoutCarrierQuote]
 
 from .carrier import CarrierResponse
 class OrderDetailResponse(BaseModel):
@@ -120,6 +198,11 @@ class BuyerOrderTrackingItem(BaseModel):
 
     order_date: datetime
 
+class BuyerOrderTrackingPage(BaseModel):
+    items: list[BuyerOrderTrackingItem]
+    next_cursor: str | None = None  # truyền lại vào `cursor` để lấy trang tiếp theo
+    has_more: bool = False
+
 class OrderItemResponseNew(BaseModel):
     order_item_id: int
     order_id: int
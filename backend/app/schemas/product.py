@@ -101,6 +101,16 @@ class ProductSizeResponse(ORMBase):
     available_units: int
     in_stock: bool
 
+# Request bật / tắt chia shard tồn kho cho size flash-sale (1 = tắt)
+class StockShardingUpdate(BaseModel):
+    shards: int = Field(..., ge=1, le=64)
+
+# Response cấu hình shard + tồn kho hiện tại trên Redis
+class StockShardingResponse(BaseModel):
+    size_id: int
+    shards: int
+    available: int | None = None
+
 # (Request) — confirm sau khi FE PUT ảnh vào MinIO; gửi object_key
 class ProductImageCreate(BaseModel):
     product_id: int
@@ -1,4 +1,4 @@
-from sqlalchemy import select, func
+from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
 import redis.asyncio as redis
@@ -254,8 +254,7 @@ class AdminDashboardService:
 
         # --- C. Sync Seller Rankings ---
         pipe.delete(self.KEY_RANK_SELLER_ORDERS)
-        stmt_sell_ord = select(Product.seller_id, func.count(func.distinct(Order.order_id))) \
-            .join(Order.items).join(OrderItem.product).group_by(Product.seller_id)
+        stmt_sell_ord = select(Order.seller_id, func.count(Order.order_id)).group_by(Order.seller_id)
         seller_ord = (await db.execute(stmt_sell_ord)).all()
         if seller_ord:
             pipe.zadd(self.KEY_RANK_SELLER_ORDERS, {str(sid): count for sid, count in seller_ord if sid})
@@ -263,9 +262,8 @@ class AdminDashboardService:
         # 2. Revenue
         pipe.delete(self.KEY_RANK_SELLER_REVENUE)
         # [FIX]: Dùng OrderStatus.delivered và Order.order_status
-        stmt_sell_rev = select(Product.seller_id, func.sum(Order.total_price)) \
-            .join(Order.items).join(OrderItem.product) \
-            .where(Order.order_status == OrderStatus.delivered).group_by(Product.seller_id)
+        stmt_sell_rev = select(Order.seller_id, func.sum(Order.total_price)) \
+            .where(Order.order_status == OrderStatus.delivered).group_by(Order.seller_id)
         seller_rev = (await db.execute(stmt_sell_rev)).all()
         if seller_rev:
             pipe.zadd(self.KEY_RANK_SELLER_REVENUE, {str(sid): float(val) for sid, val in seller_rev if sid})
@@ -284,7 +282,7 @@ class AdminDashboardService:
         stmt_cat_sold = select(Category.category_id, func.sum(OrderItem.quantity)) \
             .join(Product, Product.category_id == Category.category_id) \
             .join(OrderItem, OrderItem.product_id == Product.product_id) \
-            .join(Order, Order.order_id == OrderItem.order_id) \
+            .join(Order, and_(Order.order_id == OrderItem.order_id, Order.order_date == OrderItem.order_date)) \
             .where(Order.order_status == OrderStatus.delivered).group_by(Category.category_id)
         cat_sold = (await db.execute(stmt_cat_sold)).all()
         if cat_sold:
@@ -298,7 +296,7 @@ class AdminDashboardService:
         ) \
             .join(Product, Product.category_id == Category.category_id) \
             .join(OrderItem, OrderItem.product_id == Product.product_id) \
-            .join(Order, Order.order_id == OrderItem.order_id) \
+            .join(Order, and_(Order.order_id == OrderItem.order_id, Order.order_date == OrderItem.order_date)) \
             .where(Order.order_status == OrderStatus.delivered).group_by(Category.category_id)
 
         cat_rev = (await db.execute(stmt_cat_rev)).all()
@@ -1,20 +1,34 @@
 from __future__ import annotations
+import uuid
+
+import redis.asyncio as redis
 from fastapi import HTTPException, status, Depends
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from ..common.discount_index import discount_index
 from ..common.discount_service import BaseDiscountService
 from ...config.db import get_db
-from ...schemas.discount import DiscountCreate, DiscountResponse, DiscountUpdate
+from ...config.redis import redis_pool
+from ...config.s3 import presign_get
+from ...schemas.discount import (
+    DiscountBulkCreate,
+    DiscountBulkJobResponse,
+    DiscountCreate,
+    DiscountResponse,
+    DiscountUpdate,
+)
 from ...models.catalog import Discount
 from ...models.order import Order
+from ...tasks.discount_task import BULK_JOB_KEY, BULK_JOB_TTL, generate_discount_codes
 
 
 class AdminDiscountService(BaseDiscountService):
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, redis_client: redis.Redis = None):
         super().__init__(db)
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
 
 
     async def list(self, q: str | None = None, limit: int = 10, offset: int = 0):
@@ -41,6 +55,7 @@ class AdminDiscountService(BaseDiscountService):
                 detail="Discount code exists"
             ) from e
 
+        await discount_index.bump()
         return DiscountResponse.model_validate(item)
 
 
@@ -52,6 +67,7 @@ class AdminDiscountService(BaseDiscountService):
 
         await self.db.commit()
         await self.db.refresh(discount)
+        await discount_index.bump()
 
         return DiscountResponse.model_validate(discount)
 
@@ -70,6 +86,7 @@ class AdminDiscountService(BaseDiscountService):
 
         await self.db.delete(discount)
         await self.db.commit()
+        await discount_index.bump()
 
         return {"deleted": True}
 
@@ -80,9 +97,54 @@ class AdminDiscountService(BaseDiscountService):
         discount.is_active = is_active
         await self.db.commit()
         await self.db.refresh(discount)
+        await discount_index.bump()
 
         return DiscountResponse.model_validate(discount)
 
 
+    async def create_bulk(self, payload: DiscountBulkCreate):
+        """
+        Sinh hàng loạt mã dùng riêng cho 1 chiến dịch bằng job nền (discounts.generate_codes).
+        Trả về job_id để theo dõi và tải file danh sách mã khi xong.
+        """
+        if payload.end_date < payload.start_date:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="end_date must be after start_date"
+            )
+
+        job_id = uuid.uuid4().hex
+        job_key = BULK_JOB_KEY.format(job_id=job_id)
+        await self.redis.hset(job_key, mapping={
+            "status": "queued",
+            "campaign": payload.campaign,
+            "requested": payload.quantity,
+            "created": 0,
+        })
+        await self.redis.expire(job_key, BULK_JOB_TTL)
+
+        generate_discount_codes.delay(job_id, payload.model_dump(mode="json"))
+        return await self.get_bulk_job(job_id)
+
+
+    async def get_bulk_job(self, job_id: str):
+        job = await self.redis.hgetall(BULK_JOB_KEY.format(job_id=job_id))
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Bulk job not found"
+            )
+
+        return DiscountBulkJobResponse(
+            job_id=job_id,
+            status=job["status"],
+            campaign=job["campaign"],
+            requested=int(job["requested"]),
+            created=int(job.get("created", 0)),
+            download_url=presign_get(job["file_key"], expires=3600) if job.get("file_key") else None,
+            error=job.get("error"),
+        )
+
+
 def get_discount_service(db: AsyncSession = Depends(get_db)):
     return AdminDiscountService(db)
\ No newline at end of file
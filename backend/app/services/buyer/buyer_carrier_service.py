@@ -9,17 +9,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 # Configuration & Database
 from ...config.db import get_db
 from ...config.redis import get_redis_client
+from ...config.s3 import public_url
 
 # Models
 from ...models import Carrier
 # Services
 from ..common.carrier_service import BaseCarrierService
+from ..common.carrier_table import carrier_table
 
 # Schemas
 from ...schemas.common import Page, PageMeta
 from ...schemas.carrier import (
     CarrierOut, 
-    CarrierCalculateResponse
+    CarrierCalculateResponse,
+    CarrierQuote,
+    CarrierQuoteRequest,
 )
 
 
@@ -53,25 +57,47 @@ class BuyerCarrierService(BaseCarrierService):
         cart_total: int,
         weight: Decimal
     ) -> CarrierCalculateResponse:
-        carrier = await self.db.get(Carrier, carrier_id)
+        # Bảng carrier trong process, không query DB
+        carrier = await carrier_table.get(self.db, carrier_id)
 
-        if not carrier or not carrier.is_active:
+        if not carrier:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Đơn vị vận chuyển không tồn tại hoặc không hoạt động"
             )
 
-        weight = Decimal(weight)
-        shipping_fee = (
-            carrier.base_price +
-            carrier.price_per_kg * weight
-        )
-
         return CarrierCalculateResponse(
-            carrier_id=carrier.carrier_id,
-            shipping_fee=int(shipping_fee)
+            carrier_id=carrier["carrier_id"],
+            shipping_fee=int(carrier_table.fee(carrier, weight))
         )
 
+    # ===================== BÁO GIÁ SHIP CỦA MỌI CARRIER =====================
+    async def quote_all(self, payload: CarrierQuoteRequest) -> list[CarrierQuote]:
+        """
+        Phí ship của mọi carrier đang hoạt động trong 1 lần gọi, tính từ bảng carrier trong process.
+        Có seller_weights -> mỗi shop 1 kiện (giống place_order), phí = tổng phí các kiện.
+        """
+        quotes = []
+        for carrier in await carrier_table.all(self.db):
+            seller_fees = None
+            if payload.seller_weights:
+                seller_fees = {
+                    seller_id: int(carrier_table.fee(carrier, weight))
+                    for seller_id, weight in payload.seller_weights.items()
+                }
+                shipping_fee = sum(seller_fees.values())
+            else:
+                shipping_fee = int(carrier_table.fee(carrier, payload.weight))
+
+            quotes.append(CarrierQuote(
+                carrier_id=carrier["carrier_id"],
+                carrier_name=carrier["carrier_name"],
+                carrier_avt_url=public_url(carrier["carrier_avt_url"]) if carrier["carrier_avt_url"] else None,
+                shipping_fee=shipping_fee,
+                seller_fees=seller_fees,
+            ))
+        return quotes
+
     # ===================== DANH SÁCH CARRIER ÁP DỤNG CHO ĐƠN HÀNG =====================
     async def list_available_carriers(
         self,
@@ -131,6 +131,12 @@ class CartServiceAsync:
         await self.redis.set(self._cart_key(buyer_id), json.dumps(final_response), ex=self.CART_TTL)
         return final_response
 
+    async def invalidate_cart_cache(self, buyer_id: int):
+        """
+        Xóa cache giỏ hàng (Cache-Aside), get_buyer_cart sẽ build lại khi cần.
+        """
+        await self.redis.delete(self._cart_key(buyer_id))
+
     # =================== LẤY GIỎ HÀNG ===================
     async def get_buyer_cart(self, buyer_id: int):
         # Read-Through: Đọc Cache trước, nếu miss thì gọi refresh
@@ -158,6 +164,9 @@ class CartServiceAsync:
             size_res = await self.db.execute(size_stmt)
             size_obj = size_res.scalar_one_or_none()
 
+            if size_obj and not size_obj.in_stock:
+                raise HTTPException(400, detail="Sản phẩm đã hết hàng")
+
             if not size_obj or size_obj.available_units < quantity:
                 raise HTTPException(400,
                                     detail=f"Sản phẩm không đủ tồn kho (Còn lại: {size_obj.available_units if size_obj else 0})")
@@ -3,7 +3,7 @@ from decimal import Decimal
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Config
@@ -17,7 +17,9 @@ from ...schemas.common import Page, PageMeta
 from ...schemas.discount import DiscountResponse
 
 # Services
+from ..common.discount_index import discount_index
 from ..common.discount_service import BaseDiscountService
+from ..common.discount_usage_service import discount_usage_service
 
 class DiscountService(BaseDiscountService):
     # =============== ĐƯA RA DANH SÁCH MÃ GIẢM GIÁ =================
@@ -54,45 +56,26 @@ class DiscountService(BaseDiscountService):
         limit: int,
         offset: int
     ):
-        now = date.today()
-
-        stmt = select(Discount).where(
-            Discount.is_active == True,
-            Discount.start_date <= now,
-            Discount.end_date >= now,
-            Discount.min_order_value <= cart_total,
-            Discount.usage_limit > Discount.used_count
-        )
+        # Index mã đang hiệu lực trong process (bisect theo min_order_value), lượt còn lại từ bộ đếm Redis
+        discounts = await discount_index.eligible(self.db, cart_total)
 
         if q:
-            stmt = stmt.where(Discount.code.ilike(f"%{q}%"))
-
-        # COUNT
-        count_stmt = select(func.count()).select_from(stmt.subquery())
-        total = await self.db.scalar(count_stmt)
+            keyword = q.upper()
+            discounts = [d for d in discounts if keyword in d["code"].upper()]
 
         # ORDER + PAGINATION
-        remaining = Discount.usage_limit - Discount.used_count 
-
-        stmt = (
-            stmt
-            .order_by(
-                remaining.asc(),          # sắp hết lượt
-                Discount.end_date.asc()   # sắp hết hạn
-            )
-            .offset(offset)
-            .limit(limit)
-        )
-        result = await self.db.execute(stmt)
-        discounts = result.scalars().all()
+        discounts.sort(key=lambda d: (
+            d["usage_limit"] - d["used_count"] if d["usage_limit"] is not None else float("inf"),  # sắp hết lượt
+            d["end_date"]                                                                           # sắp hết hạn
+        ))
 
         return Page(
             meta=PageMeta(
-                total=total,
+                total=len(discounts),
                 limit=limit,
                 offset=offset
             ),
-        data=discounts
+        data=discounts[offset:offset + limit]
         )
     
     # ======================== KIỂM TRA MÃ GIẢM GIÁ NGƯỜI DÙNG NHẬP CÓ ÁP DỤNG ĐƯỢC KHÔNG ==================
@@ -149,38 +132,15 @@ class DiscountService(BaseDiscountService):
 
     # ================================== GỢI Ý MÃ GIẢM GIÁ TỐT NHẤT =======================
     async def get_best_discount(self, cart_total: int):
-        now = date.today()
-        stmt = select(Discount).where(
-            Discount.is_active == True,
-            Discount.start_date <= now,
-            Discount.end_date >= now,
-            Discount.min_order_value <= cart_total,
-            Discount.usage_limit > Discount.used_count
-        )
-
-        result = await self.db.execute(stmt)
-        discounts = result.scalars().all()
-
-        if not discounts:
+        best = await discount_index.best(self.db, cart_total)
+        if best is None:
             return None
 
-        def estimate(d: Discount):
-            discount_amount = (
-                Decimal(cart_total)
-                * Decimal(d.discount_percent)
-                / Decimal(100)
-            )
-            if d.max_discount:
-                discount_amount = min(discount_amount, d.max_discount)
-            return discount_amount
-
-        best = max(discounts, key=estimate)
-
         return {
-            "discount_id": best.discount_id,
-            "code": best.code,
-            "discount_percent": float(best.discount_percent),
-            "estimated_discount": int(estimate(best))
+            "discount_id": best["discount_id"],
+            "code": best["code"],
+            "discount_percent": float(best["discount_percent"]),
+            "estimated_discount": int(discount_index.estimate(best, cart_total))
         }
     
     # =================== PREVIEW ÁP DỤNG VOUCHER (DÙNG CHO USER KÍCH VÔ VOUCHER ĐÓ) ==================
@@ -215,8 +175,9 @@ class DiscountService(BaseDiscountService):
                 "message": f"Đơn hàng tối thiểu {int(discount.min_order_value)}"
             }
 
-        # Hết lượt
-        if discount.usage_limit <= discount.used_count:
+        # Hết lượt (bộ đếm Redis gồm cả lượt chưa ghi xuống DB)
+        used = (await discount_usage_service.get_used([discount_id])).get(discount_id, discount.used_count)
+        if discount.usage_limit is not None and discount.usage_limit <= used:
             return {
                 "valid": False,
                 "final_total": cart_total,
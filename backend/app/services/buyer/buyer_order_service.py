@@ -1,15 +1,20 @@
-from datetime import date, datetime
+import hashlib
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 from fastapi import Depends, HTTPException, status
 from redis.asyncio import Redis
-from sqlalchemy import and_, desc, select, update
+from sqlalchemy import Integer, and_, any_, delete, desc, func, insert, literal, select, true, tuple_, union_all, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
 
 # Config
 from ...config.db import get_db
 from ...config.redis import get_redis_client
+from ...config.settings import settings
 from ...config.s3 import public_url
 
 # Models
@@ -17,18 +22,28 @@ from ...models import (
     Address,
     BuyerAddress,
     Carrier,
+    Checkout,
     Discount,
     Order,
     OrderItem,
     Product,
+    ProductImage,
     ProductSize,
     ProductVariant,
+    Seller,
     ShoppingCart,
     ShoppingCartItem,
 )
 
 # Services
 from ...services.buyer.buyer_cart_service import CartServiceAsync
+from ...services.common.carrier_table import carrier_table
+from ...services.common.checkout_session_store import checkout_session_store
+from ...services.common.discount_usage_service import DiscountUsageService, discount_usage_service
+from ...services.common.inventory_service import inventory_service
+from ...services.common.order_tab_cache import order_tab_cache
+from ...services.common.order_transition_service import order_transition_service
+from ...services.common.outbox_service import outbox_service
 
 # Schemas
 from ...schemas.address import AddressResponse, AddressUpdate
@@ -36,6 +51,14 @@ from ...schemas.carrier import  CarrierResponse
 from ...schemas.common import OrderStatus, PaymentStatus
 from ...schemas.order import (
     BuyerOrderTrackingItem,
+    BuyerOrderTrackingPage,
+    CheckoutCarrierQuote,
+    CheckoutHoldResponse,
+    CheckoutResponse,
+    CheckoutSessionCreate,
+    CheckoutSessionDiscount,
+    CheckoutSessionLine,
+    CheckoutSessionResponse,
     OrderCreate,
     OrderDetailResponse,
     OrderItemResponseNew,
@@ -45,10 +68,13 @@ from ...schemas.order import (
 
 # Tasks
 from ...tasks.admin_dashboard_task import task_admin_add_order_stats
-from ...tasks.inventory import update_stock_db
 from ...tasks.notification_task import task_send_notification
+from ...tasks.order_task import task_release_reservations
 from ...tasks.seller_dashboard_task import task_seller_recalc_dashboard
 
+# Làm tròn tiền về 2 chữ số thập phân (numeric(10,2))
+CENT = Decimal("0.01")
+
 # ===================== TAB MAPPING =====================
 TAB_MAPPING = {
     "all": {},
@@ -83,22 +109,105 @@ class BuyerOrderService:
         self.db = db
         self.cart_service = cart_service
 
-    async def _get_order_with_items(self, buyer_id: int, order_id: int) -> Order:
-        """Lấy thông tin đơn hàng kèm danh sách items"""
-        from sqlalchemy.orm import selectinload
-        
+    async def _load_missing_stock(self, shortfalls: list[dict]) -> bool:
+        """
+        Cache miss -> nạp tồn kho các size thiếu key từ DB lên Redis (SETNX).
+        Trả về True nếu có size được nạp (caller nên thử giữ kho lại 1 lần).
+        """
+        missing = [s["size_id"] for s in shortfalls if s["available"] < 0]
+        if not missing:
+            return False
+
+        print(f"[CACHE MISS] Stock keys for sizes {missing} not found in Redis, loading from DB")
+        rows = await self.db.execute(
+            select(ProductSize.size_id, ProductSize.available_units)
+            .where(ProductSize.size_id.in_(missing))
+        )
+        await inventory_service.init_stock_if_missing(dict(rows.all()))
+        return True
+
+    @staticmethod
+    def _raise_shortfalls(names: dict[int, str], shortfalls: list[dict]):
+        """names: size_id -> tên sản phẩm để báo lỗi"""
+        detail = ", ".join(
+            f"{names.get(s['size_id'], s['size_id'])} (còn {max(s['available'], 0)})"
+            for s in shortfalls
+        )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Sản phẩm đã hết hàng hoặc không đủ số lượng: {detail}"
+        )
+
+    async def _reserve_stock(self, reserved: list[tuple[int, int]], names: dict[int, str]) -> list[tuple[int, int]]:
+        """
+        Giữ kho cho toàn bộ (size_id, quantity) được chọn bằng 1 Lua script (all-or-nothing).
+        Trả về danh sách đã giữ để hoàn lại nếu giao dịch lỗi.
+        """
+        shortfalls = await inventory_service.reserve_items(reserved)
+
+        if await self._load_missing_stock(shortfalls):
+            shortfalls = await inventory_service.reserve_items(reserved)
+
+        if shortfalls:
+            self._raise_shortfalls(names, shortfalls)
+
+        return reserved
+
+    async def _get_primary_image_keys(self, product_ids: set[int]) -> dict[int, str]:
+        """Object key ảnh đại diện của mỗi sản phẩm: ưu tiên ảnh primary, không có thì ảnh đầu tiên"""
+        if not product_ids:
+            return {}
+        rows = await self.db.execute(
+            select(ProductImage.product_id, ProductImage.image_url)
+            .where(ProductImage.product_id.in_(product_ids))
+            .order_by(ProductImage.product_id, ProductImage.is_primary.desc(), ProductImage.product_image_id)
+            .distinct(ProductImage.product_id)
+        )
+        return {product_id: image_url for product_id, image_url in rows}
+
+    async def _get_buyer_cart_items(self, buyer_id: int, cart_item_ids: list[int]) -> list[ShoppingCartItem]:
         stmt = (
-            select(Order)
-            .options(selectinload(Order.items)) # Chỉ load items
-            .where(Order.order_id == order_id, Order.buyer_id == buyer_id)
+            select(ShoppingCartItem)
+            .join(ShoppingCart, ShoppingCart.shopping_cart_id == ShoppingCartItem.shopping_cart_id)
+            .options(selectinload(ShoppingCartItem.product))
+            .where(
+                ShoppingCart.buyer_id == buyer_id,
+                ShoppingCartItem.shopping_cart_item_id.in_(cart_item_ids)
+            )
         )
-        result = await self.db.execute(stmt)
-        order = result.scalar_one_or_none()
-        
-        if not order:
-            raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng hoặc bạn không có quyền")
-            
-        return order
+        items = (await self.db.execute(stmt)).scalars().all()
+        if not items:
+            raise HTTPException(400, "Sản phẩm chọn không hợp lệ")
+        return items
+
+    # ===================== GIỮ KHO TẠM KHI VÀO TRANG THANH TOÁN =====================
+    async def create_checkout_hold(self, buyer_id: int, cart_item_ids: list[int]):
+        """
+        Giữ kho cho các item đang checkout trong STOCK_HOLD_TTL_SECONDS giây.
+        Hết hạn mà chưa đặt hàng -> sweeper tự trả lại kho.
+        """
+        selected_items = await self._get_buyer_cart_items(buyer_id, cart_item_ids)
+        items = [(item.size_id, item.quantity) for item in selected_items if item.size_id]
+
+        hold_id, expire_at, shortfalls = await inventory_service.create_hold(buyer_id, items)
+        if await self._load_missing_stock(shortfalls):
+            hold_id, expire_at, shortfalls = await inventory_service.create_hold(buyer_id, items)
+
+        if shortfalls:
+            self._raise_shortfalls({item.size_id: item.product.name for item in selected_items}, shortfalls)
+
+        return CheckoutHoldResponse(
+            hold_id=hold_id,
+            expires_at=datetime.fromtimestamp(expire_at) if expire_at else None
+        )
+
+    async def release_checkout_hold(self, buyer_id: int, hold_id: str):
+        """Buyer rời trang thanh toán -> trả kho ngay, không chờ hết hạn"""
+        if not hold_id.startswith(f"{buyer_id}:"):
+            raise HTTPException(404, "Không tìm thấy phiên giữ hàng")
+
+        released = await inventory_service.release_hold(hold_id)
+        return {"released": released}
     
     # ===================== LẤY CHI TIẾT CÁC SẢN PHẨM ĐÃ CHỌN ĐỂ THANH TOÁN =====
     async def get_selected_cart_items(self, shopping_cart_item_ids: list[int]):
@@ -174,203 +283,511 @@ class BuyerOrderService:
 
         return data
     
-    # ===================== TẠO ĐƠN HÀNG =====================
-    async def place_order(
-        self,
-        buyer_id: int,
-        payload: OrderCreate  # payload có thể thêm field cart_item_ids: list[int]
-    ) -> Order:
-        # Lấy giỏ hàng
+    # ===================== TÍNH GIÁ PHIÊN CHECKOUT =====================
+    async def _load_checkout_items(self, buyer_id: int, cart_item_ids: list[int]) -> list[ShoppingCartItem]:
+        """Các dòng giỏ hàng được chọn kèm sản phẩm, shop, phân loại, size: 1 câu SELECT (joinedload)"""
+        if not cart_item_ids:
+            raise HTTPException(400, "Bạn chưa chọn sản phẩm nào")
+
         stmt = (
-            select(ShoppingCart)
+            select(ShoppingCartItem)
+            .join(ShoppingCart, ShoppingCart.shopping_cart_id == ShoppingCartItem.shopping_cart_id)
             .options(
-                selectinload(ShoppingCart.items)
-                .selectinload(ShoppingCartItem.product)
-                .selectinload(Product.variants),      # load variants
-                selectinload(ShoppingCart.items)
-                .selectinload(ShoppingCartItem.variant)  # load variant đã chọn
+                joinedload(ShoppingCartItem.product).joinedload(Product.seller),
+                joinedload(ShoppingCartItem.variant),
+                joinedload(ShoppingCartItem.size),
+            )
+            .where(
+                ShoppingCart.buyer_id == buyer_id,
+                ShoppingCartItem.shopping_cart_item_id.in_(cart_item_ids)
             )
-            .where(ShoppingCart.buyer_id == buyer_id)
+            .order_by(ShoppingCartItem.shopping_cart_item_id)
         )
-        cart = (await self.db.execute(stmt)).scalar_one_or_none()
-        if not cart or not cart.items:
-            raise HTTPException(400, "Giỏ hàng trống")
-
-        # Lọc các item được chọn
-        if not payload.cart_item_ids:
-            raise HTTPException(400, "Bạn chưa chọn sản phẩm nào")
-        
-        selected_items = [
-            item for item in cart.items if item.shopping_cart_item_id in payload.cart_item_ids
-        ]
-        if not selected_items:
+        items = (await self.db.execute(stmt)).scalars().all()
+        if not items:
             raise HTTPException(400, "Sản phẩm chọn không hợp lệ")
+        return items
+
+    async def _apply_discount(self, priced: dict, discount_id: int | None):
+        """
+        Kiểm tra mã giảm giá với subtotal của phiên và ghi kết quả vào priced["discount"].
+        Discount tính trên subtotal của cả phiên checkout, sau đó chia cho từng đơn con.
+        """
+        if discount_id is None:
+            priced["discount"] = None
+            return
+
+        discount = await self.db.get(Discount, discount_id)
+        # Không tồn tại
+        if not discount or not discount.is_active:
+            raise HTTPException(
+                status_code=404,
+                detail="Mã giảm giá không tồn tại"
+            )
+        now = date.today()
+        # Hết hạn
+        if discount.start_date and now < discount.start_date or \
+            discount.end_date and now > discount.end_date:
+            raise HTTPException(
+                status_code=404,
+                detail="Mã giảm giá chưa có hiệu lực hoặc đã hết hạn"
+            )
+        # Chưa đủ tiền để áp dụng discount
+        subtotal = Decimal(priced["subtotal"])
+        if subtotal < discount.min_order_value:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Đơn hàng tối thiểu {discount.min_order_value} để áp dụng mã giảm giá"
+            )
+        # Hết lượt (bộ đếm Redis gồm cả lượt chưa ghi xuống DB)
+        used = (await discount_usage_service.get_used([discount_id])).get(discount_id, discount.used_count)
+        if discount.usage_limit is not None and used >= discount.usage_limit:
+            raise HTTPException(400, "Mã giảm giá đã hết lượt sử dụng")
+
+        discount_amount = subtotal * Decimal(discount.discount_percent) / Decimal(100)
+        if discount.max_discount:
+            discount_amount = min(discount_amount, discount.max_discount)
+
+        priced["discount"] = {
+            "discount_id": discount.discount_id,
+            "code": discount.code,
+            "discount_percent": discount.discount_percent,
+            "max_discount": discount.max_discount,
+            "discount_amount": Decimal(discount_amount).quantize(CENT),
+        }
 
-        # 2. VALIDATE TỒN KHO TRƯỚC KHI LÀM BẤT CỨ VIỆC GÌ (Reserve Stock Logic)
-        #Việc này đảm bảo 100% không bao giờ bán lố
-        # for item in selected_items:
-        #     stock_stmt = select(ProductSize).where(ProductSize.size_id == item.size_id).with_for_update()
-        #     stock_res = await self.db.execute(stock_stmt)
-        #     size_obj = stock_res.scalar_one_or_none()
+    async def _price_checkout(self, buyer_id: int, cart_item_ids: list[int], discount_id: int | None) -> dict:
+        """
+        Tính giá 1 lần cho các dòng giỏ hàng được chọn:
+        giá từng dòng + snapshot, subtotal / khối lượng theo từng seller, báo giá ship của mọi carrier,
+        mã giảm giá. Kết quả ở dạng JSON (tiền là chuỗi Decimal) để lưu thẳng vào phiên checkout.
+        """
+        items = await self._load_checkout_items(buyer_id, cart_item_ids)
 
-        #     if not size_obj or size_obj.available_units < item.quantity:
-        #         raise HTTPException(400, f"Hết hàng: {item.product.name}")
-            
-        #     # TRỪ LUÔN TẠI ĐÂY
-        #     size_obj.available_units -= item.quantity
+        # Ảnh primary (hoặc ảnh đầu tiên) của từng sản phẩm để lưu snapshot vào order_item
+        image_keys = await self._get_primary_image_keys({item.product_id for item in items})
 
-        # Validate buyer_address_id
-        address = await self.db.get(BuyerAddress, payload.buyer_address_id)
-        if not address or address.buyer_id != buyer_id:
-            raise HTTPException(403, "Địa chỉ không hợp lệ")
+        lines = []
+        seller_subtotals = defaultdict(Decimal)
+        seller_weights = defaultdict(Decimal)
+        for item in items:
+            product = item.product
+            variant_price = item.variant.price_adjustment if item.variant else 0
+            list_price = Decimal(product.base_price + variant_price).quantize(CENT)
+            unit_price = (list_price * (100 - product.discount_percent) / 100).quantize(CENT)
+            weight = Decimal(product.weight or 0)
+
+            seller_subtotals[product.seller_id] += unit_price * item.quantity
+            seller_weights[product.seller_id] += weight * item.quantity
+            lines.append({
+                "shopping_cart_item_id": item.shopping_cart_item_id,
+                "product_id": item.product_id,
+                "product_name": product.name,
+                "variant_id": item.variant_id,
+                "variant_name": item.variant.variant_name if item.variant else None,
+                "size_id": item.size_id,
+                "size_name": item.size.size_name if item.size else None,
+                "quantity": item.quantity,
+                "unit_price": unit_price,
+                "list_price": list_price,
+                "total_price": unit_price * item.quantity,
+                "weight": weight,
+                "image_url": image_keys.get(item.product_id),
+                "seller_id": product.seller_id,
+                "shop_name": product.seller.shop_name if product.seller else None,
+            })
 
-        # Tính subtotal
-        subtotal = sum(
-            (Decimal(item.product.base_price + (item.variant.price_adjustment if item.variant else 0))
-            * (100 - Decimal(item.product.discount_percent)) / 100) * item.quantity
-            for item in selected_items
+        # Mỗi seller giao 1 kiện riêng -> phí ship theo khối lượng của từng seller, báo giá cho mọi carrier
+        # (bảng carrier trong process, không query DB)
+        carriers = await carrier_table.all(self.db)
+
+        priced = {
+            "buyer_id": buyer_id,
+            "cart_item_ids": [line["shopping_cart_item_id"] for line in lines],
+            "lines": lines,
+            "seller_subtotals": {str(s): v.quantize(CENT) for s, v in seller_subtotals.items()},
+            "seller_weights": {str(s): v for s, v in seller_weights.items()},
+            "subtotal": sum(v.quantize(CENT) for v in seller_subtotals.values()),
+            "total_weight": sum(seller_weights.values()),
+            "carriers": {
+                str(c["carrier_id"]): {
+                    "carrier_name": c["carrier_name"],
+                    "carrier_avt_url": c["carrier_avt_url"],
+                    "shipping": {
+                        str(s): carrier_table.fee(c, w).quantize(CENT)
+                        for s, w in seller_weights.items()
+                    },
+                }
+                for c in carriers
+            },
+        }
+        await self._apply_discount(priced, discount_id)
+        return priced
+
+    async def _pricing_version(self, priced: dict) -> str:
+        """
+        "Phiên bản" giá của phiên checkout: hash các cột ảnh hưởng tới giá / phí ship của dòng giỏ hàng,
+        sản phẩm, phân loại và đơn vị vận chuyển. 1 câu UNION ALL tra theo khoá chính.
+        Không dùng xmin: sold_quantity / rating của product đổi liên tục sẽ làm phiên mất hiệu lực oan.
+        Mã giảm giá không nằm trong hash: lúc đặt hàng được kiểm tra lại bằng 1 câu SELECT (hiệu lực, %, mức trần)
+        và lượt dùng bằng Lua script trên Redis (discount_usage_service.redeem).
+        """
+        lines = priced["lines"]
+        variant_ids = {line["variant_id"] for line in lines if line["variant_id"]}
+        parts = [
+            select(
+                literal("i"), ShoppingCartItem.shopping_cart_item_id,
+                func.concat_ws("|", ShoppingCartItem.product_id, ShoppingCartItem.variant_id,
+                               ShoppingCartItem.size_id, ShoppingCartItem.quantity)
+            ).where(ShoppingCartItem.shopping_cart_item_id.in_(priced["cart_item_ids"])),
+            select(
+                literal("p"), Product.product_id,
+                func.concat_ws("|", Product.seller_id, Product.base_price, Product.discount_percent,
+                               Product.weight, Product.is_active)
+            ).where(Product.product_id.in_({line["product_id"] for line in lines})),
+            select(
+                literal("c"), Carrier.carrier_id,
+                func.concat_ws("|", Carrier.base_price, Carrier.price_per_kg, Carrier.is_active)
+            ).where(Carrier.carrier_id.in_([int(c) for c in priced["carriers"]])),
+        ]
+        if variant_ids:
+            parts.append(
+                select(
+                    literal("v"), ProductVariant.variant_id,
+                    func.concat_ws("|", ProductVariant.product_id, ProductVariant.price_adjustment)
+                ).where(ProductVariant.variant_id.in_(variant_ids))
+            )
+
+        rows = (await self.db.execute(union_all(*parts))).all()
+        digest = hashlib.sha256()
+        for kind, key, value in sorted(rows):
+            digest.update(f"{kind}:{key}:{value};".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _checkout_session_response(session: dict) -> CheckoutSessionResponse:
+        subtotal = Decimal(session["subtotal"])
+        discount = session["discount"]
+        discount_amount = Decimal(discount["discount_amount"]) if discount else Decimal(0)
+        return CheckoutSessionResponse(
+            checkout_session_id=session["checkout_session_id"],
+            expires_at=session["expires_at"],
+            items=[
+                CheckoutSessionLine(
+                    **line,
+                    public_image_url=public_url(line["image_url"]) if line["image_url"] else None
+                )
+                for line in session["lines"]
+            ],
+            subtotal=subtotal,
+            total_weight=session["total_weight"],
+            discount=CheckoutSessionDiscount(**discount) if discount else None,
+            carriers=[
+                CheckoutCarrierQuote(
+                    carrier_id=int(carrier_id),
+                    carrier_name=quote["carrier_name"],
+                    carrier_avt_url=public_url(quote["carrier_avt_url"]) if quote["carrier_avt_url"] else None,
+                    shipping_price=sum(Decimal(v) for v in quote["shipping"].values()),
+                    total_price=subtotal + sum(Decimal(v) for v in quote["shipping"].values()) - discount_amount,
+                )
+                for carrier_id, quote in session["carriers"].items()
+            ],
         )
 
-        # Tính discount (nếu có)
-        discount_amount = Decimal(0)
-        discount_id = payload.discount_id  # giữ giá trị ban đầu
-        if discount_id is not None:
-            discount = await self.db.get(Discount, payload.discount_id)
-            # Không tồn tại
-            if not discount:
-                    raise HTTPException(
-                status_code=404,
-                detail="Mã giảm giá không tồn tại"
+    # ===================== PHIÊN CHECKOUT (TÍNH GIÁ 1 LẦN, LƯU REDIS) =====================
+    async def create_checkout_session(self, buyer_id: int, payload: CheckoutSessionCreate):
+        """
+        Vào trang thanh toán: tính giá, khối lượng, báo giá ship mọi carrier và mã giảm giá 1 lần,
+        lưu trên Redis CHECKOUT_SESSION_TTL_SECONDS giây. place_order nhận checkout_session_id để dùng lại.
+        """
+        priced = await self._price_checkout(buyer_id, payload.cart_item_ids, payload.discount_id)
+        priced["version"] = await self._pricing_version(priced)
+
+        session_id = checkout_session_store.new_id(buyer_id)
+        priced["checkout_session_id"] = session_id
+        priced["expires_at"] = datetime.now() + timedelta(seconds=settings.CHECKOUT_SESSION_TTL_SECONDS)
+        await checkout_session_store.save(session_id, priced)
+
+        return self._checkout_session_response(json.loads(json.dumps(priced, default=str)))
+
+    async def _get_checkout_session(self, buyer_id: int, session_id: str) -> dict:
+        session = await checkout_session_store.get(buyer_id, session_id)
+        if session is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Phiên thanh toán đã hết hạn, vui lòng tải lại trang thanh toán"
             )
-            now = date.today()
-            # Hết hạn
-            if discount.start_date and now < discount.start_date or \
-                discount.end_date and now > discount.end_date:
-                    raise HTTPException(
-                        status_code=404,
-                        detail="Mã giảm giá chưa có hiệu lực hoặc đã hết hạn"
-                    )
-            # Chưa đủ tiền để áp dụng discount
-            if subtotal < discount.min_order_value:
+        return session
+
+    async def get_checkout_session(self, buyer_id: int, session_id: str):
+        return self._checkout_session_response(await self._get_checkout_session(buyer_id, session_id))
+
+    async def update_checkout_session_discount(self, buyer_id: int, session_id: str, discount_id: int | None):
+        """Đổi / bỏ mã giảm giá của phiên: chỉ tính lại phần discount, giữ nguyên dòng hàng và báo giá ship"""
+        session = await self._get_checkout_session(buyer_id, session_id)
+        await self._apply_discount(session, discount_id)
+        await checkout_session_store.save(session_id, session, keep_ttl=True)
+        return self._checkout_session_response(json.loads(json.dumps(session, default=str)))
+
+    # ===================== TẠO ĐƠN HÀNG =====================
+    async def place_order(
+        self,
+        buyer_id: int,
+        payload: OrderCreate  # payload có thể thêm field cart_item_ids: list[int]
+    ) -> CheckoutResponse:
+        """
+        Đặt hàng: 1 phiên checkout, tách thành 1 đơn cho mỗi seller trong cùng 1 transaction.
+        Phí ship tính theo khối lượng của từng seller, discount chia theo tỉ lệ subtotal.
+        Có checkout_session_id -> dùng giá đã tính trong phiên (chỉ kiểm tra phiên bản giá),
+        không có -> tính giá từ giỏ hàng như trước.
+        """
+        if payload.checkout_session_id:
+            priced = await self._get_checkout_session(buyer_id, payload.checkout_session_id)
+            if payload.cart_item_ids and sorted(payload.cart_item_ids) != sorted(priced["cart_item_ids"]):
+                raise HTTPException(409, "Sản phẩm đặt hàng khác với phiên thanh toán")
+            session_discount_id = priced["discount"]["discount_id"] if priced["discount"] else None
+            if payload.discount_id is not None and payload.discount_id != session_discount_id:
+                raise HTTPException(409, "Mã giảm giá khác với phiên thanh toán")
+            if await self._pricing_version(priced) != priced["version"]:
+                await checkout_session_store.delete(payload.checkout_session_id)
                 raise HTTPException(
-                    status_code=404,
-                    detail=f"Đơn hàng tối thiểu {discount.min_order_value} để áp dụng mã giảm giá"
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Giá sản phẩm, giỏ hàng hoặc phí vận chuyển đã thay đổi, vui lòng tải lại trang thanh toán"
                 )
-    
-            # Tính discount trực tiếp trên subtotal
-            percent = Decimal(discount.discount_percent)
-            discount_amount = (Decimal(subtotal) * percent) / Decimal(100)
-
-            if discount.max_discount:
-                discount_amount = min(discount_amount, discount.max_discount)
         else:
-            discount_id = None  # đảm bảo insert DB không bị lỗi ForeignKey
-        # Shipping
-        carrier = await self.db.get(Carrier, payload.carrier_id)
-        if not carrier or not carrier.is_active:
+            priced = await self._price_checkout(buyer_id, payload.cart_item_ids, payload.discount_id)
+
+        lines = priced["lines"]
+
+        # Validate buyer_address_id
+        address = await self.db.get(BuyerAddress, payload.buyer_address_id)
+        if not address or address.buyer_id != buyer_id:
+            raise HTTPException(403, "Địa chỉ không hợp lệ")
+
+        # Shipping: báo giá của carrier đã chọn (mỗi seller 1 kiện)
+        quote = priced["carriers"].get(str(payload.carrier_id))
+        if quote is None:
             raise HTTPException(400, "Đơn vị vận chuyển không hợp lệ")
 
-        total_weight = sum(
-            Decimal(item.product.weight or 0) * item.quantity
-            for item in selected_items
-        )
-        shipping_price = Decimal(carrier.base_price) + Decimal(carrier.price_per_kg) * total_weight
+        seller_subtotals = {int(s): Decimal(v) for s, v in priced["seller_subtotals"].items()}
+        seller_shipping = {int(s): Decimal(v) for s, v in quote["shipping"].items()}
+        subtotal = sum(seller_subtotals.values())
+        shipping_price = sum(seller_shipping.values())
+
+        discount = priced["discount"]
+        discount_id = discount["discount_id"] if discount else None
+        discount_amount = Decimal(discount["discount_amount"]) if discount else Decimal(0)
+        seller_discounts = self._split_discount(discount_amount, seller_subtotals)
 
         # Tổng tiền
         total_price = subtotal + shipping_price - discount_amount
 
-        #Tạo Order
-        order = Order(
-            buyer_id=buyer_id,
-            buyer_address_id=payload.buyer_address_id,
-            payment_method=payload.payment_method,
-            subtotal=subtotal,
-            shipping_price=shipping_price,
-            discount_amount=discount_amount,
-            total_price=total_price,
-            order_status=OrderStatus.pending,
-            payment_status=PaymentStatus.pending,
-            discount_id=payload.discount_id,
-            carrier_id=payload.carrier_id,
-            notes=payload.notes
-        )
-        self.db.add(order)
-        await self.db.flush()  # để lấy order_id
+        # 2. GIỮ KHO TRÊN REDIS (1 Lua script cho tất cả item, all-or-nothing)
+        # Đảm bảo không bán lố mà không cần khóa dòng product_size trên Postgres
+        # Có hold từ bước checkout -> chuyển hold thành trừ kho chính thức
+        stock_items = [(line["size_id"], line["quantity"]) for line in lines if line["size_id"]]
+        reserved = None
+        if payload.hold_id:
+            reserved = await inventory_service.commit_hold(buyer_id, payload.hold_id, stock_items)
+        if reserved is None:
+            reserved = await self._reserve_stock(
+                stock_items, {line["size_id"]: line["product_name"] for line in lines}
+            )
 
-        #Tạo OrderItem
-        for item in selected_items:
-            variant_price = item.variant.price_adjustment if item.variant else 0
-            unit_price = (item.product.base_price + variant_price) * (100 - item.product.discount_percent) / 100
-            order_item = OrderItem(
-                order_id=order.order_id,
-                product_id=item.product_id,
-                variant_id=item.variant_id,
-                size_id=item.size_id,
-                quantity=item.quantity,
-                unit_price=unit_price,
-                total_price=unit_price * item.quantity
+        redeemed = False
+        try:
+            # 1. DÙNG 1 LƯỢT MÃ GIẢM GIÁ: kiểm tra hiệu lực bằng 1 câu SELECT (không khoá dòng discount),
+            #    kiểm tra usage_limit + cộng lượt bằng Lua trên Redis; lượt dùng ghi vào discount_usage_delta
+            #    cùng transaction (bước 6), used_count ghi xuống DB theo batch
+            #    Điều kiện kèm % giảm / mức trần / hiệu lực đúng như lúc tính giá
+            if discount_id is not None:
+                today = date.today()
+                limits = (await self.db.execute(
+                    select(Discount.usage_limit, DiscountUsageService.used_count_column())
+                    .where(
+                        Discount.discount_id == discount_id,
+                        Discount.is_active == True,
+                        Discount.start_date <= today,
+                        Discount.end_date >= today,
+                        Discount.min_order_value <= subtotal,
+                        Discount.discount_percent == Decimal(discount["discount_percent"]),
+                        Discount.max_discount.is_not_distinct_from(
+                            Decimal(discount["max_discount"]) if discount["max_discount"] is not None else None
+                        )
+                    )
+                )).one_or_none()
+                if limits is None or not await discount_usage_service.redeem(
+                    discount_id, limits.usage_limit, limits.used_count
+                ):
+                    raise HTTPException(400, "Mã giảm giá đã hết lượt sử dụng hoặc không còn hiệu lực")
+                redeemed = True
+
+            # 2. TẠO CHECKOUT + 1 ORDER CHO MỖI SELLER (INSERT ... RETURNING)
+            checkout = (await self.db.execute(
+                insert(Checkout)
+                .values(
+                    buyer_id=buyer_id,
+                    payment_method=payload.payment_method,
+                    subtotal=subtotal,
+                    shipping_price=shipping_price,
+                    discount_amount=discount_amount,
+                    total_price=total_price,
+                    discount_id=discount_id
+                )
+                .returning(Checkout)
+            )).scalar_one()
+
+            seller_ids = list(seller_subtotals.keys())
+            orders = (await self.db.execute(
+                insert(Order).returning(Order, sort_by_parameter_order=True),
+                [
+                    {
+                        "checkout_id": checkout.checkout_id,
+                        "seller_id": seller_id,
+                        "buyer_id": buyer_id,
+                        "buyer_address_id": payload.buyer_address_id,
+                        "payment_method": payload.payment_method,
+                        "subtotal": seller_subtotals[seller_id],
+                        "shipping_price": seller_shipping[seller_id],
+                        "discount_amount": seller_discounts[seller_id],
+                        "total_price": seller_subtotals[seller_id] + seller_shipping[seller_id]
+                                       - seller_discounts[seller_id],
+                        "order_status": OrderStatus.pending,
+                        "payment_status": PaymentStatus.pending,
+                        "discount_id": discount_id,
+                        "carrier_id": payload.carrier_id,
+                        "notes": payload.notes
+                    }
+                    for seller_id in seller_ids
+                ]
+            )).scalars().all()
+            seller_orders = dict(zip(seller_ids, orders))
+
+            # 3. TẠO ORDER ITEM (1 câu INSERT nhiều dòng) kèm snapshot sản phẩm lúc đặt
+            await self.db.execute(insert(OrderItem).values([
+                {
+                    "order_id": seller_orders[line["seller_id"]].order_id,
+                    "order_date": seller_orders[line["seller_id"]].order_date,
+                    "product_id": line["product_id"],
+                    "variant_id": line["variant_id"],
+                    "size_id": line["size_id"],
+                    "quantity": line["quantity"],
+                    "unit_price": Decimal(line["unit_price"]),
+                    "total_price": Decimal(line["total_price"]),
+                    "product_name": line["product_name"],
+                    "variant_name": line["variant_name"],
+                    "size_name": line["size_name"],
+                    "image_url": line["image_url"],
+                    "list_price": Decimal(line["list_price"]),
+                    "shop_name": line["shop_name"]
+                }
+                for line in lines
+            ]))
+
+            # 4. XÓA CÁC ITEM ĐÃ MUA KHỎI GIỎ HÀNG (1 câu DELETE ... = ANY(array))
+            #    Thiếu dòng nào -> giỏ hàng đã đổi (đặt ở tab khác / xoá) kể từ lúc tính giá
+            deleted = (await self.db.execute(
+                delete(ShoppingCartItem)
+                .where(ShoppingCartItem.shopping_cart_item_id == any_(
+                    literal(priced["cart_item_ids"], ARRAY(Integer))
+                ))
+                .returning(ShoppingCartItem.shopping_cart_item_id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            if len(deleted) != len(lines):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Giỏ hàng đã thay đổi, vui lòng tải lại trang thanh toán"
+                )
+
+            # 5. OUTBOX: dashboard + thông báo cho tất cả seller, ghi cùng transaction với đơn
+            await outbox_service.enqueue(
+                self.db,
+                [outbox_service.task(task_seller_recalc_dashboard, seller_id) for seller_id in seller_ids]
+                + [
+                    outbox_service.task(
+                        task_send_notification,
+                        user_id=seller_id,
+                        role="seller",
+                        title="Đơn hàng mới",
+                        message=f"Đơn hàng mới #{order.order_id}",
+                        event_type="NEW_ORDER",
+                        data={"order_id": order.order_id}
+                    )
+                    for seller_id, order in seller_orders.items()
+                ]
             )
-            self.db.add(order_item)
-
-        # 5. CLEAR CÁC ITEM ĐÃ MUA KHỎI GIỎ HÀNG TRONG DATABASE
-        for item in selected_items:
-            await self.db.delete(item)
-        # 1.5 CẬP NHẬT USED_COUNT CỦA DISCOUNT (Nếu có dùng mã)
-        if payload.discount_id is not None:
-            # Truy vấn lại discount với row-level lock để tránh race condition
-            discount_stmt = select(Discount).where(Discount.discount_id == payload.discount_id).with_for_update()
-            discount_obj = (await self.db.execute(discount_stmt)).scalar_one_or_none()
-            
-            if discount_obj:
-                # Kiểm tra lại giới hạn sử dụng một lần nữa trước khi tăng count
-                if discount_obj.usage_limit is not None and discount_obj.used_count >= discount_obj.usage_limit:
-                    raise HTTPException(400, "Mã giảm giá đã hết lượt sử dụng")
-                
-                # Tăng số lần đã dùng
-                discount_obj.used_count += 1
-
-        # 6. COMMIT DATABASE
-        # Bước này chốt hạ dữ liệu trong MySQL
-        await self.db.commit()
-        await self.db.refresh(order)
-
-        await self.cart_service._refresh_cart_cache(buyer_id)
-        # 7. GỌI CÁC TASK CHẠY NGẦM (CELERY) SAU KHI COMMIT THÀNH CÔNG
-        # Chỉ trừ kho thực tế sau khi đơn hàng đã chắc chắn được tạo thành công
-        for item in selected_items:
-            # update_stock_db.delay thực hiện trừ (-) số lượng trong bảng ProductSize
-            update_stock_db.delay(item.size_id, -item.quantity)
-
-        # Lấy seller_id (giả sử đơn hàng thuộc về 1 seller hoặc lấy seller của item đầu tiên)
-        seller_id = selected_items[0].product.seller_id
-
-        # Cập nhật thông số Dashboard cho người bán (nặng nề nên chạy ngầm)
-        task_seller_recalc_dashboard.delay(seller_id) 
-        
-        # Gửi thông báo Notification cho người bán (phụ thuộc bên thứ 3 nên chạy ngầm)
-        task_send_notification.delay(
-            user_id=seller_id,
-            role="seller",          # Sửa từ user_type thành role
-            title="Đơn hàng mới",    # Thêm title (hàm yêu cầu)
-            message=f"Đơn hàng mới #{order.order_id}",
-            event_type="NEW_ORDER", # Thêm event_type (hàm yêu cầu)
-            data={"order_id": order.order_id}
+
+            # 6. TRỪ KHO THỰC TẾ: delta (-) ghi vào stock_delta cùng transaction với đơn,
+            #    worker write-back ghi net delta xuống ProductSize; lượt dùng mã (+1) vào discount_usage_delta
+            await inventory_service.queue_stock_deltas(
+                self.db, [(size_id, -quantity) for size_id, quantity in reserved]
+            )
+            if redeemed:
+                await discount_usage_service.queue_usage_deltas(self.db, [(discount_id, 1)])
+
+            # 7. COMMIT DATABASE
+            await self.db.commit()
+        except Exception:
+            # Giao dịch DB lỗi -> hoàn lại phần kho và lượt mã giảm giá đã giữ trên Redis
+            await self.db.rollback()
+            await inventory_service.release_items(reserved)
+            if redeemed:
+                await discount_usage_service.release(discount_id)
+            raise
+
+        # Xóa cache giỏ hàng, lần đọc sau tự build lại (không query lại DB trong lúc checkout)
+        await self.cart_service.invalidate_cart_cache(buyer_id)
+        await order_tab_cache.invalidate(buyer_id)
+        if payload.checkout_session_id:
+            await checkout_session_store.delete(payload.checkout_session_id)
+
+        return CheckoutResponse(
+            checkout_id=checkout.checkout_id,
+            order_id=orders[0].order_id,
+            subtotal=checkout.subtotal,
+            shipping_price=checkout.shipping_price,
+            discount_amount=checkout.discount_amount,
+            total_price=checkout.total_price,
+            created_at=checkout.created_at,
+            orders=[OrderResponse.model_validate(order) for order in orders]
         )
 
+    @staticmethod
+    def _split_discount(discount_amount: Decimal, subtotals: dict[int, Decimal]) -> dict[int, Decimal]:
+        """
+        Chia discount của cả phiên checkout cho từng đơn con theo tỉ lệ subtotal.
+        Làm tròn tới 0.01, mỗi phần không vượt subtotal của đơn (total_price không âm).
+        Phần dư (làm tròn / bị chặn) dồn cho seller cuối còn chỗ để tổng khớp đúng discount_amount.
+        """
+        total = sum(subtotals.values())
+        shares = {
+            seller_id: min((discount_amount * subtotal / total).quantize(CENT) if total else Decimal(0), subtotal)
+            for seller_id, subtotal in subtotals.items()
+        }
 
-        return order
+        remainder = discount_amount - sum(shares.values())
+        for seller_id in reversed(list(subtotals)):
+            if remainder == 0:
+                break
+            if remainder > 0:
+                adjust = min(remainder, subtotals[seller_id] - shares[seller_id])
+            else:
+                adjust = max(remainder, -shares[seller_id])
+            shares[seller_id] += adjust
+            remainder -= adjust
+
+        if sum(shares.values()) != discount_amount:
+            raise ValueError(f"Discount split {shares} does not add up to {discount_amount}")
+        return shares
 
    # ===================== CHI TIẾT ĐƠN HÀNG =====================
     async def get_order_detail(self, buyer_id: int, order_id: int):
         stmt = (
             select(Order)
             .options(
-                # --- Phần load Items cũ của bạn (giữ nguyên) ---
-                selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.variants),
-                selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.images),
-                selectinload(Order.items).selectinload(OrderItem.variant),
-                selectinload(Order.items).selectinload(OrderItem.size),
-                selectinload(Order.items).selectinload(OrderItem.product).selectinload(Product.seller),
+                # Item đọc từ snapshot trên order_item, không cần join product/variant/size/ảnh/seller
+                selectinload(Order.items),
 
                 selectinload(Order.shipping_address).selectinload(BuyerAddress.address),
 
@@ -401,34 +818,21 @@ class BuyerOrderService:
         )
 
         items_data = []
-        for item in order.items:
-            product = item.product
-            variant = item.variant
-            size = item.size
-            seller_name = product.seller.shop_name if product.seller else "Unknown Seller"
-
-            primary_image = next((img for img in product.images if img.is_primary), None)
-            image_url = public_url(primary_image.image_url) if primary_image else None
-
-            base_price = Decimal(product.base_price)
-            price_adjustment = Decimal(variant.price_adjustment) if variant else Decimal(0)
-            total_base_price = base_price + price_adjustment
-
-
+        for item in sorted(order.items, key=lambda i: i.order_item_id):
             items_data.append(OrderItemResponseNew(
                 order_item_id=item.order_item_id,
                 order_id=item.order_id,
-                product_id=product.product_id,
-                product_id_name=product.name,
-                variant_id=variant.variant_id if variant else None,
-                variant_name=variant.variant_name if variant else "",
-                size_id=size.size_id if size else None,
-                size_name=size.size_name if size else "",
+                product_id=item.product_id,
+                product_id_name=item.product_name or "",
+                variant_id=item.variant_id,
+                variant_name=item.variant_name or "",
+                size_id=item.size_id,
+                size_name=item.size_name or "",
                 quantity=item.quantity,
                 unit_price=item.unit_price,
-                base_price_plus_adjustment=total_base_price,
-                public_image_url=image_url,
-                seller=seller_name
+                base_price_plus_adjustment=item.list_price if item.list_price is not None else item.unit_price,
+                public_image_url=public_url(item.image_url) if item.image_url else None,
+                seller=item.shop_name or "Unknown Seller"
             ))
 
         order_response = OrderResponse.model_validate(order)
@@ -513,7 +917,34 @@ class BuyerOrderService:
     
     
     # ===================== LIST ORDER (TRACKING VIEW) =====================
-    async def list_orders_tracking(self, buyer_id: int, tab: str):
+    @staticmethod
+    def _encode_tracking_cursor(order_date: datetime, order_id: int) -> str:
+        return f"{order_date.isoformat()}_{order_id}"
+
+    @staticmethod
+    def _decode_tracking_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            raw_date, raw_id = cursor.rsplit("_", 1)
+            return datetime.fromisoformat(raw_date), int(raw_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor không hợp lệ"
+            )
+
+    async def list_orders_tracking(
+        self,
+        buyer_id: int,
+        tab: str,
+        limit: int = 20,
+        cursor: str | None = None
+    ) -> BuyerOrderTrackingPage:
+        """
+        Danh sách đơn cho màn hình "Đơn mua", phân trang keyset theo (order_date, order_id).
+
+        Mỗi đơn chỉ lấy item đầu tiên (LATERAL ... LIMIT 1) + số lượng item,
+        và chỉ select các cột cần hiển thị thay vì load toàn bộ item/ảnh/variant.
+        """
         if tab is None:
             tab = "all"
         if tab not in TAB_MAPPING:
@@ -524,30 +955,49 @@ class BuyerOrderService:
 
         rule = TAB_MAPPING[tab]
 
-        # Eager load các quan hệ cần thiết
-        stmt = (
-            select(Order)
-            .options(
-                selectinload(Order.items)
-                .selectinload(OrderItem.product)
-                .selectinload(Product.variants),
-                
-                selectinload(Order.items)
-                .selectinload(OrderItem.variant),
-
-                selectinload(Order.items)
-                .selectinload(OrderItem.size),
-
-                selectinload(Order.items)
-                .selectinload(OrderItem.product)
-                .selectinload(Product.seller),
+        # Item đầu tiên của mỗi đơn (dùng idx_order_item_order_id), đọc từ snapshot trên order_item
+        first_item = (
+            select(
+                OrderItem.product_id,
+                OrderItem.quantity,
+                OrderItem.unit_price,
+                OrderItem.product_name,
+                OrderItem.variant_name,
+                OrderItem.size_name,
+                OrderItem.image_url,
+                OrderItem.list_price,
+                OrderItem.shop_name,
+            )
+            .where(OrderItem.order_id == Order.order_id, OrderItem.order_date == Order.order_date)
+            .order_by(OrderItem.order_item_id)
+            .limit(1)
+            .lateral("first_item")
+        )
 
-                selectinload(Order.items)
-                .selectinload(OrderItem.product)
-                .selectinload(Product.images)
+        item_count = (
+            select(func.count(OrderItem.order_item_id))
+            .where(OrderItem.order_id == Order.order_id, OrderItem.order_date == Order.order_date)
+            .scalar_subquery()
+        )
+
+        stmt = (
+            select(
+                Order.order_id,
+                Order.order_status,
+                Order.subtotal,
+                Order.total_price,
+                Order.order_date,
+                first_item,
+                Seller.avt_url,
+                item_count.label("item_count"),
             )
+            .select_from(Order)
+            .join(first_item, true())
+            # Chỉ còn lấy avatar hiện tại của shop (theo khoá chính)
+            .outerjoin(Seller, Seller.seller_id == Order.seller_id)
             .where(Order.buyer_id == buyer_id)
-            .order_by(desc(Order.order_date))
+            .order_by(desc(Order.order_date), desc(Order.order_id))
+            .limit(limit + 1)
         )
 
         if "order_status" in rule:
@@ -556,164 +1006,158 @@ class BuyerOrderService:
         if "payment_status" in rule:
             stmt = stmt.where(Order.payment_status.in_(rule["payment_status"]))
 
-        orders = (await self.db.execute(stmt)).scalars().unique().all()
-
-        orders_map = {}
-
-        for order in orders:
-            if not order.items:
-                continue
-
-            first_item_obj = order.items[0]
-            product = first_item_obj.product
-            variant = first_item_obj.variant
-            size = first_item_obj.size
-            seller_name = product.seller.shop_name if product.seller else "Unknown Seller"
-
-            # Lấy ảnh chính nếu có
-            image_url = None
-            if product.images:
-                primary_image = next((img for img in product.images if img.is_primary), None)
-                image_url = public_url(primary_image.image_url) if primary_image else public_url(product.images[0].image_url)
-
-            # Tính base_price + adjustment
-            base_price = float(product.base_price)
-            price_adjustment = float(variant.price_adjustment) if variant else 0
-            total_base_price = base_price + price_adjustment
-
-            orders_map[order.order_id] = {
-                "order": order,
-                "shop_name": seller_name,
-                "shop_url": public_url(product.seller.avt_url),
-                "first_item": {
-                    "product_id": product.product_id,
-                    "product_name": product.name,
-                    "public_url": image_url,
-                    "variant_name": variant.variant_name if variant else None,
-                    "size_name": size.size_name if size else None,
-                    "quantity": first_item_obj.quantity,
-                    "unit_price": float(first_item_obj.unit_price),
-                    "base_price_plus_adjustment": total_base_price
-                },
-                "count": len(order.items)
-            }
-
-        return [
-            BuyerOrderTrackingItem(
-                order_id=data["order"].order_id,
-                order_status=data["order"].order_status,
-                shop_name=data["shop_name"],
-                shop_url=data["shop_url"],
-                first_item=OrderTrackingFirstItem(**data["first_item"]),
-                total_items=data["count"],
-                subtotal=data["order"].subtotal,
-                total_price=data["order"].total_price,
-                order_date=data["order"].order_date
+        if cursor:
+            cursor_date, cursor_id = self._decode_tracking_cursor(cursor)
+            stmt = stmt.where(tuple_(Order.order_date, Order.order_id) < (cursor_date, cursor_id))
+
+        rows = (await self.db.execute(stmt)).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = []
+        for row in rows:
+            items.append(
+                BuyerOrderTrackingItem(
+                    order_id=row.order_id,
+                    order_status=row.order_status,
+                    shop_name=row.shop_name or "Unknown Seller",
+                    shop_url=public_url(row.avt_url),
+                    first_item=OrderTrackingFirstItem(
+                        product_id=row.product_id,
+                        product_name=row.product_name or "",
+                        public_url=public_url(row.image_url) if row.image_url else None,
+                        variant_name=row.variant_name,
+                        size_name=row.size_name,
+                        quantity=row.quantity,
+                        unit_price=float(row.unit_price),
+                        base_price_plus_adjustment=float(
+                            row.list_price if row.list_price is not None else row.unit_price
+                        )
+                    ),
+                    total_items=row.item_count,
+                    subtotal=row.subtotal,
+                    total_price=row.total_price,
+                    order_date=row.order_date
+                )
             )
-            for data in orders_map.values()
-        ]
+
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = self._encode_tracking_cursor(last.order_date, last.order_id)
+
+        return BuyerOrderTrackingPage(items=items, next_cursor=next_cursor, has_more=has_more)
     
-    # ===================== BUYER HỦY ĐƠN =====================
-    # ===================== BUYER HỦY ĐƠN (FULL HOÀN THIỆN) =====================
-    async def cancel_order(self, buyer_id: int, order_id: int):
-        # 1. Lấy thông tin đơn hàng
-        order = await self._get_order_with_items(buyer_id, order_id)
+    # ===================== SỐ ĐƠN THEO TAB (BADGE) =====================
+    async def get_order_tab_counts(self, buyer_id: int) -> dict[str, int]:
+        """
+        Đếm số đơn cho tất cả tab trong TAB_MAPPING bằng 1 câu GROUP BY (order_status, payment_status).
+        Kết quả cache theo buyer, bị xoá mỗi khi đơn của buyer chuyển trạng thái.
+        """
+        cached = await order_tab_cache.get(buyer_id)
+        if cached is not None:
+            return cached
 
-        # Kiểm tra trạng thái: Chỉ cho hủy nếu đang pending
-        if order.order_status != "pending":
-            raise HTTPException(
-                status_code=400,
-                detail=f"Không thể hủy đơn hàng ở trạng thái {order.order_status}"
-            )
+        stmt = (
+            select(Order.order_status, Order.payment_status, func.count(Order.order_id))
+            .where(Order.buyer_id == buyer_id)
+            .group_by(Order.order_status, Order.payment_status)
+        )
+        rows = (await self.db.execute(stmt)).all()
 
-        # 2. PHỤC HỒI KHO (Thực hiện đồng bộ trong Transaction)
-        for item in order.items:
-            stmt_stock = (
-                update(ProductSize)
-                .where(ProductSize.size_id == item.size_id)
-                .values(available_units=ProductSize.available_units + item.quantity)
-            )
-            await self.db.execute(stmt_stock)
+        counts = {tab: 0 for tab in TAB_MAPPING}
+        for order_status, payment_status, total in rows:
+            for tab, rule in TAB_MAPPING.items():
+                if "order_status" in rule and order_status not in rule["order_status"]:
+                    continue
+                if "payment_status" in rule and payment_status not in rule["payment_status"]:
+                    continue
+                counts[tab] += total
 
-        # 3. Cập nhật trạng thái đơn hàng và thanh toán
-        order.order_status = "cancelled"
-        if order.payment_status == "pending":
-            order.payment_status = "failed"
+        await order_tab_cache.set(buyer_id, counts)
+        return counts
+
+    # ===================== BUYER HỦY ĐƠN =====================
+    # ===================== BUYER HỦY ĐƠN (FULL HOÀN THIỆN) =====================
+    async def cancel_order(self, buyer_id: int, order_id: int):
+        # 1. CHUYỂN TRẠNG THÁI: 1 câu UPDATE có điều kiện (chỉ đơn pending),
+        #    payment_status pending -> failed, trả về kèm danh sách item để hoàn kho
+        order = await order_transition_service.transition(
+            self.db, "buyer_cancel", order_id, buyer_id=buyer_id
+        )
+        restored = [(item["size_id"], item["quantity"]) for item in order.items or [] if item["size_id"]]
+
+        # 2. OUTBOX: dashboard + thông báo cho seller, ghi cùng transaction với việc huỷ đơn
+        seller_id = order.seller_id
+        await outbox_service.enqueue(self.db, [
+            # Task 1: Cập nhật lại số liệu Dashboard cho Seller
+            outbox_service.task(task_seller_recalc_dashboard, seller_id),
+            # Task 2: Gửi thông báo cho Seller
+            outbox_service.task(
+                task_send_notification,
+                user_id=seller_id,
+                role="seller",
+                title="Đơn hàng đã bị hủy",
+                message=f"Đơn hàng #{order.order_id} đã bị khách hàng hủy. Kho đã được hoàn trả.",
+                event_type="ORDER_CANCELLED",
+                data={
+                    "order_id": order.order_id,
+                    "buyer_id": buyer_id,
+                    "time": str(datetime.now())
+                }
+            ),
+        ])
+
+        # 3. HOÀN KHO DB: delta (+) ghi vào stock_delta cùng transaction, worker write-back ghi xuống ProductSize
+        #    Trả lượt mã giảm giá (cùng quy tắc với seller huỷ / tự huỷ quá hạn): delta -1 vào discount_usage_delta
+        #    Redis: message trong outbox để thử lại nếu bước 5 lỗi (mỗi release_id chỉ áp dụng 1 lần)
+        release_id = f"order:{order.order_id}:cancel"
+        discount_ids = await order_transition_service.released_discounts(self.db, [order])
+        await inventory_service.queue_stock_deltas(self.db, restored)
+        await discount_usage_service.queue_usage_deltas(self.db, [(d, -1) for d in discount_ids])
+        await outbox_service.enqueue(self.db, [
+            outbox_service.task(task_release_reservations, release_id, restored, discount_ids)
+        ])
 
         # 4. CHỐT GIAO DỊCH (COMMIT)
-        # Tại đây MySQL sẽ thực hiện cộng kho và đổi status đơn hàng cùng lúc
         await self.db.commit()
-        await self.db.refresh(order)
-
-        # 5. XỬ LÝ HẬU CẦN QUA CELERY (Bất đồng bộ)
-        if order.items:
-            # Lấy seller_id bằng truy vấn riêng để tránh lỗi MissingGreenlet (Lazy Load)
-            first_item = order.items[0]
-            seller_stmt = select(Product.seller_id).where(Product.product_id == first_item.product_id)
-            seller_res = await self.db.execute(seller_stmt)
-            seller_id = seller_res.scalar()
-
-            if seller_id:
-                # Task 1: Cập nhật lại số liệu Dashboard cho Seller
-                task_seller_recalc_dashboard.delay(seller_id)
-
-                # Task 2: Gửi thông báo cho Seller
-                task_send_notification.delay(
-                    user_id=seller_id,
-                    role="seller",
-                    title="Đơn hàng đã bị hủy",
-                    message=f"Đơn hàng #{order.order_id} đã bị khách hàng hủy. Kho đã được hoàn trả.",
-                    event_type="ORDER_CANCELLED",
-                    data={
-                        "order_id": order.order_id,
-                        "buyer_id": buyer_id,
-                        "time": str(datetime.now())
-                    }
-                )
+        await order_tab_cache.invalidate(buyer_id)
 
-        return order
+        # 5. PHỤC HỒI KHO + LƯỢT MÃ TRÊN REDIS ngay (không chờ outbox); lỗi -> đơn vẫn đã huỷ, outbox thử lại
+        try:
+            await inventory_service.release_items(restored, release_id=release_id)
+            await discount_usage_service.release_once(release_id, discount_ids)
+        except Exception as e:
+            print(f"[ORDER CANCEL ERROR] Redis release for order #{order.order_id} left to outbox retry: {e}")
+
+        return OrderResponse.model_validate(dict(order._mapping))
     # ===================== BUYER XÁC NHẬN ĐÃ NHẬN HÀNG =====================
     async def confirm_received(self, buyer_id: int, order_id: int):
-        # 1. Lấy đơn hàng kèm đầy đủ thông tin để làm payload
-        # Cần joinedload product và category để lấy category_id cho thống kê
-        stmt = (
-            select(Order)
-            .options(
-                joinedload(Order.items).joinedload(OrderItem.product)
-            )
-            .where(Order.order_id == order_id, Order.buyer_id == buyer_id)
+        # 1. CHUYỂN TRẠNG THÁI: shipped -> delivered, payment_status = paid, delivery_date = now()
+        #    RETURNING kèm item (category_id, quantity, total_price) để làm payload thống kê
+        order = await order_transition_service.transition(
+            self.db, "buyer_confirm_received", order_id, buyer_id=buyer_id
         )
-        result = await self.db.execute(stmt)
-        order = result.unique().scalar_one_or_none()
-
-        if not order:
-            raise HTTPException(404, "Không tìm thấy đơn hàng")
-
-        if order.order_status != "shipped":
-            raise HTTPException(
-                status_code=400,
-                detail="Chỉ xác nhận khi đơn hàng đang được giao (shipped)"
-            )
-
-        # 2. Cập nhật trạng thái thành công
-        order.order_status = "delivered"
-        order.delivery_date = datetime.now()
-        order.payment_status = "paid"
-
-        for item in order.items:
-            stmt_update_sold = (
-                update(Product)
-                .where(Product.product_id == item.product_id)
-                .values(sold_quantity=Product.sold_quantity + item.quantity)
-            )
-            await self.db.execute(stmt_update_sold)
 
-        await self.db.commit()
-        await self.db.refresh(order)
+        # 2. CỘNG SOLD_QUANTITY: 1 câu UPDATE ... FROM cho tất cả sản phẩm của đơn
+        sold = (
+            select(OrderItem.product_id, func.sum(OrderItem.quantity).label("quantity"))
+            .where(OrderItem.order_id == order_id, OrderItem.order_date == order.order_date)
+            .group_by(OrderItem.product_id)
+            .subquery()
+        )
+        await self.db.execute(
+            update(Product)
+            .where(Product.product_id == sold.c.product_id)
+            .values(sold_quantity=Product.sold_quantity + sold.c.quantity)
+            .execution_options(synchronize_session=False)
+        )
 
-        # 4. CHUẨN BỊ PAYLOAD CHO HỆ THỐNG THỐNG KÊ (ANALYTICS)
-        # Giả định đơn hàng thuộc về một seller
-        seller_id = order.items[0].product.seller_id
+        # 3. CHUẨN BỊ PAYLOAD CHO HỆ THỐNG THỐNG KÊ (ANALYTICS)
+        # Mỗi đơn thuộc về một seller
+        seller_id = order.seller_id
+        items = order.items or []
 
         admin_payload = {
             "order_id": order.order_id,
@@ -723,33 +1167,38 @@ class BuyerOrderService:
             "carrier_id": order.carrier_id,          # Thống kê Vận chuyển (Redis: stats:carriers)
             "items": [
                 {
-                    "category_id": item.product.category_id, # Xếp hạng Danh mục (Redis: rank:category)
-                    "quantity": item.quantity,               # Số lượng đã bán của danh mục
-                    "subtotal": float(item.total_price)      # Doanh thu của danh mục
+                    "category_id": item["category_id"],       # Xếp hạng Danh mục (Redis: rank:category)
+                    "quantity": item["quantity"],             # Số lượng đã bán của danh mục
+                    "subtotal": float(item["total_price"])    # Doanh thu của danh mục
                 }
-                for item in order.items
+                for item in items
             ]
         }
 
-        # 5. GỌI CÁC TASK CHẠY NGẦM (CELERY) ĐỂ CẬP NHẬT REDIS/DASHBOARD
-        
-        # A. Cập nhật thống kê tổng cho Admin (Real-time Stats bằng Redis Sorted Sets)
-        task_admin_add_order_stats.delay(admin_payload)
-
-        # B. Tính toán lại doanh thu/dashboard cho Người bán
-        task_seller_recalc_dashboard.delay(seller_id)
-        
-        # C. Gửi thông báo cho Seller biết tiền đã về ví
-        task_send_notification.delay(
-            user_id=seller_id,
-            role="seller",
-            title="Đơn hàng hoàn tất",      # Bạn đang thiếu tham số này
-            message=f"Đơn hàng #{order.order_id} đã hoàn tất. Doanh thu đã được ghi nhận.",
-            event_type="ORDER_COMPLETED",   # Bạn đang thiếu tham số này
-            data={"order_id": order.order_id} # Bạn đang thiếu tham số này
-        )
+        # 4. OUTBOX: các task cập nhật Redis/Dashboard, ghi cùng transaction với việc hoàn tất đơn
+        await outbox_service.enqueue(self.db, [
+            # A. Cập nhật thống kê tổng cho Admin (Real-time Stats bằng Redis Sorted Sets)
+            outbox_service.task(task_admin_add_order_stats, admin_payload),
+
+            # B. Tính toán lại doanh thu/dashboard cho Người bán
+            outbox_service.task(task_seller_recalc_dashboard, seller_id),
+
+            # C. Gửi thông báo cho Seller biết tiền đã về ví
+            outbox_service.task(
+                task_send_notification,
+                user_id=seller_id,
+                role="seller",
+                title="Đơn hàng hoàn tất",
+                message=f"Đơn hàng #{order.order_id} đã hoàn tất. Doanh thu đã được ghi nhận.",
+                event_type="ORDER_COMPLETED",
+                data={"order_id": order.order_id}
+            ),
+        ])
 
-        return order
+        await self.db.commit()
+        await order_tab_cache.invalidate(buyer_id)
+
+        return OrderResponse.model_validate(dict(order._mapping))
     
 def get_buyer_order_service(
     db: AsyncSession = Depends(get_db),
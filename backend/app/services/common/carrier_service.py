@@ -6,6 +6,7 @@ from redis.asyncio import Redis
 from ...config.s3 import public_url
 from ...models import Carrier
 from ...schemas.carrier import CarrierOut
+from .carrier_table import carrier_table
 
 
 class BaseCarrierService(ABC):
@@ -66,4 +67,6 @@ class BaseCarrierService(ABC):
                 keys_to_delete.append(f"carrier:{carrier_id}")
 
             await self.redis.delete(*keys_to_delete)
+        # Bảng carrier trong process (tính phí ship) của mọi API process đọc lại
+        await carrier_table.bump()
 
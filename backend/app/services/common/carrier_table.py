@@ -0,0 +1,77 @@
+import asyncio
+import time
+from decimal import Decimal
+
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...config.redis import redis_pool
+from ...models import Carrier
+
+
+class CarrierTable:
+    """
+    Bảng đơn vị vận chuyển đang hoạt động giữ trong process để tính phí ship không cần query DB.
+
+    - Admin thêm / sửa / xoá carrier -> bump version trên Redis (BaseCarrierService._invalidate_cache)
+    - Mỗi process kiểm tra version tối đa CHECK_INTERVAL giây 1 lần, đổi version mới đọc lại từ DB
+    - Bảng chỉ vài dòng: không cần snapshot trên Redis như index mã giảm giá
+    """
+    KEY_VERSION = "carriers:version"
+    CHECK_INTERVAL = 5.0
+
+    def __init__(self, redis_client: redis.Redis = None):
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
+        self._version = -1
+        self._carriers: dict[int, dict] = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def bump(self):
+        await self.redis.incr(self.KEY_VERSION)
+        self._checked_at = 0.0
+
+    async def _ensure_fresh(self, db: AsyncSession):
+        now = time.monotonic()
+        if self._version >= 0 and now - self._checked_at < self.CHECK_INTERVAL:
+            return
+
+        version = int(await self.redis.get(self.KEY_VERSION) or 0)
+        self._checked_at = now
+        if version == self._version:
+            return
+
+        async with self._lock:
+            if version == self._version:
+                return
+            rows = (await db.execute(
+                select(Carrier).where(Carrier.is_active == True).order_by(Carrier.carrier_id)
+            )).scalars().all()
+            self._carriers = {
+                c.carrier_id: {
+                    "carrier_id": c.carrier_id,
+                    "carrier_name": c.carrier_name,
+                    "carrier_avt_url": c.carrier_avt_url,
+                    "base_price": Decimal(c.base_price),
+                    "price_per_kg": Decimal(c.price_per_kg),
+                }
+                for c in rows
+            }
+            self._version = version
+
+    async def all(self, db: AsyncSession) -> list[dict]:
+        await self._ensure_fresh(db)
+        return list(self._carriers.values())
+
+    async def get(self, db: AsyncSession, carrier_id: int) -> dict | None:
+        await self._ensure_fresh(db)
+        return self._carriers.get(carrier_id)
+
+    @staticmethod
+    def fee(carrier: dict, weight) -> Decimal:
+        """Phí ship 1 kiện: base_price + price_per_kg * khối lượng"""
+        return carrier["base_price"] + carrier["price_per_kg"] * Decimal(weight)
+
+
+carrier_table = CarrierTable()
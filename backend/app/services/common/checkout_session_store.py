@@ -0,0 +1,48 @@
+import json
+import uuid
+
+import redis.asyncio as redis
+from ...config.redis import redis_pool
+from ...config.settings import settings
+
+
+class CheckoutSessionStore:
+    """
+    Lưu phiên checkout đã tính giá (dòng hàng, tổng tiền, khối lượng, báo giá ship, mã giảm giá) trên Redis.
+
+    - Tạo / đổi mã giảm giá: BuyerOrderService.create_checkout_session / update_checkout_session_discount
+    - Đọc: place_order dùng lại kết quả thay vì tính lại từ giỏ hàng; xoá sau khi đặt hàng thành công
+    - TTL ngắn: hết hạn thì buyer tải lại trang thanh toán để tính giá mới
+    - session_id có tiền tố buyer_id (giống hold_id) -> không đọc được phiên của người khác
+    """
+    KEY_PREFIX = "checkout:session"
+
+    def __init__(self, redis_client: redis.Redis = None):
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{session_id}"
+
+    @staticmethod
+    def new_id(buyer_id: int) -> str:
+        return f"{buyer_id}:{uuid.uuid4().hex}"
+
+    async def get(self, buyer_id: int, session_id: str) -> dict | None:
+        if not session_id.startswith(f"{buyer_id}:"):
+            return None
+        raw = await self.redis.get(self._key(session_id))
+        return json.loads(raw) if raw else None
+
+    async def save(self, session_id: str, session: dict, keep_ttl: bool = False):
+        """keep_ttl: cập nhật phiên đang có, không gia hạn"""
+        body = json.dumps(session, default=str)
+        if keep_ttl:
+            await self.redis.set(self._key(session_id), body, keepttl=True, xx=True)
+        else:
+            await self.redis.set(self._key(session_id), body, ex=settings.CHECKOUT_SESSION_TTL_SECONDS)
+
+    async def delete(self, session_id: str):
+        await self.redis.delete(self._key(session_id))
+
+
+checkout_session_store = CheckoutSessionStore()
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...config.redis import redis_pool
+from ...models.catalog import Discount
+from .discount_usage_service import DiscountUsageService, discount_usage_service
+
+
+class ActiveDiscountIndex:
+    """
+    Index các mã giảm giá đang hiệu lực hôm nay, giữ trong process + snapshot trên Redis.
+
+    - Sắp theo min_order_value -> mã đủ điều kiện cho cart_total là đoạn đầu [0, k) tìm bằng bisect,
+      mã tốt nhất: O(log n + k), không query DB
+    - Làm mới khi admin thay đổi mã (bump version trên Redis, mọi process thấy sau tối đa CHECK_INTERVAL giây)
+      và khi sang ngày mới (hiệu lực tính theo ngày)
+    - Process đầu tiên thấy version mới build từ DB rồi ghi snapshot, các process khác đọc lại snapshot
+    - Lượt còn lại đọc từ bộ đếm lượt dùng trên Redis (discount_usage_service), không dùng số trong snapshot
+    """
+    KEY_SNAPSHOT = "discount:active:snapshot"
+    KEY_VERSION = "discount:active:version"
+    CHECK_INTERVAL = 5.0
+
+    def __init__(self, redis_client: redis.Redis = None):
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
+
+        self._day: date | None = None
+        self._version = -1
+        self._entries: list[dict] = []
+        self._min_values: list[Decimal] = []
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    # ===================== LÀM MỚI INDEX =====================
+    async def bump(self):
+        """Gọi sau khi admin tạo / sửa / xoá / bật tắt mã giảm giá"""
+        await self.redis.incr(self.KEY_VERSION)
+        self._checked_at = 0.0
+
+    @staticmethod
+    async def _load(db: AsyncSession, today: date) -> list[dict]:
+        rows = (await db.execute(
+            select(Discount, DiscountUsageService.used_count_column())
+            .where(
+                Discount.is_active == True,
+                Discount.start_date <= today,
+                Discount.end_date >= today,
+                Discount.campaign.is_(None)  # mã chiến dịch phát riêng, không gợi ý công khai
+            )
+            .order_by(Discount.min_order_value, Discount.discount_id)
+        )).all()
+        return [
+            {
+                "discount_id": d.discount_id,
+                "code": d.code,
+                "discount_percent": d.discount_percent,
+                "min_order_value": d.min_order_value,
+                "max_discount": d.max_discount,
+                "start_date": d.start_date,
+                "end_date": d.end_date,
+                "usage_limit": d.usage_limit,
+                "used_count": used_count,
+                "is_active": d.is_active,
+            }
+            for d, used_count in rows
+        ]
+
+    def _apply_snapshot(self, snapshot: dict, today: date, version: int):
+        entries = []
+        for entry in snapshot["entries"]:
+            entries.append({
+                **entry,
+                "discount_percent": Decimal(entry["discount_percent"]),
+                "min_order_value": Decimal(entry["min_order_value"]),
+                "max_discount": Decimal(entry["max_discount"]) if entry["max_discount"] is not None else None,
+                "start_date": date.fromisoformat(entry["start_date"]),
+                "end_date": date.fromisoformat(entry["end_date"]),
+            })
+        self._entries = entries
+        self._min_values = [entry["min_order_value"] for entry in entries]
+        self._day = today
+        self._version = version
+
+    async def _ensure_fresh(self, db: AsyncSession):
+        today = date.today()
+        now = time.monotonic()
+        if self._day == today and now - self._checked_at < self.CHECK_INTERVAL:
+            return
+
+        version = int(await self.redis.get(self.KEY_VERSION) or 0)
+        self._checked_at = now
+        if self._day == today and version == self._version:
+            return
+
+        async with self._lock:
+            if self._day == today and version == self._version:
+                return
+
+            raw = await self.redis.get(self.KEY_SNAPSHOT)
+            snapshot = json.loads(raw) if raw else None
+            if not snapshot or snapshot["day"] != today.isoformat() or snapshot["version"] != version:
+                entries = await self._load(db, today)
+                snapshot = json.loads(json.dumps(
+                    {"day": today.isoformat(), "version": version, "entries": entries},
+                    default=str
+                ))
+                await self.redis.set(self.KEY_SNAPSHOT, json.dumps(snapshot))
+                await discount_usage_service.seed({e["discount_id"]: e["used_count"] for e in entries})
+                print(f"[DISCOUNT INDEX] Rebuilt {len(entries)} active discount(s) for {today} (version {version})")
+
+            self._apply_snapshot(snapshot, today, version)
+
+    # ===================== LƯỢT CÒN LẠI =====================
+    async def _with_live_usage(self, entries: list[dict]) -> list[dict]:
+        """Gắn used_count từ bộ đếm Redis (1 HMGET), bỏ các mã đã hết lượt"""
+        if not entries:
+            return []
+        used = await discount_usage_service.get_used([e["discount_id"] for e in entries])
+        result = []
+        for entry in entries:
+            used_count = used.get(entry["discount_id"], entry["used_count"])
+            if entry["usage_limit"] is not None and used_count >= entry["usage_limit"]:
+                continue
+            result.append({**entry, "used_count": used_count})
+        return result
+
+    # ===================== TRA CỨU =====================
+    @staticmethod
+    def estimate(entry: dict, cart_total) -> Decimal:
+        amount = Decimal(cart_total) * entry["discount_percent"] / Decimal(100)
+        if entry["max_discount"]:
+            amount = min(amount, entry["max_discount"])
+        return amount
+
+    async def eligible(self, db: AsyncSession, cart_total) -> list[dict]:
+        """Các mã áp dụng được cho cart_total (đủ min_order_value, còn lượt)"""
+        await self._ensure_fresh(db)
+        k = bisect_right(self._min_values, Decimal(cart_total))
+        return await self._with_live_usage(self._entries[:k])
+
+    async def best(self, db: AsyncSession, cart_total) -> dict | None:
+        candidates = await self.eligible(db, cart_total)
+        if not candidates:
+            return None
+        return max(candidates, key=lambda entry: self.estimate(entry, cart_total))
+
+
+discount_index = ActiveDiscountIndex()
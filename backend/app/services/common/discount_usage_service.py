@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+import redis.asyncio as redis
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...config.redis import redis_pool
+from ...config.settings import settings
+from ...models import Discount, DiscountUsageDelta
+from ...utils.lua_scripts import (
+    get_redeem_discount_script,
+    get_release_discount_script,
+    get_release_discount_once_script,
+    get_seed_discount_usage_script,
+)
+
+
+class DiscountUsageService:
+    """
+    Đếm lượt dùng mã giảm giá trên Redis thay vì UPDATE discount.used_count trong transaction đặt hàng
+    (dòng discount bị khoá tới lúc commit -> mọi đơn dùng cùng 1 mã phải xếp hàng).
+
+    - redeem: 1 Lua script kiểm tra usage_limit và cộng lượt (atomic, không khoá DB)
+    - release: giao dịch đặt hàng lỗi -> trả lại lượt; release_once: đơn đã huỷ trả lượt (chạy lại an toàn)
+    - Lượt dùng / trả lượt ghi vào bảng discount_usage_delta cùng transaction với đơn (queue_usage_deltas),
+      task discounts.settle_usage ghi net delta xuống discount.used_count theo batch (giống write-back tồn kho)
+    - Hash lượt dùng cũng là bộ đếm "còn lại" của index mã giảm giá (discount_index)
+    """
+    KEY_USED = "discount:used"
+    # Đánh dấu lượt trả mã của đơn đã huỷ đã được trừ (release_once)
+    KEY_RELEASED = "discount:released:{release_id}"
+
+    def __init__(self, redis_client: redis.Redis = None):
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
+        self.redeem_script = self.redis.register_script(get_redeem_discount_script())
+        self.release_script = self.redis.register_script(get_release_discount_script())
+        self.release_once_script = self.redis.register_script(get_release_discount_once_script())
+        self.seed_script = self.redis.register_script(get_seed_discount_usage_script())
+
+    @staticmethod
+    def used_count_column():
+        """used_count trong DB + lượt còn chờ settle -> giá trị nạp cho bộ đếm Redis"""
+        pending = (
+            select(func.coalesce(func.sum(DiscountUsageDelta.delta), 0))
+            .where(DiscountUsageDelta.discount_id == Discount.discount_id)
+            .correlate(Discount)
+            .scalar_subquery()
+        )
+        return (Discount.used_count + pending).label("used_count")
+
+    @staticmethod
+    async def queue_usage_deltas(db: AsyncSession, deltas: list[tuple[int, int]]) -> int:
+        """
+        Ghi lượt dùng vào bảng discount_usage_delta trong transaction hiện tại (không commit).
+        - deltas: [(discount_id, delta)], delta > 0: dùng mã, delta < 0: trả lượt
+        Trả về số dòng delta đã ghi.
+        """
+        merged = defaultdict(int)
+        for discount_id, delta in deltas:
+            if discount_id and delta:
+                merged[int(discount_id)] += int(delta)
+        rows = [{"discount_id": d, "delta": delta} for d, delta in sorted(merged.items()) if delta]
+        if rows:
+            await db.execute(insert(DiscountUsageDelta), rows)
+        return len(rows)
+
+    async def redeem(self, discount_id: int, usage_limit: int | None, db_used_count: int) -> bool:
+        """True nếu còn lượt và đã cộng 1 lượt (db_used_count: giá trị của used_count_column)"""
+        used = await self.redeem_script(
+            keys=[self.KEY_USED],
+            args=[discount_id, usage_limit if usage_limit is not None else -1, db_used_count]
+        )
+        return int(used) >= 0
+
+    async def release(self, discount_id: int):
+        try:
+            await self.release_script(keys=[self.KEY_USED], args=[discount_id])
+        except Exception as e:
+            print(f"[REDIS ERROR] Failed to release usage of discount {discount_id}: {e}")
+            raise e
+
+    async def release_once(self, release_id: str, discount_ids: list[int]):
+        """
+        Trả lượt của đơn đã huỷ (delta -1 đã commit trong discount_usage_delta), mỗi release_id chỉ trừ 1 lần
+        -> orders.release_reservations retry / outbox gửi trùng không trả 2 lần.
+        """
+        if not discount_ids:
+            return
+        try:
+            await self.release_once_script(
+                keys=[self.KEY_RELEASED.format(release_id=release_id), self.KEY_USED],
+                args=[settings.RESERVATION_RELEASE_MARKER_TTL_SECONDS] + list(discount_ids)
+            )
+        except Exception as e:
+            print(f"[REDIS ERROR] Failed to release usage of discounts {discount_ids}: {e}")
+            raise e
+
+    async def get_used(self, discount_ids: list[int]) -> dict[int, int]:
+        """Lượt đã dùng (bao gồm phần chưa ghi xuống DB) của các mã đã có bộ đếm"""
+        if not discount_ids:
+            return {}
+        values = await self.redis.hmget(self.KEY_USED, [str(d) for d in discount_ids])
+        return {d: int(v) for d, v in zip(discount_ids, values) if v is not None}
+
+    async def seed(self, used_counts: dict[int, int]):
+        """
+        Nạp bộ đếm từ DB cho mã chưa có (không ghi đè lượt đang được cộng).
+        used_counts: {discount_id: giá trị của used_count_column} (đã gồm lượt chờ settle).
+        """
+        if not used_counts:
+            return
+        args = []
+        for discount_id, used_count in used_counts.items():
+            args.extend([discount_id, used_count])
+        await self.seed_script(keys=[self.KEY_USED], args=args)
+
+
+discount_usage_service = DiscountUsageService()
@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import uuid
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from ...config.redis import redis_pool
+from ...config.settings import settings
+from ...utils.lua_scripts import get_finish_idempotency_script, get_refresh_idempotency_lock_script
+
+
+class IdempotencyService:
+    """
+    Chống chạy lặp các request không an toàn (POST/PUT/PATCH) khi client retry.
+
+    - Client gửi header `Idempotency-Key`; key được gắn theo phạm vi (vai trò + user + thao tác)
+    - Lần đầu: ghi bản ghi "processing" (SET NX, kèm token riêng của request) rồi mới chạy handler
+    - Handler còn chạy thì bản ghi được gia hạn định kỳ, không hết hạn giữa chừng để retry chạy lần 2
+    - Lưu kết quả / xoá bản ghi chỉ khi key vẫn giữ đúng token của request (Lua so sánh rồi ghi)
+    - Request trùng trong lúc đang xử lý sẽ chờ kết quả của lần đầu thay vì chạy song song
+    - Xong thì lưu response cuối cùng (kể cả lỗi nghiệp vụ 4xx) với TTL ngắn để trả lại cho các lần retry
+    """
+    KEY_PREFIX = "idem"
+    MAX_KEY_LENGTH = 255
+    POLL_INTERVAL = 0.05
+    MAX_POLL_INTERVAL = 0.5
+
+    def __init__(self, redis_client: redis.Redis = None):
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
+        self.refresh_script = self.redis.register_script(get_refresh_idempotency_lock_script())
+        self.finish_script = self.redis.register_script(get_finish_idempotency_script())
+
+    def _key(self, scope: str, idempotency_key: str) -> str:
+        return f"{self.KEY_PREFIX}:{scope}:{idempotency_key}"
+
+    @staticmethod
+    def _fingerprint(payload: Any) -> str:
+        body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    @staticmethod
+    def _replay(record: dict):
+        """Trả lại kết quả đã lưu: lỗi thì raise lại đúng mã lỗi cũ"""
+        if record["status_code"] >= 400:
+            raise HTTPException(status_code=record["status_code"], detail=record["body"])
+        return record["body"]
+
+    async def _wait_for_result(self, key: str, fingerprint: str) -> dict | None:
+        """
+        Chờ request đầu tiên xử lý xong.
+        Trả về None nếu bản ghi biến mất (lần đầu lỗi 5xx) để request hiện tại tự chạy lại.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+        interval = self.POLL_INTERVAL
+
+        while True:
+            raw = await self.redis.get(key)
+            if raw is None:
+                return None
+
+            record = json.loads(raw)
+            if record["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key đã được dùng cho một yêu cầu khác"
+                )
+            if record["state"] == "done":
+                return record
+
+            if loop.time() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Yêu cầu với Idempotency-Key này vẫn đang được xử lý, vui lòng thử lại sau"
+                )
+
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+
+    async def run(
+        self,
+        scope: str,
+        idempotency_key: str | None,
+        payload: Any,
+        handler: Callable[[], Awaitable[Any]],
+    ):
+        """
+        Chạy `handler` đúng một lần cho mỗi (scope, Idempotency-Key).
+
+        - Không có header -> chạy như bình thường
+        - Cùng key nhưng payload khác -> 422
+        - Lần đầu lỗi 5xx / exception bất ngờ -> xoá bản ghi để client được phép retry
+        """
+        if not idempotency_key:
+            return await handler()
+
+        if len(idempotency_key) > self.MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Idempotency-Key quá dài"
+            )
+
+        key = self._key(scope, idempotency_key)
+        fingerprint = self._fingerprint(payload)
+        processing = json.dumps({"state": "processing", "fingerprint": fingerprint, "token": uuid.uuid4().hex})
+
+        while True:
+            acquired = await self.redis.set(
+                key, processing, nx=True, ex=settings.IDEMPOTENCY_LOCK_TTL_SECONDS
+            )
+            if acquired:
+                break
+
+            record = await self._wait_for_result(key, fingerprint)
+            if record is not None:
+                return self._replay(record)
+            # Bản ghi đã bị xoá (lần trước lỗi) -> thử giành quyền chạy lại
+
+        heartbeat = asyncio.create_task(self._keep_alive(key, processing))
+        try:
+            result = await handler()
+        except HTTPException as e:
+            heartbeat.cancel()
+            if e.status_code >= 500:
+                await self._finish(key, processing, "")
+                raise
+            await self._store(key, processing, fingerprint, e.status_code, e.detail)
+            raise
+        except BaseException:
+            heartbeat.cancel()
+            await self._finish(key, processing, "")
+            raise
+
+        heartbeat.cancel()
+        await self._store(key, processing, fingerprint, status.HTTP_200_OK, jsonable_encoder(result))
+        return result
+
+    async def _keep_alive(self, key: str, processing: str):
+        """Gia hạn bản ghi processing mỗi 1/3 TTL cho tới khi handler xong (task bị cancel)"""
+        ttl = settings.IDEMPOTENCY_LOCK_TTL_SECONDS
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                if not await self.refresh_script(keys=[key], args=[processing, ttl]):
+                    print(f"[IDEMPOTENCY WARNING] Lost processing lock of {key}")
+                    return
+            except redis.RedisError as e:
+                print(f"[IDEMPOTENCY ERROR] Refresh {key} failed: {e}")
+
+    async def _finish(self, key: str, processing: str, record: str) -> bool:
+        """Ghi kết quả (record = '' -> xoá key) nếu key vẫn là bản ghi processing của request này"""
+        done = await self.finish_script(
+            keys=[key], args=[processing, record, settings.IDEMPOTENCY_TTL_SECONDS]
+        )
+        if not done:
+            print(f"[IDEMPOTENCY WARNING] {key} was taken over by another request, result not stored")
+        return bool(done)
+
+    async def _store(self, key: str, processing: str, fingerprint: str, status_code: int, body: Any):
+        record = {
+            "state": "done",
+            "fingerprint": fingerprint,
+            "status_code": status_code,
+            "body": body,
+        }
+        await self._finish(key, processing, json.dumps(record))
+
+
+idempotency_service = IdempotencyService()
@@ -1,22 +1,259 @@
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
 import redis.asyncio as redis
 from fastapi import HTTPException, status
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from ...config.redis import redis_pool
-from ...utils.lua_scripts import get_decr_stock_script
+from ...config.settings import settings
+from ...models import ProductSize, ProductVariant, Product, StockDelta
+from ...tasks.notification_task import task_send_notification
+from ...utils.socket_manager import socket_manager
+from ...utils.lua_scripts import (
+    get_decr_stock_script,
+    get_reserve_multi_stock_script,
+    get_restore_multi_stock_script,
+    get_restore_multi_stock_once_script,
+    get_create_hold_script,
+    get_release_hold_script,
+    get_commit_hold_script,
+    get_take_shard_stock_script,
+    get_enable_shards_script,
+    get_disable_shards_script,
+)
 
 
 class InventoryService:
-    def __init__(self):
-        self.redis = redis.Redis(connection_pool=redis_pool)
+    # Write-back: delta kho ghi vào bảng stock_delta, worker gom theo size_id rồi flush xuống product_size
+    KEY_METRICS = "stock:writeback:metrics"
+
+    # Đối soát Redis <-> Postgres
+    KEY_RECONCILE_SUSPECT = "stock:reconcile:suspect"
+    KEY_RECONCILE_METRICS = "stock:reconcile:metrics"
+    KEY_RECONCILE_REVIEW = "stock:reconcile:review"
+
+    # Giữ kho tạm cho checkout: zset (score = thời điểm hết hạn) + hash tổng đang giữ theo size
+    KEY_HOLDS = "stock:holds"
+    KEY_HELD = "stock:held"
+
+    # Đánh dấu lượt hoàn kho của đơn đã huỷ đã được cộng (release_items với release_id)
+    KEY_RELEASED = "stock:released:{release_id}"
+
+    # Size flash-sale chia tồn kho ra N shard: hash size_id -> N
+    KEY_SHARDS = "stock:shards"
+    SHARD_CONFIG_TTL = 5.0
+
+    # Sự kiện ngưỡng tồn kho (sắp hết / hết hàng / có hàng lại) do Lua script ghi
+    KEY_STOCK_EVENTS = "stock:events"
+    KEY_STOCK_LEVELS = "stock:levels"
+    KEY_STOCK_EVENTS_LOCK = "stock:events:lock"
+    STOCK_EVENT_GROUP = "stock-event-workers"
+    STOCK_EVENT_CONSUMER = "stock-event-worker"
+
+    def __init__(self, redis_client: redis.Redis = None):
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
         self.decr_script = self.redis.register_script(get_decr_stock_script())
+        self.reserve_multi_script = self.redis.register_script(get_reserve_multi_stock_script())
+        self.restore_multi_script = self.redis.register_script(get_restore_multi_stock_script())
+        self.restore_once_script = self.redis.register_script(get_restore_multi_stock_once_script())
+        self.create_hold_script = self.redis.register_script(get_create_hold_script())
+        self.release_hold_script = self.redis.register_script(get_release_hold_script())
+        self.commit_hold_script = self.redis.register_script(get_commit_hold_script())
+        self.take_shard_script = self.redis.register_script(get_take_shard_stock_script())
+        self.enable_shards_script = self.redis.register_script(get_enable_shards_script())
+        self.disable_shards_script = self.redis.register_script(get_disable_shards_script())
+
+        # Cache cấu hình shard trong process, tránh thêm 1 round trip mỗi lần reserve
+        self._shard_config: dict[int, int] = {}
+        self._shard_config_at = 0.0
+
+    @staticmethod
+    def _stock_key(size_id: int) -> str:
+        return f"stock_size:{size_id}"
+
+    @staticmethod
+    def _shard_key(size_id: int, index: int) -> str:
+        return f"stock_size:{size_id}:s{index}"
+
+    def _shard_keys(self, size_id: int, shards: int) -> list[str]:
+        return [self._shard_key(size_id, i) for i in range(shards)]
+
+    def _restore_key(self, size_id: int, shards: dict[int, int]) -> str:
+        """
+        Key nhận lại kho khi hoàn: size chia shard -> 1 shard ngẫu nhiên.
+        """
+        if size_id in shards:
+            return self._shard_key(size_id, random.randrange(shards[size_id]))
+        return self._stock_key(size_id)
+
+    @staticmethod
+    def _event_args() -> list:
+        """
+        2 ARGV cuối của các script trừ / hoàn kho: ngưỡng sắp hết hàng, MAXLEN của stream.
+        """
+        return [settings.STOCK_LOW_THRESHOLD, settings.STOCK_EVENT_STREAM_MAXLEN]
+
+    @staticmethod
+    def _merge_items(items: list[tuple[int, int]]) -> dict[int, int]:
+        """
+        Gộp các dòng trùng size_id -> {size_id: tổng số lượng}.
+        Sắp xếp theo size_id để thứ tự key luôn ổn định.
+        """
+        merged = defaultdict(int)
+        for size_id, quantity in items:
+            merged[size_id] += quantity
+        return dict(sorted(merged.items()))
+
+    @staticmethod
+    def _hold_key(hold_id: str) -> str:
+        return f"stock:hold:{hold_id}"
+
+    @staticmethod
+    def _parse_shortfalls(result: list, merged: dict[int, int]) -> list[dict]:
+        """
+        Chuyển kết quả {0, i1, stock1, ...} của Lua script thành danh sách thiếu hàng.
+        """
+        size_ids = list(merged.keys())
+        flat = result[1:]
+        return [
+            {
+                "size_id": size_ids[int(idx) - 1],
+                "requested": merged[size_ids[int(idx) - 1]],
+                "available": int(available)
+            }
+            for idx, available in zip(flat[0::2], flat[1::2])
+        ]
+
+
+    async def _get_shard_counts(self, size_ids: list[int], fresh: bool = False) -> dict[int, int]:
+        """
+        Số shard của các size đang chia shard -> {size_id: N}.
+        - fresh=False: đọc từ cache trong process (làm mới sau SHARD_CONFIG_TTL giây).
+        - fresh=True: đọc thẳng Redis, dùng cho các đường hoàn kho / nạp kho
+          (ghi nhầm key khi cấu hình vừa đổi sẽ làm mất kho).
+        """
+        if fresh:
+            values = await self.redis.hmget(self.KEY_SHARDS, [str(s) for s in size_ids]) if size_ids else []
+            shards = {}
+            for size_id, n in zip(size_ids, values):
+                if n:
+                    shards[size_id] = int(n)
+                    self._shard_config[size_id] = int(n)
+                else:
+                    self._shard_config.pop(size_id, None)
+            return shards
+
+        now = time.monotonic()
+        if now - self._shard_config_at > self.SHARD_CONFIG_TTL:
+            raw = await self.redis.hgetall(self.KEY_SHARDS)
+            self._shard_config = {int(s): int(n) for s, n in raw.items()}
+            self._shard_config_at = now
+
+        return {s: self._shard_config[s] for s in size_ids if s in self._shard_config}
+
+
+    async def _give_back(self, taken: list[tuple[str, int]]):
+        """
+        Hoàn lại số đã lấy từ các shard khi reserve không trọn vẹn.
+        """
+        if not taken:
+            return
+        merged = defaultdict(int)
+        for key, quantity in taken:
+            merged[key] += quantity
+        await self.restore_multi_script(
+            keys=list(merged.keys()) + [self.KEY_STOCK_EVENTS],
+            args=list(merged.values()) + self._event_args()
+        )
+
+
+    async def _take_from_shards(self, size_id: int, shards: int, quantity: int):
+        """
+        Trừ kho của 1 size đang chia shard, bắt đầu từ shard ngẫu nhiên để tản tải.
+        - Lượt 1: tìm 1 shard đủ hàng cho cả quantity.
+        - Lượt 2: gom từng phần qua các shard (số tồn còn ít, rải rác).
+        Trả về (taken, missing): taken = [(shard_key, số đã lấy)], missing = True nếu shard chưa có key.
+        """
+        start = random.randrange(shards)
+        keys = [self._shard_key(size_id, (start + k) % shards) for k in range(shards)]
+
+        for key in keys:
+            got = int(await self.take_shard_script(
+                keys=[key, self.KEY_STOCK_EVENTS], args=[quantity, 0] + self._event_args()
+            ))
+            if got == -1:
+                return [], True
+            if got:
+                return [(key, got)], False
+
+        taken = []
+        remaining = quantity
+        for key in keys:
+            got = int(await self.take_shard_script(
+                keys=[key, self.KEY_STOCK_EVENTS], args=[remaining, 1] + self._event_args()
+            ))
+            if got > 0:
+                taken.append((key, got))
+                remaining -= got
+                if remaining == 0:
+                    break
+        return taken, False
+
+
+    async def _reserve_sharded(self, sharded: dict[int, int], shards: dict[int, int]):
+        """
+        Trừ kho các size chia shard (không atomic giữa các shard -> bù trừ khi thiếu).
+        Trả về (taken, shortfalls); thiếu hàng thì mọi thứ đã lấy đều được hoàn lại.
+        """
+        taken = []
+        for size_id, quantity in sharded.items():
+            got, missing = await self._take_from_shards(size_id, shards[size_id], quantity)
+            taken += got
+            if missing or sum(q for _, q in got) < quantity:
+                await self._give_back(taken)
+                available = -1 if missing else (await self.get_available_stock([size_id])).get(size_id)
+                return [], [{
+                    "size_id": size_id,
+                    "requested": quantity,
+                    "available": available if available is not None else -1
+                }]
+        return taken, []
+
+
+    async def _reserve_merged(self, merged: dict[int, int], shards: dict[int, int]) -> list[dict]:
+        sharded = {s: q for s, q in merged.items() if s in shards}
+        normal = {s: q for s, q in merged.items() if s not in shards}
+
+        taken, shortfalls = await self._reserve_sharded(sharded, shards)
+        if shortfalls or not normal:
+            return shortfalls
+
+        size_ids = list(normal.keys())
+        result = await self.reserve_multi_script(
+            keys=[self._stock_key(s) for s in size_ids] + [self.KEY_STOCK_EVENTS],
+            args=[normal[s] for s in size_ids] + self._event_args()
+        )
+
+        if int(result[0]) == 1:
+            return []
+
+        await self._give_back(taken)
+        return self._parse_shortfalls(result, normal)
 
 
     async def reserve_stock(self, size_id: int, quantity: int):
         """
         Trừ kho trên Redis.
         """
-        key = f"stock_size:{size_id}"
+        key = self._stock_key(size_id)
 
-        result = await self.decr_script(keys=[key], args=[quantity])
+        result = await self.decr_script(
+            keys=[key, self.KEY_STOCK_EVENTS], args=[quantity] + self._event_args()
+        )
 
         if result == -1:
             print(f"[CACHE MISS] Key {key} not found in Redis")
@@ -34,11 +271,37 @@ class InventoryService:
         return True
 
 
+    async def reserve_items(self, items: list[tuple[int, int]]) -> list[dict]:
+        """
+        Trừ kho nhiều size trong 1 lần gọi Lua (all-or-nothing).
+        - items: [(size_id, quantity), ...]
+        - Trả về [] nếu trừ thành công.
+        - Ngược lại trả về danh sách thiếu hàng, không key nào bị trừ:
+          [{"size_id", "requested", "available"}], available = -1 nghĩa là cache miss.
+        Size chia shard được trừ riêng qua các shard trước, hoàn lại nếu phần còn lại thiếu hàng.
+        """
+        merged = self._merge_items(items)
+        if not merged:
+            return []
+
+        size_ids = list(merged.keys())
+        shards = await self._get_shard_counts(size_ids)
+        shortfalls = await self._reserve_merged(merged, shards)
+
+        if any(s["available"] == -1 for s in shortfalls):
+            # Cấu hình shard có thể vừa đổi mà cache chưa kịp làm mới -> thử lại 1 lần
+            fresh = await self._get_shard_counts(size_ids, fresh=True)
+            if fresh != shards:
+                shortfalls = await self._reserve_merged(merged, fresh)
+
+        return shortfalls
+
+
     async def restore_stock(self, size_id: int, quantity: int):
         """
         Hoàn lại tồn kho trên Redis
         """
-        key = f"stock_size:{size_id}"
+        key = self._stock_key(size_id)
         try:
             await self.redis.incrby(key, quantity)
         except Exception as e:
@@ -46,9 +309,573 @@ class InventoryService:
             raise e
 
 
+    async def release_items(self, items: list[tuple[int, int]], release_id: str = None):
+        """
+        Hoàn kho nhiều size trong 1 lần gọi Lua.
+        Dùng để bù trừ (compensate) khi giao dịch DB sau reserve_items bị lỗi.
+        release_id: hoàn kho của đơn đã huỷ (orders.release_reservations), mỗi release_id chỉ được cộng 1 lần
+        -> gọi lại khi retry an toàn, trả về -1 nếu đã hoàn trước đó.
+        """
+        merged = self._merge_items(items)
+        if not merged:
+            return 0
+
+        size_ids = list(merged.keys())
+        try:
+            shards = await self._get_shard_counts(size_ids, fresh=True)
+            keys = [self._restore_key(s, shards) for s in size_ids] + [self.KEY_STOCK_EVENTS]
+            args = [merged[s] for s in size_ids] + self._event_args()
+            if release_id is None:
+                return await self.restore_multi_script(keys=keys, args=args)
+            return await self.restore_once_script(
+                keys=[self.KEY_RELEASED.format(release_id=release_id)] + keys,
+                args=[settings.RESERVATION_RELEASE_MARKER_TTL_SECONDS] + args
+            )
+        except Exception as e:
+            print(f"[REDIS ERROR] Failed to release stock for sizes {size_ids}: {e}")
+            raise e
+
+
+    async def create_hold(self, buyer_id: int, items: list[tuple[int, int]], ttl: int = None):
+        """
+        Giữ kho tạm cho buyer đang checkout, tự trả lại sau ttl giây nếu không đặt hàng.
+        Trả về (hold_id, expire_at, shortfalls). Thiếu hàng -> hold_id = None, không key nào bị trừ.
+        """
+        merged = self._merge_items(items)
+        if not merged:
+            return None, None, []
+
+        hold_id = f"{buyer_id}:{uuid.uuid4().hex}"
+        expire_at = int(time.time()) + (ttl or settings.STOCK_HOLD_TTL_SECONDS)
+
+        shards = await self._get_shard_counts(list(merged.keys()))
+        sharded = {s: q for s, q in merged.items() if s in shards}
+        normal = {s: q for s, q in merged.items() if s not in shards}
+
+        # Size chia shard được trừ trước, script chỉ ghi nhận chúng vào hold
+        taken, shortfalls = await self._reserve_sharded(sharded, shards)
+        if shortfalls:
+            return None, None, shortfalls
+
+        args = [hold_id, expire_at]
+        for size_id, quantity in list(normal.items()) + list(sharded.items()):
+            args += [size_id, quantity]
+
+        result = await self.create_hold_script(
+            keys=[self.KEY_HOLDS, self._hold_key(hold_id), self.KEY_HELD]
+                 + [self._stock_key(s) for s in normal] + [self.KEY_STOCK_EVENTS],
+            args=args + self._event_args()
+        )
+
+        if int(result[0]) == 1:
+            return hold_id, expire_at, []
+
+        await self._give_back(taken)
+        return None, None, self._parse_shortfalls(result, normal)
+
+
+    async def release_hold(self, hold_id: str) -> bool:
+        """
+        Trả kho của hold qua Lua script. False nếu hold đã được xử lý trước đó.
+        """
+        held = await self.redis.hgetall(self._hold_key(hold_id))
+        shards = await self._get_shard_counts([int(s) for s in held], fresh=True)
+
+        args = [hold_id]
+        for size_id, quantity in held.items():
+            args += [size_id, quantity]
+
+        released = await self.release_hold_script(
+            keys=[self.KEY_HOLDS, self._hold_key(hold_id), self.KEY_HELD]
+                 + [self._restore_key(int(s), shards) for s in held] + [self.KEY_STOCK_EVENTS],
+            args=args + self._event_args()
+        )
+        return bool(released)
+
+
+    async def commit_hold(self, buyer_id: int, hold_id: str, items: list[tuple[int, int]]):
+        """
+        Chuyển hold thành trừ kho chính thức khi đặt hàng.
+        Trả về [(size_id, quantity)] đã trừ, hoặc None nếu hold không dùng được
+        (không thuộc buyer, hết hạn, hoặc khác các item đang đặt) -> caller phải reserve lại.
+        """
+        if not hold_id.startswith(f"{buyer_id}:"):
+            return None
+
+        flat = await self.commit_hold_script(
+            keys=[self.KEY_HOLDS, self._hold_key(hold_id), self.KEY_HELD],
+            args=[hold_id, int(time.time())]
+        )
+        if not flat:
+            return None
+
+        held = {int(size_id): int(quantity) for size_id, quantity in zip(flat[0::2], flat[1::2])}
+        held_items = list(held.items())
+
+        if held != self._merge_items(items):
+            # Giỏ hàng đã đổi sau khi giữ kho -> trả lại toàn bộ rồi reserve theo item mới
+            await self.release_items(held_items)
+            return None
+
+        return held_items
+
+
+    async def sweep_expired_holds(self, batch_size: int = 200) -> int:
+        """
+        Trả kho cho các hold đã hết hạn, xử lý theo từng batch.
+        """
+        released = 0
+        while True:
+            hold_ids = await self.redis.zrangebyscore(
+                self.KEY_HOLDS, "-inf", int(time.time()), start=0, num=batch_size
+            )
+            if not hold_ids:
+                break
+
+            for hold_id in hold_ids:
+                if await self.release_hold(hold_id):
+                    released += 1
+
+            if len(hold_ids) < batch_size:
+                break
+
+        if released:
+            print(f"[STOCK HOLD] Released {released} expired hold(s)")
+        return released
+
+
+    async def queue_stock_deltas(self, db: AsyncSession, deltas: list[tuple[int, int]]) -> int:
+        """
+        Ghi delta kho vào bảng stock_delta trong transaction hiện tại (không commit)
+        thay vì update từng dòng product_size.
+        - Delta commit cùng đơn hàng: process chết ngay sau commit cũng không mất delta,
+          rollback thì delta cũng không còn
+        - Worker flush_stock_writeback gom net delta theo size và ghi xuống ProductSize theo chu kỳ
+        - deltas: [(size_id, delta)], delta < 0: trừ kho, delta > 0: hoàn kho
+        Trả về số dòng delta đã ghi.
+        """
+        merged = defaultdict(int)
+        for size_id, delta in deltas:
+            if size_id and delta:
+                merged[int(size_id)] += int(delta)
+        rows = [{"size_id": size_id, "delta": delta} for size_id, delta in sorted(merged.items()) if delta]
+        if rows:
+            await db.execute(insert(StockDelta), rows)
+        return len(rows)
+
+
+    async def get_writeback_metrics(self, db: AsyncSession) -> dict:
+        """
+        Chỉ số của worker write-back: độ trễ flush, số size / dòng delta đang chờ.
+        """
+        pending = (await db.execute(
+            select(
+                func.count(),
+                func.count(func.distinct(StockDelta.size_id)),
+                func.min(StockDelta.created_at)
+            ).select_from(StockDelta)
+        )).one()
+        metrics = await self.redis.hgetall(self.KEY_METRICS)
+
+        pending_rows, pending_sizes, oldest = pending
+        return {
+            "pending_sizes": int(pending_sizes or 0),
+            "pending_rows": int(pending_rows or 0),
+            "pending_lag_ms": int((datetime.now() - oldest).total_seconds() * 1000) if oldest else 0,
+            "last_flush_at": int(metrics.get("last_flush_at", 0)),
+            "last_flush_lag_ms": int(metrics.get("last_flush_lag_ms", 0)),
+            "last_flush_sizes": int(metrics.get("last_flush_sizes", 0)),
+            "max_flush_lag_ms": int(metrics.get("max_flush_lag_ms", 0)),
+            "flush_count": int(metrics.get("flush_count", 0)),
+        }
+
+
+    async def _stream_stock_rows(self, db: AsyncSession, chunk_size: int):
+        """
+        Đọc (size_id, tồn kho) bằng server-side cursor, trả về từng chunk.
+        Tồn kho = available_units + delta trong stock_delta chưa flush (cùng 1 snapshot).
+        """
+        pending = (
+            select(StockDelta.size_id, func.sum(StockDelta.delta).label("delta"))
+            .group_by(StockDelta.size_id)
+            .subquery()
+        )
+        stmt = (
+            select(
+                ProductSize.size_id,
+                (ProductSize.available_units + func.coalesce(pending.c.delta, 0)).label("available_units")
+            )
+            .outerjoin(pending, pending.c.size_id == ProductSize.size_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await db.stream(stmt)
+        async for rows in result.partitions(chunk_size):
+            yield rows
+
+
+    async def warm_up_stock(self, db: AsyncSession, chunk_size: int = None) -> int:
+        """
+        Nạp toàn bộ tồn kho từ product_size (kèm delta chưa flush) lên Redis (SETNX theo chunk).
+        Key đã có giữ nguyên vì có thể đang chứa số đã bị trừ bởi đơn chưa commit.
+        Trả về số key được tạo mới.
+        """
+        chunk_size = chunk_size or settings.STOCK_SYNC_CHUNK_SIZE
+        sharded = await self.redis.hgetall(self.KEY_SHARDS)
+        created = 0
+
+        async for rows in self._stream_stock_rows(db, chunk_size):
+            pipe = self.redis.pipeline(transaction=False)
+            for size_id, available_units in rows:
+                if str(size_id) in sharded:
+                    continue
+                pipe.setnx(self._stock_key(size_id), available_units)
+            created += sum(1 for ok in await pipe.execute() if ok)
+
+        return created
+
+
+    async def reconcile_stock(self, db: AsyncSession, chunk_size: int = None) -> dict:
+        """
+        Đối soát số tồn trên Redis với available_units trên Postgres.
+        Giá trị kỳ vọng = available_units + delta đang chờ flush (stock_delta)
+        - số đang bị giữ tạm bởi các hold checkout.
+        Lệch chỉ được sửa khi lặp lại y hệt ở 2 lần chạy liên tiếp,
+        tránh sửa nhầm đơn đang checkout dở (đã trừ Redis nhưng chưa commit delta).
+        Chỉ tự sửa chiều giảm (Redis đang nhiều hơn kỳ vọng -> có thể bán lố).
+        Redis ít hơn kỳ vọng -> không tự cộng thêm kho, ghi vào hash stock:reconcile:review
+        để admin kiểm tra (sửa tay bằng cách cập nhật tồn kho của size).
+        Hoàn kho Redis của đơn đã huỷ không dựa vào job này: message orders.release_reservations
+        ghi trong outbox cùng transaction huỷ đơn, thử lại tới khi Redis nhận.
+        """
+        chunk_size = chunk_size or settings.STOCK_SYNC_CHUNK_SIZE
+        previous_suspects = await self.redis.hgetall(self.KEY_RECONCILE_SUSPECT)
+        shards = {int(s): int(n) for s, n in (await self.redis.hgetall(self.KEY_SHARDS)).items()}
+        suspects, review = {}, {}
+        checked = drifted = repaired = missing = total_abs_drift = 0
+
+        async for rows in self._stream_stock_rows(db, chunk_size):
+            size_ids = [str(size_id) for size_id, _ in rows]
+
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.mget([self._stock_key(s) for s in size_ids])
+            pipe.hmget(self.KEY_HELD, size_ids)
+            cached, held = await pipe.execute()
+            cached = await self._sum_shards(rows, cached, shards)
+
+            fix = self.redis.pipeline(transaction=False)
+            for (size_id, available_units), current, h in zip(rows, cached, held):
+                checked += 1
+                expected = available_units - int(h or 0)
+                # Size chia shard: sửa lệch trên shard đầu, tổng các shard mới là tồn kho
+                key = self._shard_key(size_id, 0) if size_id in shards else self._stock_key(size_id)
+
+                if current is None:
+                    missing += 1
+                    fix.setnx(key, expected)
+                    continue
+
+                drift = int(current) - expected
+                if drift == 0:
+                    continue
+
+                drifted += 1
+                total_abs_drift += abs(drift)
+                if previous_suspects.get(str(size_id)) != str(drift):
+                    suspects[str(size_id)] = drift
+                elif drift > 0:
+                    fix.incrby(key, -drift)
+                    repaired += 1
+                else:
+                    suspects[str(size_id)] = drift
+                    review[str(size_id)] = drift
+            await fix.execute()
+
+        report = {
+            "last_run_at": int(time.time() * 1000),
+            "checked": checked,
+            "missing": missing,
+            "drifted": drifted,
+            "repaired": repaired,
+            "needs_review": len(review),
+            "total_abs_drift": total_abs_drift,
+        }
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(self.KEY_RECONCILE_SUSPECT, self.KEY_RECONCILE_REVIEW)
+        if suspects:
+            pipe.hset(self.KEY_RECONCILE_SUSPECT, mapping=suspects)
+        if review:
+            pipe.hset(self.KEY_RECONCILE_REVIEW, mapping=review)
+        pipe.hset(self.KEY_RECONCILE_METRICS, mapping=report)
+        await pipe.execute()
+
+        if drifted:
+            print(f"[STOCK RECONCILE] {drifted} size(s) drifted, repaired {repaired}")
+        if review:
+            print(
+                f"[STOCK RECONCILE WARNING] {len(review)} size(s) have less stock on Redis than expected, "
+                f"not repaired automatically: {review}"
+            )
+
+        return report
+
+
+    async def _sum_shards(self, rows, cached: list, shards: dict[int, int]) -> list:
+        """
+        Thay giá trị key gốc (không tồn tại) của các size chia shard bằng tổng các shard.
+        None nếu không shard nào có key.
+        """
+        sharded = [size_id for size_id, _ in rows if size_id in shards]
+        if not sharded:
+            return cached
+
+        pipe = self.redis.pipeline(transaction=False)
+        for size_id in sharded:
+            pipe.mget(self._shard_keys(size_id, shards[size_id]))
+        totals = {}
+        for size_id, values in zip(sharded, await pipe.execute()):
+            present = [int(v) for v in values if v is not None]
+            totals[size_id] = sum(present) if present else None
+
+        return [
+            totals[size_id] if size_id in totals else current
+            for (size_id, _), current in zip(rows, cached)
+        ]
+
+
+    async def get_reconcile_metrics(self) -> dict:
+        metrics = await self.redis.hgetall(self.KEY_RECONCILE_METRICS)
+        pending = await self.redis.hlen(self.KEY_RECONCILE_SUSPECT)
+        review = await self.redis.hgetall(self.KEY_RECONCILE_REVIEW)
+        return {
+            **{k: int(v) for k, v in metrics.items()},
+            "pending_suspects": int(pending or 0),
+            "review": {int(size_id): int(drift) for size_id, drift in review.items()},
+        }
+
+
     async def init_stock(self, size_id: int, quantity: int):
-        key = f"stock_size:{size_id}"
+        key = self._stock_key(size_id)
         await self.redis.set(key, quantity)
 
 
-inventory_service = InventoryService()
\ No newline at end of file
+    async def init_stock_if_missing(self, stock_map: dict[int, int]):
+        """
+        Nạp tồn kho cho các key chưa có trên Redis (SETNX, không ghi đè số đang bị trừ dở).
+        - stock_map: {size_id: available_units}
+        """
+        if not stock_map:
+            return
+
+        # Size chia shard không có key gốc, tạo lại key gốc sẽ làm kho bị đếm 2 lần
+        shards = await self._get_shard_counts(list(stock_map.keys()), fresh=True)
+
+        pipe = self.redis.pipeline(transaction=False)
+        for size_id, quantity in stock_map.items():
+            if size_id in shards:
+                continue
+            pipe.setnx(self._stock_key(size_id), quantity)
+        await pipe.execute()
+
+
+    async def get_available_stock(self, size_ids: list[int]) -> dict[int, int | None]:
+        """
+        Tồn kho hiển thị của nhiều size (size chia shard -> tổng các shard).
+        None nếu size chưa có trên Redis.
+        """
+        if not size_ids:
+            return {}
+
+        shards = await self._get_shard_counts(size_ids)
+
+        pipe = self.redis.pipeline(transaction=False)
+        for size_id in size_ids:
+            if size_id in shards:
+                pipe.mget(self._shard_keys(size_id, shards[size_id]))
+            else:
+                pipe.get(self._stock_key(size_id))
+
+        stock = {}
+        for size_id, value in zip(size_ids, await pipe.execute()):
+            if isinstance(value, list):
+                present = [int(v) for v in value if v is not None]
+                stock[size_id] = sum(present) if present else None
+            else:
+                stock[size_id] = int(value) if value is not None else None
+        return stock
+
+
+    async def set_stock_shards(self, db: AsyncSession, size_id: int, shards: int) -> dict:
+        """
+        Bật / đổi / tắt chế độ chia shard cho 1 size (shards <= 1 -> tắt).
+        Gộp các shard cũ về key gốc rồi chia lại, tổng tồn kho giữ nguyên.
+        """
+        current = (await self._get_shard_counts([size_id], fresh=True)).get(size_id, 1)
+        main_key = self._stock_key(size_id)
+
+        if current != shards:
+            if current > 1:
+                await self.disable_shards_script(
+                    keys=[main_key, self.KEY_SHARDS] + self._shard_keys(size_id, current),
+                    args=[size_id]
+                )
+                self._shard_config.pop(size_id, None)
+
+            if shards > 1:
+                if not await self.redis.exists(main_key):
+                    available_units = (await db.execute(
+                        select(ProductSize.available_units).where(ProductSize.size_id == size_id)
+                    )).scalar_one_or_none()
+                    if available_units is None:
+                        raise HTTPException(
+                            status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Không tìm thấy size"
+                        )
+                    await self.redis.setnx(main_key, available_units)
+
+                await self.enable_shards_script(
+                    keys=[main_key, self.KEY_SHARDS] + self._shard_keys(size_id, shards),
+                    args=[size_id]
+                )
+                self._shard_config[size_id] = shards
+
+        available = (await self.get_available_stock([size_id])).get(size_id)
+        print(f"[STOCK SHARDS] size {size_id}: {current} -> {max(shards, 1)} shard(s)")
+        return {
+            "size_id": size_id,
+            "shards": max(shards, 1),
+            "available": available
+        }
+
+
+    @staticmethod
+    def _stock_level(stock: int) -> str:
+        if stock <= 0:
+            return "sold_out"
+        if stock <= settings.STOCK_LOW_THRESHOLD:
+            return "low_stock"
+        return "in_stock"
+
+
+    async def _read_stock_events(self, batch_size: int) -> list:
+        """
+        Đọc 1 batch sự kiện từ stream qua consumer group.
+        Ưu tiên các sự kiện đã nhận nhưng chưa ack (lần chạy trước bị crash).
+        """
+        try:
+            await self.redis.xgroup_create(
+                self.KEY_STOCK_EVENTS, self.STOCK_EVENT_GROUP, id="0", mkstream=True
+            )
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        for stream_id in ("0", ">"):
+            response = await self.redis.xreadgroup(
+                self.STOCK_EVENT_GROUP, self.STOCK_EVENT_CONSUMER,
+                {self.KEY_STOCK_EVENTS: stream_id}, count=batch_size
+            )
+            entries = response[0][1] if response else []
+            if entries:
+                return entries
+        return []
+
+
+    async def consume_stock_events(self, db: AsyncSession, batch_size: int = None) -> dict:
+        """
+        Xử lý 1 batch sự kiện ngưỡng tồn kho do các Lua script trừ / hoàn kho ghi ra.
+        - Sự kiện chỉ là tín hiệu: mức tồn (in_stock / low_stock / sold_out) được tính lại
+          từ tồn kho tổng hiện tại (size chia shard -> tổng các shard).
+        - Mức tồn đổi so với lần trước (hash stock:levels) -> cập nhật in_stock theo batch,
+          báo seller 1 lần cho mỗi lần vượt ngưỡng.
+        - Chỉ size đổi mức tồn mới được đẩy tồn kho mới tới các client đang xem trang sản phẩm.
+        """
+        batch_size = batch_size or settings.STOCK_EVENT_BATCH_SIZE
+        entries = await self._read_stock_events(batch_size)
+        if not entries:
+            return {"events": 0, "changed": 0}
+
+        size_ids = sorted({int(fields["key"].split(":")[1]) for _, fields in entries})
+        stock = await self.get_available_stock(size_ids)
+        previous = await self.redis.hmget(self.KEY_STOCK_LEVELS, [str(s) for s in size_ids])
+
+        changed = {}
+        for size_id, prev in zip(size_ids, previous):
+            if stock.get(size_id) is None:
+                continue
+            level = self._stock_level(stock[size_id])
+            if level != (prev or "in_stock"):
+                changed[size_id] = (prev or "in_stock", level)
+
+        # Batch chỉ gồm các sự kiện không đổi mức tồn -> không query DB, không gửi gì
+        rows = (await db.execute(
+            select(
+                ProductSize.size_id, ProductSize.size_name, ProductSize.in_stock,
+                Product.product_id, Product.name, Product.seller_id
+            )
+            .join(ProductVariant, ProductVariant.variant_id == ProductSize.variant_id)
+            .join(Product, Product.product_id == ProductVariant.product_id)
+            .where(ProductSize.size_id.in_(list(changed)))
+        )).all() if changed else []
+
+        # Chỉ bật lại in_stock cho size do hệ thống tắt (hết hàng), không đè lên size seller tự ẩn
+        sold_out, restocked = [], []
+        for r in rows:
+            prev, level = changed[r.size_id]
+            if level == "sold_out" and r.in_stock:
+                sold_out.append(r.size_id)
+            elif prev == "sold_out" and not r.in_stock:
+                restocked.append(r.size_id)
+
+        if sold_out:
+            await db.execute(update(ProductSize).where(ProductSize.size_id.in_(sold_out)).values(in_stock=False))
+        if restocked:
+            await db.execute(update(ProductSize).where(ProductSize.size_id.in_(restocked)).values(in_stock=True))
+        if sold_out or restocked:
+            await db.commit()
+
+        # Chỉ đẩy socket / báo seller cho size đổi mức tồn
+        for r in rows:
+            level = changed[r.size_id][1]
+            await socket_manager.send_to_user(
+                {
+                    "type": "STOCK_UPDATE",
+                    "product_id": r.product_id,
+                    "size_id": r.size_id,
+                    "stock": max(stock[r.size_id], 0),
+                    "level": level
+                },
+                r.product_id,
+                "product",
+                external_redis=self.redis
+            )
+
+            if level in ("low_stock", "sold_out"):
+                title = "Sản phẩm đã hết hàng" if level == "sold_out" else "Sản phẩm sắp hết hàng"
+                task_send_notification.delay(
+                    user_id=r.seller_id,
+                    role="seller",
+                    title=title,
+                    message=f"{r.name} (size {r.size_name}) còn {max(stock[r.size_id], 0)} sản phẩm.",
+                    event_type="stock_alert",
+                    data={"product_id": r.product_id, "size_id": r.size_id, "level": level}
+                )
+
+        pipe = self.redis.pipeline(transaction=True)
+        if changed:
+            pipe.hset(self.KEY_STOCK_LEVELS, mapping={str(s): lv for s, (_, lv) in changed.items()})
+        pipe.xack(self.KEY_STOCK_EVENTS, self.STOCK_EVENT_GROUP, *[entry_id for entry_id, _ in entries])
+        await pipe.execute()
+
+        if changed:
+            print(f"[STOCK EVENTS] {len(entries)} event(s), {len(changed)} size(s) changed level")
+
+        return {
+            "events": len(entries),
+            "changed": len(changed),
+            "sold_out": len(sold_out),
+            "restocked": len(restocked),
+        }
+
+
+inventory_service = InventoryService()
@@ -0,0 +1,151 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import desc, func, select
+
+from ...config.db import AsyncSessionLocal
+from ...models import Carrier, Order, OrderItem
+from ...models.users import Buyer
+from ...schemas.order import OrderExportFilter
+
+
+class OrderExportService:
+    """
+    Xuất lịch sử đơn hàng (CSV / NDJSON) dạng stream cho seller và admin.
+
+    - Server-side cursor (AsyncSession.stream + yield_per): mỗi lần chỉ giữ YIELD_PER dòng trong bộ nhớ,
+      không đếm tổng, không OFFSET -> bộ nhớ API không phụ thuộc số dòng xuất
+    - Async generator -> StreamingResponse: ghi ra client theo từng khối, nén gzip ngay khi stream nếu cần
+    - Generator tự mở session: session của Depends(get_db) đã đóng trước khi response stream xong
+    """
+    YIELD_PER = 1000
+    GZIP_LEVEL = 6
+
+    COLUMNS = [
+        "order_id", "order_date", "seller_id", "buyer_id", "buyer_name",
+        "order_status", "payment_status", "payment_method", "item_count",
+        "subtotal", "shipping_price", "discount_amount", "total_price",
+        "carrier_name", "delivery_date",
+    ]
+    MEDIA_TYPES = {
+        "csv": "text/csv; charset=utf-8",
+        "ndjson": "application/x-ndjson",
+    }
+
+    @staticmethod
+    def _query(filters: OrderExportFilter, seller_id: int | None):
+        conditions = []
+        if seller_id is not None:
+            conditions.append(Order.seller_id == seller_id)
+        if filters.status:
+            conditions.append(Order.order_status == filters.status)
+        if filters.date_from:
+            conditions.append(Order.order_date >= filters.date_from)
+        if filters.date_to:
+            conditions.append(Order.order_date <= filters.date_to)
+
+        item_count = (
+            select(func.count(OrderItem.order_item_id))
+            .where(OrderItem.order_id == Order.order_id, OrderItem.order_date == Order.order_date)
+            .correlate(Order)
+            .scalar_subquery()
+        )
+
+        return (
+            select(
+                Order.order_id,
+                Order.order_date,
+                Order.seller_id,
+                Order.buyer_id,
+                func.concat_ws(" ", Buyer.fname, Buyer.lname).label("buyer_name"),
+                Order.order_status,
+                Order.payment_status,
+                Order.payment_method,
+                item_count.label("item_count"),
+                Order.subtotal,
+                Order.shipping_price,
+                Order.discount_amount,
+                Order.total_price,
+                Carrier.carrier_name,
+                Order.delivery_date,
+            )
+            .join(Buyer, Buyer.buyer_id == Order.buyer_id)
+            .outerjoin(Carrier, Carrier.carrier_id == Order.carrier_id)
+            .where(*conditions)
+            .order_by(desc(Order.order_date), desc(Order.order_id))
+            .execution_options(yield_per=OrderExportService.YIELD_PER)
+        )
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def _encode_csv(self, rows, with_header: bool) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if with_header:
+            # BOM để Excel nhận đúng UTF-8 (tên tiếng Việt)
+            buffer.write("\ufeff")
+            writer.writerow(self.COLUMNS)
+        writer.writerows([self._value(v) for v in row] for row in rows)
+        return buffer.getvalue()
+
+    def _encode_ndjson(self, rows) -> str:
+        return "".join(
+            json.dumps(
+                {col: self._value(v) for col, v in zip(self.COLUMNS, row)},
+                ensure_ascii=False,
+                default=str
+            ) + "\n"
+            for row in rows
+        )
+
+    async def _chunks(self, filters: OrderExportFilter, seller_id: int | None) -> AsyncIterator[bytes]:
+        """Mỗi lần lặp: 1 khối YIELD_PER dòng đã mã hoá"""
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(self._query(filters, seller_id))
+            first = True
+            async for rows in result.partitions():
+                if filters.format == "csv":
+                    yield self._encode_csv(rows, with_header=first).encode("utf-8")
+                else:
+                    yield self._encode_ndjson(rows).encode("utf-8")
+                first = False
+
+            # Không có đơn nào -> CSV vẫn có dòng tiêu đề
+            if first and filters.format == "csv":
+                yield self._encode_csv([], with_header=True).encode("utf-8")
+
+    async def _gzip(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        compressor = zlib.compressobj(self.GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        async for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def export(self, filters: OrderExportFilter, seller_id: int | None = None) -> StreamingResponse:
+        """seller_id = None -> toàn bộ đơn (admin)"""
+        body = self._chunks(filters, seller_id)
+        filename = f"orders_{seller_id or 'all'}_{datetime.now():%Y%m%d_%H%M%S}.{filters.format}"
+        media_type = self.MEDIA_TYPES[filters.format]
+        if filters.gzip:
+            body = self._gzip(body)
+            filename += ".gz"
+            media_type = "application/gzip"
+
+        return StreamingResponse(
+            body,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+
+
+order_export_service = OrderExportService()
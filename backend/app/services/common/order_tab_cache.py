@@ -0,0 +1,37 @@
+import json
+
+import redis.asyncio as redis
+from ...config.redis import redis_pool
+
+
+class OrderTabCountCache:
+    """
+    Cache số đơn theo từng tab trên trang "Đơn mua" của buyer.
+
+    - Đọc: BuyerOrderService.get_order_tab_counts (cache-aside)
+    - Xoá: mọi chỗ chuyển trạng thái đơn (buyer đặt/huỷ/nhận hàng, seller xác nhận/giao/huỷ)
+    - TTL ngắn để tự lành nếu lỡ ghi đè số cũ lúc đang có chuyển trạng thái
+    """
+    KEY_PREFIX = "order:tab_counts"
+    TTL = 120
+
+    def __init__(self, redis_client: redis.Redis = None):
+        self.redis = redis_client or redis.Redis(connection_pool=redis_pool)
+
+    def _key(self, buyer_id: int) -> str:
+        return f"{self.KEY_PREFIX}:{buyer_id}"
+
+    async def get(self, buyer_id: int) -> dict[str, int] | None:
+        cached = await self.redis.get(self._key(buyer_id))
+        return json.loads(cached) if cached else None
+
+    async def set(self, buyer_id: int, counts: dict[str, int]):
+        await self.redis.set(self._key(buyer_id), json.dumps(counts), ex=self.TTL)
+
+    async def invalidate(self, *buyer_ids: int):
+        keys = [self._key(b) for b in set(buyer_ids) if b is not None]
+        if keys:
+            await self.redis.delete(*keys)
+
+
+order_tab_cache = OrderTabCountCache()
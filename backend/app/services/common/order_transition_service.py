@@ -0,0 +1,227 @@
+from fastapi import HTTPException, status
+from sqlalchemy import case, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ...models import Checkout, Order, OrderItem, Product
+from ...models.enums import PaymentStatusEnum
+from ...schemas.common import OrderStatus, PaymentMethod, PaymentStatus
+
+
+def _payment_status(value: PaymentStatus):
+    return cast(literal(value.value), PaymentStatusEnum)
+
+
+# ===================== BẢNG CHUYỂN TRẠNG THÁI ĐƠN =====================
+# from:   các trạng thái được phép chuyển đi
+# to:     trạng thái đích
+# values: các cột cập nhật kèm (biểu thức SQL, tính ngay trong câu UPDATE)
+# items:  RETURNING kèm danh sách item (cho hoàn kho / cộng sold_quantity / thống kê)
+ORDER_TRANSITIONS = {
+    "seller_confirm": {
+        "from": [OrderStatus.pending],
+        "to": OrderStatus.processing,
+        "values": {
+            # Chuyển khoản -> xác nhận đơn đồng nghĩa đã nhận tiền
+            "payment_status": case(
+                (Order.payment_method == PaymentMethod.bank_transfer.value, _payment_status(PaymentStatus.paid)),
+                else_=Order.payment_status
+            ),
+        },
+        "items": False,
+        "error": "Không thể xác nhận đơn ở trạng thái {status}",
+    },
+    "seller_ship": {
+        "from": [OrderStatus.processing],
+        "to": OrderStatus.shipped,
+        "values": {"delivery_date": func.now()},
+        "items": False,
+        "error": "Đơn hàng phải được xác nhận trước khi giao",
+    },
+    "seller_cancel": {
+        "from": [OrderStatus.pending, OrderStatus.processing],
+        "to": OrderStatus.cancelled,
+        "values": {},
+        "items": True,
+        "error": "Không thể huỷ đơn hàng đã giao",
+    },
+    "buyer_cancel": {
+        "from": [OrderStatus.pending],
+        "to": OrderStatus.cancelled,
+        "values": {
+            "payment_status": case(
+                (Order.payment_status == PaymentStatus.pending.value, _payment_status(PaymentStatus.failed)),
+                else_=Order.payment_status
+            ),
+        },
+        "items": True,
+        "error": "Không thể hủy đơn hàng ở trạng thái {status}",
+    },
+    "buyer_confirm_received": {
+        "from": [OrderStatus.shipped],
+        "to": OrderStatus.delivered,
+        "values": {
+            "delivery_date": func.now(),
+            "payment_status": _payment_status(PaymentStatus.paid),
+        },
+        "items": True,
+        "error": "Chỉ xác nhận khi đơn hàng đang được giao (shipped)",
+    },
+}
+
+
+class OrderTransitionService:
+    """
+    Chuyển trạng thái đơn bằng 1 câu UPDATE có điều kiện:
+
+        UPDATE "order" SET order_status = :to, ...
+        WHERE order_id = :id AND <chủ đơn> AND order_status IN (:from)
+        RETURNING ...
+
+    - Không cần SELECT trước rồi kiểm tra bằng Python -> 1 round trip, không race giữa 2 request đồng thời
+      (request chậm hơn không khớp điều kiện trạng thái và nhận lỗi 400)
+    - Side effect (hoàn kho, sold_quantity, thống kê, thông báo) chạy từ dòng RETURNING
+    - Chỉ khi không có dòng nào được cập nhật mới SELECT thêm để trả đúng lỗi 404 / 400
+    - Không commit: service gọi tự commit (có thể gộp thêm câu lệnh khác trong cùng transaction)
+    """
+
+    @staticmethod
+    def _owner_filter(buyer_id: int | None, seller_id: int | None) -> list:
+        conditions = []
+        if buyer_id is not None:
+            conditions.append(Order.buyer_id == buyer_id)
+        if seller_id is not None:
+            conditions.append(Order.seller_id == seller_id)
+        return conditions
+
+    @staticmethod
+    def _returning(with_items: bool) -> list:
+        columns = list(Order.__table__.c)
+        if with_items:
+            items = (
+                select(
+                    func.jsonb_agg(
+                        func.jsonb_build_object(
+                            "product_id", OrderItem.product_id,
+                            "size_id", OrderItem.size_id,
+                            "quantity", OrderItem.quantity,
+                            "total_price", OrderItem.total_price,
+                            "category_id", Product.category_id,
+                        ),
+                        type_=JSONB
+                    )
+                )
+                .select_from(OrderItem)
+                .join(Product, Product.product_id == OrderItem.product_id)
+                .where(OrderItem.order_id == Order.order_id, OrderItem.order_date == Order.order_date)
+                .correlate(Order)
+                .scalar_subquery()
+            )
+            columns.append(items.label("items"))
+        return columns
+
+    async def transition(
+        self,
+        db: AsyncSession,
+        action: str,
+        order_id: int,
+        *,
+        buyer_id: int | None = None,
+        seller_id: int | None = None,
+        extra_values: dict | None = None,
+    ):
+        """
+        Chạy transition `action` trong ORDER_TRANSITIONS cho đơn `order_id` thuộc buyer/seller.
+        Trả về dòng RETURNING (đủ các cột của order [+ items]).
+        """
+        rule = ORDER_TRANSITIONS[action]
+        owner = self._owner_filter(buyer_id, seller_id)
+
+        stmt = (
+            update(Order)
+            .where(
+                Order.order_id == order_id,
+                Order.order_status.in_([s.value for s in rule["from"]]),
+                *owner
+            )
+            .values(order_status=rule["to"].value, **rule["values"], **(extra_values or {}))
+            .returning(*self._returning(rule["items"]))
+            .execution_options(synchronize_session=False)
+        )
+        row = (await db.execute(stmt)).one_or_none()
+        if row is not None:
+            return row
+
+        # Không cập nhật được: đơn không tồn tại / không thuộc về user, hoặc sai trạng thái
+        current = (await db.execute(
+            select(Order.order_status).where(Order.order_id == order_id, *owner)
+        )).scalar_one_or_none()
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Không tìm thấy đơn hàng hoặc bạn không có quyền"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=rule["error"].format(status=current)
+        )
+
+    # ===================== TRẢ LƯỢT MÃ GIẢM GIÁ KHI HUỶ ĐƠN =====================
+    # Dùng chung cho buyer huỷ, seller huỷ và job tự huỷ đơn quá hạn (orders.expire_pending):
+    # 1 phiên checkout chỉ dùng 1 lượt dù tách thành nhiều đơn -> chỉ trả khi mọi đơn của checkout đã bị huỷ;
+    # đơn cũ không có checkout_id -> mỗi đơn 1 lượt.
+    # Khoá dòng checkout (theo thứ tự checkout_id) trước khi đếm đơn còn mở: 2 đơn cùng checkout bị huỷ đồng thời
+    # thì transaction sau chờ transaction trước commit rồi mới đếm -> đúng 1 transaction trả lượt.
+
+    @staticmethod
+    def _discount_checkouts(orders) -> dict[int, int]:
+        return {o.checkout_id: o.discount_id for o in orders if o.discount_id and o.checkout_id}
+
+    @staticmethod
+    def _lock_checkouts(checkout_ids):
+        return (
+            select(Checkout.checkout_id)
+            .where(Checkout.checkout_id.in_(checkout_ids))
+            .order_by(Checkout.checkout_id)
+            .with_for_update()
+        )
+
+    @staticmethod
+    def _open_checkouts(checkout_ids):
+        return (
+            select(Order.checkout_id)
+            .where(Order.checkout_id.in_(checkout_ids), Order.order_status != OrderStatus.cancelled.value)
+            .distinct()
+        )
+
+    @staticmethod
+    def _released(orders, checkouts: dict[int, int], still_open: set[int]) -> list[int]:
+        return (
+            [discount_id for checkout_id, discount_id in checkouts.items() if checkout_id not in still_open]
+            + [o.discount_id for o in orders if o.discount_id and not o.checkout_id]
+        )
+
+    async def released_discounts(self, db: AsyncSession, orders) -> list[int]:
+        """
+        discount_id cần trả 1 lượt khi huỷ `orders` (các dòng RETURNING, đã chuyển sang cancelled
+        trong transaction hiện tại). Không commit.
+        """
+        checkouts = self._discount_checkouts(orders)
+        still_open = set()
+        if checkouts:
+            await db.execute(self._lock_checkouts(list(checkouts)))
+            still_open = set((await db.execute(self._open_checkouts(list(checkouts)))).scalars())
+        return self._released(orders, checkouts, still_open)
+
+    def released_discounts_sync(self, db: Session, orders) -> list[int]:
+        """Như released_discounts, cho task Celery dùng session sync"""
+        checkouts = self._discount_checkouts(orders)
+        still_open = set()
+        if checkouts:
+            db.execute(self._lock_checkouts(list(checkouts)))
+            still_open = set(db.execute(self._open_checkouts(list(checkouts))).scalars())
+        return self._released(orders, checkouts, still_open)
+
+
+order_transition_service = OrderTransitionService()
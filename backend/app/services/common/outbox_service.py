@@ -0,0 +1,28 @@
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...models import OutboxMessage
+
+
+class OutboxService:
+    """
+    Ghi các task Celery (dashboard, thông báo, thống kê) vào bảng outbox_message
+    trong cùng transaction với thay đổi của đơn hàng.
+
+    - Request không phải chờ broker: chỉ thêm 1 câu INSERT nhiều dòng trước khi commit
+    - Transaction rollback -> task cũng biến mất; commit xong mà process chết -> relay vẫn gửi
+    - Relay (task outbox.relay) đọc theo batch và publish lên Celery (at-least-once)
+    """
+
+    @staticmethod
+    def task(celery_task, *args, **kwargs) -> dict:
+        """Đóng gói 1 lần gọi task, giống celery_task.delay(*args, **kwargs)"""
+        return {"task_name": celery_task.name, "args": list(args), "kwargs": kwargs}
+
+    @staticmethod
+    async def enqueue(db: AsyncSession, messages: list[dict]):
+        """Thêm các message vào transaction hiện tại (không commit)"""
+        if messages:
+            await db.execute(insert(OutboxMessage), messages)
+
+
+outbox_service = OutboxService()
@@ -3,7 +3,7 @@ import json
 from datetime import datetime
 from calendar import monthrange
 from fastapi import Depends
-from sqlalchemy import func, select, desc, case, and_, extract
+from sqlalchemy import func, select, desc, and_, extract
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
 
@@ -26,27 +26,21 @@ class SellerDashboardService:
     async def _query_general_stats(self, seller_id: int):
         """
         Lấy 4 chỉ số quan trọng: Doanh thu, Tổng đơn, Đơn chờ, Đơn hủy.
+        1 lần quét index (seller_id, order_status, order_date), không join order_item / product.
         """
         stmt = select(
-            func.count(func.distinct(Order.order_id)).label("total_orders"),
+            func.count(Order.order_id).label("total_orders"),
 
             #Tổng Doanh thu
-            func.sum(
-                case(
-                    (Order.order_status == OrderStatus.delivered, OrderItem.total_price),
-                    else_=0
-                )
-            ).label("revenue"),
+            func.sum(Order.subtotal).filter(Order.order_status == OrderStatus.delivered).label("revenue"),
 
             # Tổng số đơn hủy
-            func.count(func.distinct(case((Order.order_status == OrderStatus.cancelled, Order.order_id)))).label(
-                "cancelled"),
+            func.count(Order.order_id).filter(Order.order_status == OrderStatus.cancelled).label("cancelled"),
 
             # Số đơn đang chờ xử lý
-            func.count(func.distinct(case((Order.order_status == OrderStatus.pending, Order.order_id)))).label(
-                "pending"),
-        ).join(Order.items).join(OrderItem.product).where(
-            Product.seller_id == seller_id
+            func.count(Order.order_id).filter(Order.order_status == OrderStatus.pending).label("pending"),
+        ).where(
+            Order.seller_id == seller_id
         )
 
         result = await self.db.execute(stmt)
@@ -61,14 +55,17 @@ class SellerDashboardService:
 
 
     async def _query_monthly_chart(self, seller_id: int, year: int):
+        # Lọc theo khoảng ngày (không dùng extract trên cột) để Postgres dùng được index
+        # và chỉ quét các partition tháng nằm trong khoảng (partition pruning)
         stmt = select(
             extract('month', Order.order_date).label("month"),
-            func.sum(OrderItem.total_price).label("total")
-        ).join(Order.items).join(OrderItem.product).where(
+            func.sum(Order.subtotal).label("total")
+        ).where(
             and_(
-                Product.seller_id == seller_id,
-                extract('year', Order.order_date) == year,
-                Order.order_status == OrderStatus.delivered
+                Order.seller_id == seller_id,
+                Order.order_status == OrderStatus.delivered,
+                Order.order_date >= datetime(year, 1, 1),
+                Order.order_date < datetime(year + 1, 1, 1)
             )
         ).group_by(extract('month', Order.order_date))
 
@@ -78,21 +75,25 @@ class SellerDashboardService:
 
 
     async def _query_daily_chart(self, seller_id: int, month: int, year: int):
+        _, days_in_month = monthrange(year, month)
+        month_start = datetime(year, month, 1)
+        month_end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+
+        # Chỉ quét partition của tháng cần xem -> không phụ thuộc tổng số đơn trong lịch sử
         stmt = select(
             extract('day', Order.order_date).label("day"),
-            func.sum(OrderItem.total_price).label("total")
-        ).join(Order.items).join(OrderItem.product).where(
+            func.sum(Order.subtotal).label("total")
+        ).where(
             and_(
-                Product.seller_id == seller_id,
-                extract('year', Order.order_date) == year,
-                extract('month', Order.order_date) == month,
-                Order.order_status == OrderStatus.delivered
+                Order.seller_id == seller_id,
+                Order.order_status == OrderStatus.delivered,
+                Order.order_date >= month_start,
+                Order.order_date < month_end
             )
         ).group_by(extract('day', Order.order_date))
 
         result = await self.db.execute(stmt)
         data_map = {int(row.day): float(row.total) for row in result.all()}
-        _, days_in_month = monthrange(year, month)
 
         return [data_map.get(d, 0) for d in range(1, days_in_month + 1)]
 
@@ -107,7 +108,7 @@ class SellerDashboardService:
             func.sum(OrderItem.quantity).label("sold"),
             func.sum(OrderItem.total_price).label("revenue")
         ).join(OrderItem, Product.product_id == OrderItem.product_id) \
-            .join(Order, OrderItem.order_id == Order.order_id) \
+            .join(Order, and_(OrderItem.order_id == Order.order_id, OrderItem.order_date == Order.order_date)) \
             .outerjoin(
             ProductImage,
             and_(
@@ -117,6 +118,7 @@ class SellerDashboardService:
         ) \
             .where(
             and_(
+                Order.seller_id == seller_id,
                 Product.seller_id == seller_id,
                 Order.order_status == OrderStatus.delivered
             )
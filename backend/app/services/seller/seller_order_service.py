@@ -1,13 +1,12 @@
-from datetime import datetime
 from fastapi import HTTPException, Depends, status
-from sqlalchemy import select, desc, func, distinct
+from sqlalchemy import select, desc, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, joinedload, load_only
 
 from ...config import public_url
 from ...config.db import get_db
-from ...models import Order, OrderItem, Product, BuyerAddress, Buyer
-from ...schemas import PaymentStatus, PaymentMethod
+from ...models import Order, OrderItem, BuyerAddress, Buyer
+from ...schemas import PaymentMethod
 from ...schemas.common import OrderStatus, PageMeta, Page
 from ...schemas.seller_order import (
     SellerOrderFilter,
@@ -19,9 +18,13 @@ from ...schemas.address import AddressResponse
 from ...schemas.order import OrderItemResponse
 
 from ...tasks.notification_task import task_send_notification
+from ...tasks.order_task import task_release_reservations
 
+from ..common.discount_usage_service import discount_usage_service
 from ..common.inventory_service import inventory_service
-from ...tasks.inventory import update_stock_db
+from ..common.order_tab_cache import order_tab_cache
+from ..common.order_transition_service import order_transition_service
+from ..common.outbox_service import outbox_service
 from ...tasks.admin_dashboard_task import task_admin_revert_order_stats
 from ...tasks.seller_dashboard_task import task_seller_recalc_dashboard
 
@@ -30,82 +33,42 @@ class SellerOrderService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def _get_order_lightweight(self, seller_id: int, order_id: int):
-        """
-        Lấy các trường cần thiết để kiểm tra logic (Status, ID, BuyerID).
-        Dùng cho các hành động: Confirm, Ship, Cancel.
-        """
-        stmt = (
-            select(Order)
-            .join(Order.items)
-            .join(OrderItem.product)
-            .where(
-                Order.order_id == order_id,
-                Product.seller_id == seller_id
-            )
-            .options(
-                load_only(
-                    Order.order_id,
-                    Order.order_status,
-                    Order.notes,
-                    Order.buyer_id,
-                    Order.payment_method,
-                    Order.payment_status
-                ),
-                selectinload(Order.items).load_only(
-                    OrderItem.size_id,
-                    OrderItem.quantity,
-                    OrderItem.order_item_id
-                )
-            )
-            .distinct()
-        )
-
-        result = await self.db.execute(stmt)
-        order = result.scalar_one_or_none()
-
-        if not order:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Đơn hàng không tồn tại hoặc không thuộc shop của bạn"
-            )
-        return order
-
     async def list_orders(self, seller_id: int, filters: SellerOrderFilter) -> Page:
         """
         Lấy danh sách đơn hàng có phân trang (chỉ lấy thông tin tóm tắt)
+        Lọc thẳng trên order.seller_id -> dùng index (seller_id, order_status, order_date DESC)
         """
-        stmt = (
-            select(Order)
-            .join(Order.items)
-            .join(OrderItem.product)
-            .where(Product.seller_id == seller_id)
-            .distinct()
-        )
-
+        conditions = [Order.seller_id == seller_id]
         if filters.status:
-            stmt = stmt.where(Order.order_status == filters.status)
+            conditions.append(Order.order_status == filters.status)
         if filters.date_from:
-            stmt = stmt.where(Order.order_date >= filters.date_from)
+            conditions.append(Order.order_date >= filters.date_from)
         if filters.date_to:
-            stmt = stmt.where(Order.order_date <= filters.date_to)
+            conditions.append(Order.order_date <= filters.date_to)
 
-        count_stmt = select(func.count()).select_from(stmt.subquery())
+        count_stmt = select(func.count(Order.order_id)).where(*conditions)
         total_res = await self.db.execute(count_stmt)
         total = total_res.scalar() or 0
 
         offset = (filters.page - 1) * filters.limit
 
+        item_count = (
+            select(func.count(OrderItem.order_item_id))
+            .where(OrderItem.order_id == Order.order_id, OrderItem.order_date == Order.order_date)
+            .correlate(Order)
+            .scalar_subquery()
+        )
+
         stmt = (
-            stmt
+            select(Order, item_count.label("item_count"))
+            .where(*conditions)
             .options(
                 load_only(
                     Order.order_id, Order.order_date,
                     Order.order_status, Order.payment_status,
                     Order.payment_method, Order.total_price
                 ),
-                joinedload(Order.buyer).load_only(Buyer.fname, Buyer.lname),
-                selectinload(Order.items).load_only(OrderItem.order_item_id)
+                joinedload(Order.buyer).load_only(Buyer.fname, Buyer.lname)
             )
             .order_by(desc(Order.order_date))
             .offset(offset)
@@ -113,10 +76,10 @@ class SellerOrderService:
         )
 
         result = await self.db.execute(stmt)
-        orders = result.scalars().all()
+        rows = result.all()
 
         data = []
-        for o in orders:
+        for o, count in rows:
             item = SellerOrderListItem(
                 order_id=o.order_id,
                 order_date=o.order_date,
@@ -125,7 +88,7 @@ class SellerOrderService:
                 payment_method=o.payment_method,
                 total_price=o.total_price,
                 buyer_name=f"{o.buyer.fname} {o.buyer.lname or ''}".strip(),
-                item_count=len(o.items)
+                item_count=count
             )
             data.append(item)
 
@@ -141,24 +104,17 @@ class SellerOrderService:
     async def get_order_detail(self, seller_id: int, order_id: int):
         stmt = (
             select(Order)
-            .join(Order.items)
-            .join(OrderItem.product)
             .where(
                 Order.order_id == order_id,
-                Product.seller_id == seller_id
+                Order.seller_id == seller_id
             )
             .options(
-                # 1. Load sâu vào trong: Items
-                selectinload(Order.items).options(
-                    joinedload(OrderItem.product).selectinload(Product.images),
-                    joinedload(OrderItem.size),
-                    joinedload(OrderItem.variant)
-                ),
+                # 1. Items: tên/ảnh/phân loại lấy từ snapshot trên order_item
+                selectinload(Order.items),
                 selectinload(Order.buyer),
                 selectinload(Order.carrier),
                 selectinload(Order.shipping_address).selectinload(BuyerAddress.address)
             )
-            .distinct()
         )
         result = await self.db.execute(stmt)
         order = result.scalar_one_or_none()
@@ -179,31 +135,9 @@ class SellerOrderService:
 
         # Xử lý danh sách sản phẩm
         items_resp = []
-        for item in order.items:
+        for item in sorted(order.items, key=lambda i: i.order_item_id):
             item_data = OrderItemResponse.model_validate(item)
-
-            # --- Xử lý Product  ---
-            if item.product:
-                item_data.product_name = item.product.name
-                if item.product.images:
-                    primary_img = next((img for img in item.product.images if img.is_primary), None)
-                    if primary_img:
-                        item_data.product_image = public_url(primary_img.image_url)
-                    else:
-                        item_data.product_image = public_url(item.product.images[0].image_url)
-                else:
-                    item_data.product_image = None
-
-            # --- Xử lý Size ---
-            if item.size:
-                item_data.size_name = item.size.size_name
-
-            if item.variant:
-                item_data.variant_id = item.variant.variant_id
-                item_data.variant_name = item.variant.variant_name
-            elif item.variant_id:
-                item_data.variant_id = item.variant_id
-
+            item_data.product_image = public_url(item.image_url) if item.image_url else None
             items_resp.append(item_data)
 
         return SellerOrderDetailResponse(
@@ -226,37 +160,30 @@ class SellerOrderService:
 
     async def confirm_order(self, seller_id: int, order_id: int):
         """Xác nhận đơn hàng (Pending -> Processing)"""
-        order = await self._get_order_lightweight(seller_id, order_id)
-
-        if order.order_status != OrderStatus.pending:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Không thể xác nhận đơn ở trạng thái {order.order_status}"
-            )
-
-        order.order_status = OrderStatus.processing
-
-        # Xử lý trạng thái thanh toán
-        if order.payment_method == PaymentMethod.bank_transfer:
-            order.payment_status = PaymentStatus.paid
-
-        await self.db.commit()
-
-        # Cập nhật thống kê Dashboard
-        task_seller_recalc_dashboard.delay(seller_id)
+        # 1 câu UPDATE có điều kiện: chuyển khoản -> payment_status = paid ngay trong câu lệnh
+        order = await order_transition_service.transition(
+            self.db, "seller_confirm", order_id, seller_id=seller_id
+        )
 
         msg = f"Shop đã xác nhận đơn hàng #{order.order_id}."
         if order.payment_method == PaymentMethod.bank_transfer:
             msg += " Đã nhận được thanh toán chuyển khoản."
 
-        task_send_notification.delay(
-            user_id=order.buyer_id,
-            role="buyer",
-            title="Đơn hàng đã được xác nhận",
-            message=msg,
-            event_type="order_update",
-            data={"order_id": order.order_id, "status": "processing"}
-        )
+        # Dashboard + thông báo đi qua outbox, ghi cùng transaction với việc chuyển trạng thái
+        await outbox_service.enqueue(self.db, [
+            outbox_service.task(task_seller_recalc_dashboard, seller_id),
+            outbox_service.task(
+                task_send_notification,
+                user_id=order.buyer_id,
+                role="buyer",
+                title="Đơn hàng đã được xác nhận",
+                message=msg,
+                event_type="order_update",
+                data={"order_id": order.order_id, "status": "processing"}
+            ),
+        ])
+        await self.db.commit()
+        await order_tab_cache.invalidate(order.buyer_id)
 
         return {
             "message": "Đã xác nhận đơn hàng",
@@ -266,69 +193,64 @@ class SellerOrderService:
 
     async def mark_as_shipped(self, seller_id: int, order_id: int):
         """Giao hàng (Processing -> Shipped)"""
-        order = await self._get_order_lightweight(seller_id, order_id)
-
-        if order.order_status != OrderStatus.processing:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Đơn hàng phải được xác nhận trước khi giao"
-            )
-
-        order.order_status = OrderStatus.shipped
-        order.delivery_date = datetime.now()
-        await self.db.commit()
-
-        task_send_notification.delay(
-            user_id=order.buyer_id,
-            role="buyer",
-            title="Đơn hàng đang được giao",
-            message=f"Đơn hàng #{order.order_id} đã được giao cho đơn vị vận chuyển.",
-            event_type="order_update",
-            data={"order_id": order.order_id, "status": "shipped"}
+        order = await order_transition_service.transition(
+            self.db, "seller_ship", order_id, seller_id=seller_id
         )
+        await outbox_service.enqueue(self.db, [
+            outbox_service.task(
+                task_send_notification,
+                user_id=order.buyer_id,
+                role="buyer",
+                title="Đơn hàng đang được giao",
+                message=f"Đơn hàng #{order.order_id} đã được giao cho đơn vị vận chuyển.",
+                event_type="order_update",
+                data={"order_id": order.order_id, "status": "shipped"}
+            ),
+        ])
+        await self.db.commit()
+        await order_tab_cache.invalidate(order.buyer_id)
 
         return {"message": "Đã cập nhật trạng thái giao hàng", "status": OrderStatus.shipped}
 
     async def cancel_order(self, seller_id: int, order_id: int, reason: str):
         """Hủy đơn hàng và Hoàn kho + Trừ thống kê Dashboard"""
-        order_check = await self._get_order_lightweight(seller_id, order_id)
-
-        allowed = [OrderStatus.pending, OrderStatus.processing]
-        if order_check.order_status not in allowed:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Không thể huỷ đơn hàng đã giao"
-            )
-
-        stmt_full = (
-            select(Order)
-            .options(
-                selectinload(Order.items).selectinload(OrderItem.product)
-            )
-            .where(Order.order_id == order_id)
+        order = await order_transition_service.transition(
+            self.db, "seller_cancel", order_id, seller_id=seller_id,
+            extra_values={
+                "notes": func.concat(func.coalesce(Order.notes, ""), f" | [Shop Cancel]: {reason}")
+            }
         )
-        result_full = await self.db.execute(stmt_full)
-        order = result_full.scalar_one()
-
-        order.order_status = OrderStatus.cancelled
-        order.notes = f"{order.notes or ''} | [Shop Cancel]: {reason}"
-
-        for item in order.items:
-            await inventory_service.restore_stock(item.size_id, item.quantity)
-            update_stock_db.delay(item.size_id, item.quantity)
-
+        await outbox_service.enqueue(self.db, [
+            outbox_service.task(
+                task_send_notification,
+                user_id=order.buyer_id,
+                role="buyer",
+                title="Đơn hàng đã bị hủy",
+                message=f"Đơn hàng #{order.order_id} đã bị hủy bởi Shop. Lý do: {reason}",
+                event_type="order_cancelled",
+                data={"order_id": order.order_id, "reason": reason}
+            ),
+            outbox_service.task(task_seller_recalc_dashboard, seller_id),
+        ])
+        # Hoàn kho từ danh sách item trả về cùng câu UPDATE: delta DB ghi cùng transaction (worker write-back),
+        # trả lượt mã giảm giá cùng quy tắc với buyer huỷ / tự huỷ quá hạn (delta -1 vào discount_usage_delta).
+        # Redis trong Lua script sau khi commit, kèm message outbox để thử lại nếu Redis lỗi
+        restored = [(item["size_id"], item["quantity"]) for item in order.items or [] if item["size_id"]]
+        release_id = f"order:{order.order_id}:cancel"
+        discount_ids = await order_transition_service.released_discounts(self.db, [order])
+        await inventory_service.queue_stock_deltas(self.db, restored)
+        await discount_usage_service.queue_usage_deltas(self.db, [(d, -1) for d in discount_ids])
+        await outbox_service.enqueue(self.db, [
+            outbox_service.task(task_release_reservations, release_id, restored, discount_ids)
+        ])
         await self.db.commit()
+        await order_tab_cache.invalidate(order.buyer_id)
 
-        task_send_notification.delay(
-            user_id=order.buyer_id,
-            role="buyer",
-            title="Đơn hàng đã bị hủy",
-            message=f"Đơn hàng #{order.order_id} đã bị hủy bởi Shop. Lý do: {reason}",
-            event_type="order_cancelled",
-            data={"order_id": order.order_id, "reason": reason}
-        )
-
-        task_seller_recalc_dashboard.delay(seller_id)
+        try:
+            await inventory_service.release_items(restored, release_id=release_id)
+            await discount_usage_service.release_once(release_id, discount_ids)
+        except Exception as e:
+            print(f"[ORDER CANCEL ERROR] Redis release for order #{order.order_id} left to outbox retry: {e}")
 
         return {"message": "Đã huỷ đơn hàng và hoàn kho", "status": OrderStatus.cancelled}
 
@@ -10,6 +10,7 @@ from sqlalchemy import func, select, update, delete
 from ...config.db import get_db
 from ...config.s3 import public_url
 from ...utils.storage import storage
+from ..common.inventory_service import inventory_service
 
 from ...models.catalog import Product, ProductImage, ProductSize, ProductVariant
 
@@ -18,6 +19,7 @@ from ...schemas.product import (
     ProductCreate, ProductDetail, ProductList, ProductResponse,
     ProductSizeCreate, ProductSizeResponse, ProductSizeUpdate, ProductUpdate,
     ProductVariantCreate, ProductVariantResponse, ProductVariantUpdate, ProductImageResponse,
+    StockShardingResponse,
 )
 from .seller_base_product import SellerBaseProductService
 
@@ -304,6 +306,15 @@ class SellerProductService(SellerBaseProductService):
 
         return {"deleted": True}
 
+    async def set_size_stock_shards(self, seller_id: int, product_id: int, variant_id: int, size_id: int,
+                                    shards: int):
+        await self._ensure_product_ownership(seller_id, product_id)
+        await self._ensure_variant_ownership(product_id, variant_id)
+        await self._ensure_size_ownership(variant_id, size_id)
+
+        result = await inventory_service.set_stock_shards(self.db, size_id, shards)
+        return StockShardingResponse(**result)
+
     async def get_variant_sizes(self, seller_id: int, product_id: int, variant_id: int):
         await self._ensure_product_ownership(seller_id, product_id)
         await self._ensure_variant_ownership(product_id, variant_id)
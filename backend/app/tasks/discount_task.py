@@ -0,0 +1,197 @@
+import csv
+import io
+import secrets
+from datetime import date
+from decimal import Decimal
+
+import redis
+from sqlalchemy import Integer, column, delete, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from ..config.db import SyncSessionLocal
+from ..config.s3 import get_s3_client
+from ..config.settings import settings
+from ..models.catalog import Discount, DiscountUsageDelta
+from ..services.common.discount_usage_service import DiscountUsageService
+from ..utils.celery_client import celery_app
+from .inventory import merge_stock_deltas
+
+
+# Sinh mã hàng loạt: bỏ 0/O, 1/I để người dùng gõ lại không nhầm
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+BULK_CHUNK_SIZE = 5000
+BULK_MAX_EMPTY_CHUNKS = 5
+BULK_JOB_KEY = "discount:bulk:{job_id}"
+BULK_JOB_TTL = 86400
+BULK_FILE_KEY = "exports/discount-codes/{job_id}.csv"
+
+
+@celery_app.task(
+    bind=True,
+    max_retries=5,
+    default_retry_delay=5,
+    name="discounts.settle_usage"
+)
+def settle_discount_usage(self, batch_size: int = None):
+    """
+    Ghi net lượt dùng mã giảm giá trong bảng discount_usage_delta xuống discount.used_count
+    (giống inventory.flush_stock_writeback).
+    - Mỗi batch 1 transaction: DELETE ... RETURNING các dòng cũ nhất (SKIP LOCKED) + 1 câu UPDATE ... FROM (VALUES ...)
+      theo net delta -> dòng đã xoá thì lượt đã được ghi, worker chết giữa chừng thì cả 2 cùng rollback
+    - Nhiều worker chạy song song không lấy trùng dòng; lặp tới khi bảng hết delta
+    """
+    batch_size = batch_size or settings.DISCOUNT_SETTLE_BATCH_SIZE
+    db = SyncSessionLocal()
+    settled = 0
+    try:
+        while True:
+            batch = (
+                select(DiscountUsageDelta.delta_id)
+                .order_by(DiscountUsageDelta.delta_id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = db.execute(
+                delete(DiscountUsageDelta)
+                .where(DiscountUsageDelta.delta_id.in_(batch))
+                .returning(DiscountUsageDelta.discount_id, DiscountUsageDelta.delta)
+            ).all()
+            if not rows:
+                break
+
+            deltas = merge_stock_deltas((r.discount_id, r.delta) for r in rows)
+            updated = 0
+            if deltas:
+                delta_values = values(
+                    column("discount_id", Integer),
+                    column("delta", Integer),
+                    name="usage_delta"
+                ).data(deltas)
+                updated = db.execute(
+                    update(Discount)
+                    .where(Discount.discount_id == delta_values.c.discount_id)
+                    .values(used_count=Discount.used_count + delta_values.c.delta)
+                ).rowcount
+            db.commit()
+
+            if updated < len(deltas):
+                print(f"[WARNING] {len(deltas) - updated} discount(s) not found in DB to settle usage")
+
+            settled += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        if not settled:
+            return "Nothing to settle"
+        return f"Settled {settled} usage delta(s)"
+
+    except Exception as e:
+        db.rollback()
+        print(f"[CELERY ERROR] Discount usage settle failed: {e}")
+        raise self.retry(exc=e)
+    finally:
+        db.close()
+
+
+def _random_codes(prefix: str, length: int, count: int, seen: set[str]) -> list[str]:
+    """count mã ngẫu nhiên chưa từng sinh trong job (trùng với mã đã có trong DB do ON CONFLICT lọc)"""
+    codes = set()
+    while len(codes) < count:
+        code = prefix + "".join(secrets.choice(CODE_ALPHABET) for _ in range(length))
+        if code not in seen:
+            codes.add(code)
+    seen.update(codes)
+    return list(codes)
+
+
+def _codes_csv(codes: list[str]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["code"])
+    writer.writerows([code] for code in codes)
+    return buffer.getvalue().encode("utf-8")
+
+
+@celery_app.task(name="discounts.generate_codes")
+def generate_discount_codes(job_id: str, params: dict):
+    """
+    Sinh `quantity` mã ngẫu nhiên, không trùng, cùng thông số cho 1 chiến dịch (POST /admin/discounts/bulk).
+    - Mỗi chunk BULK_CHUNK_SIZE mã là 1 câu INSERT nhiều dòng ... ON CONFLICT (code) DO NOTHING RETURNING:
+      mã trùng với mã đã có bị bỏ qua và được sinh bù ở chunk sau; cả job 1 transaction (lỗi -> không tạo mã nào)
+    - Nạp sẵn bộ đếm lượt dùng trên Redis (= 0) để lần dùng đầu không phải nạp từ DB
+    - Ghi file CSV danh sách mã lên S3, trạng thái job lưu trong Redis (GET /admin/discounts/bulk/{job_id})
+    """
+    redis_client = redis.Redis.from_url(
+        settings.redis_url_cache,
+        encoding="utf-8",
+        decode_responses=True
+    )
+    job_key = BULK_JOB_KEY.format(job_id=job_id)
+    quantity = params["quantity"]
+    shared = {
+        "campaign": params["campaign"],
+        "discount_percent": Decimal(params["discount_percent"]),
+        "min_order_value": Decimal(params["min_order_value"]),
+        "max_discount": Decimal(params["max_discount"]) if params["max_discount"] is not None else None,
+        "start_date": date.fromisoformat(params["start_date"]),
+        "end_date": date.fromisoformat(params["end_date"]),
+        "usage_limit": params["usage_limit"],
+        "used_count": 0,
+        "is_active": True,
+    }
+
+    db = SyncSessionLocal()
+    created: list[tuple[int, str]] = []
+    try:
+        redis_client.hset(job_key, "status", "running")
+        seen = set()
+        empty_chunks = 0
+        while len(created) < quantity:
+            codes = _random_codes(
+                params["prefix"].upper(), params["code_length"], min(BULK_CHUNK_SIZE, quantity - len(created)), seen
+            )
+            rows = db.execute(
+                pg_insert(Discount)
+                .values([{**shared, "code": code} for code in codes])
+                .on_conflict_do_nothing(index_elements=[Discount.code])
+                .returning(Discount.discount_id, Discount.code)
+            ).all()
+            if not rows:
+                empty_chunks += 1
+                if empty_chunks >= BULK_MAX_EMPTY_CHUNKS:
+                    raise ValueError("Không sinh được mã mới, hãy tăng code_length hoặc đổi prefix")
+                continue
+
+            empty_chunks = 0
+            created.extend((row.discount_id, row.code) for row in rows)
+            redis_client.hset(job_key, "created", len(created))
+
+        db.commit()
+
+        # Bộ đếm lượt dùng (discount_usage_service) cho mã mới, theo từng chunk
+        for start in range(0, len(created), BULK_CHUNK_SIZE):
+            redis_client.hset(
+                DiscountUsageService.KEY_USED,
+                mapping={str(discount_id): 0 for discount_id, _ in created[start:start + BULK_CHUNK_SIZE]}
+            )
+
+        file_key = BULK_FILE_KEY.format(job_id=job_id)
+        get_s3_client().put_object(
+            Bucket=settings.S3_BUCKET,
+            Key=file_key,
+            Body=_codes_csv([code for _, code in created]),
+            ContentType="text/csv; charset=utf-8",
+        )
+
+        redis_client.hset(job_key, mapping={"status": "done", "created": len(created), "file_key": file_key})
+        print(f"[DISCOUNT BULK] Job {job_id}: created {len(created)} code(s) for campaign {params['campaign']}")
+        return {"created": len(created)}
+
+    except Exception as e:
+        db.rollback()
+        redis_client.hset(job_key, mapping={"status": "failed", "error": str(e)})
+        print(f"[DISCOUNT BULK ERROR] Job {job_id}: {e}")
+        raise
+    finally:
+        redis_client.expire(job_key, BULK_JOB_TTL)
+        redis_client.close()
+        db.close()
@@ -1,42 +1,199 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import redis
+import redis.asyncio as aioredis
 from celery import shared_task
-from sqlalchemy import update
-from ..config.db import SyncSessionLocal
-from ..models import ProductSize
+from sqlalchemy import delete, update, select, values, column, Integer
+from ..config.db import SyncSessionLocal, AsyncSessionLocal
+from ..config.settings import settings
+from ..models import ProductSize, StockDelta
+from ..services.common.inventory_service import InventoryService
+
+
+def merge_stock_deltas(deltas: list) -> list[tuple[int, int]]:
+    """
+    Gộp các cặp (size_id, delta) trùng size, bỏ delta = 0, sắp xếp theo size_id.
+    """
+    merged = defaultdict(int)
+    for size_id, delta in deltas:
+        if size_id is not None:
+            merged[int(size_id)] += int(delta)
+    return [(size_id, delta) for size_id, delta in sorted(merged.items()) if delta != 0]
+
+
+def apply_stock_deltas(db, deltas: list[tuple[int, int]]) -> int:
+    """
+    Áp dụng nhiều delta kho trong 1 câu UPDATE ... FROM (VALUES ...).
+    Khóa các dòng theo thứ tự size_id trước để tránh deadlock giữa các worker.
+    Không commit, caller tự quản lý transaction. Trả về số dòng được cập nhật.
+    """
+    if not deltas:
+        return 0
+
+    size_ids = [size_id for size_id, _ in deltas]
+    db.execute(
+        select(ProductSize.size_id)
+        .where(ProductSize.size_id.in_(size_ids))
+        .order_by(ProductSize.size_id)
+        .with_for_update()
+    )
+
+    delta_values = values(
+        column("size_id", Integer),
+        column("delta", Integer),
+        name="stock_delta"
+    ).data(deltas)
+
+    stmt = (
+        update(ProductSize)
+        .where(ProductSize.size_id == delta_values.c.size_id)
+        .values(available_units=ProductSize.available_units + delta_values.c.delta)
+    )
+    return db.execute(stmt).rowcount
 
 
 @shared_task(
     bind=True,
     max_retries=5,
-    default_retry_delay=10,  # Thử lại sau 10s nếu DB lock
-    name="inventory.update_stock_db"
+    default_retry_delay=5,
+    name="inventory.flush_stock_writeback"
 )
-def update_stock_db(self, size_id: int, delta_quantity: int):
+def flush_stock_writeback(self, batch_size: int = None):
     """
-    Đồng bộ kho xuống DB.
-    - delta_quantity < 0: Trừ kho (Đặt hàng)
-    - delta_quantity > 0: Hoàn kho (Hủy đơn)
+    Ghi net delta kho trong bảng stock_delta xuống product_size.
+    - Mỗi batch 1 transaction: DELETE ... RETURNING các dòng cũ nhất (SKIP LOCKED) + UPDATE product_size
+      theo net delta -> dòng đã xoá thì delta đã được áp dụng, worker chết giữa chừng thì cả 2 cùng rollback
+    - Nhiều worker chạy song song không lấy trùng dòng; product_size được khoá theo thứ tự size_id
+    - Lặp tới khi bảng hết delta
     """
+    batch_size = batch_size or settings.STOCK_WRITEBACK_BATCH_SIZE
+    redis_client = redis.Redis.from_url(
+        settings.redis_url_cache,
+        encoding="utf-8",
+        decode_responses=True
+    )
     db = SyncSessionLocal()
+    flushed_sizes = flushed_rows = lag_ms = 0
     try:
-        # Update trực tiếp dùng biểu thức SQL (tránh Race Condition ở level DB)
-        stmt = (
-            update(ProductSize)
-            .where(ProductSize.size_id == size_id)
-            .values(available_units=ProductSize.available_units + delta_quantity)
-        )
-        result = db.execute(stmt)
+        while True:
+            batch = (
+                select(StockDelta.delta_id)
+                .order_by(StockDelta.delta_id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = db.execute(
+                delete(StockDelta)
+                .where(StockDelta.delta_id.in_(batch))
+                .returning(StockDelta.size_id, StockDelta.delta, StockDelta.created_at)
+            ).all()
+            if not rows:
+                break
+
+            deltas = merge_stock_deltas((r.size_id, r.delta) for r in rows)
+            updated = apply_stock_deltas(db, deltas)
+            db.commit()
+
+            if updated < len(deltas):
+                print(f"[WARNING] {len(deltas) - updated} size(s) not found in DB to update stock")
 
-        # Nếu muốn log warning khi update ID không tồn tại
-        if result.rowcount == 0:
-            print(f"[WARNING] Size ID {size_id} not found in DB to update stock")
+            flushed_sizes += len(deltas)
+            flushed_rows += len(rows)
+            lag_ms = max(lag_ms, int((datetime.now() - min(r.created_at for r in rows)).total_seconds() * 1000))
+            if len(rows) < batch_size:
+                break
 
-        db.commit()
-        return f"Size {size_id}: Updated {delta_quantity} units"
+        if not flushed_rows:
+            return "Nothing to flush"
+
+        # Ghi nhận chỉ số độ trễ flush
+        max_lag = int(redis_client.hget(InventoryService.KEY_METRICS, "max_flush_lag_ms") or 0)
+        pipe = redis_client.pipeline()
+        pipe.hset(InventoryService.KEY_METRICS, mapping={
+            "last_flush_at": int(time.time() * 1000),
+            "last_flush_lag_ms": lag_ms,
+            "last_flush_sizes": flushed_sizes,
+            "max_flush_lag_ms": max(max_lag, lag_ms),
+        })
+        pipe.hincrby(InventoryService.KEY_METRICS, "flush_count", 1)
+        pipe.execute()
+
+        return f"Flushed {flushed_rows} delta(s) into {flushed_sizes} size(s), lag {lag_ms}ms"
 
     except Exception as e:
         db.rollback()
-        print(f"[CELERY ERROR] Sync stock failed: {e}")
-        # Retry task
+        print(f"[CELERY ERROR] Stock write-back flush failed: {e}")
         raise self.retry(exc=e)
     finally:
-        db.close()
\ No newline at end of file
+        redis_client.close()
+        db.close()
+
+
+@shared_task(name="inventory.reconcile_stock")
+def reconcile_stock():
+    """
+    Đối soát định kỳ tồn kho Redis với Postgres, nạp key thiếu và sửa lệch.
+    """
+    async def _process():
+        redis_client = aioredis.from_url(
+            settings.redis_url_cache,
+            encoding="utf-8",
+            decode_responses=True
+        )
+        try:
+            async with AsyncSessionLocal() as db:
+                service = InventoryService(redis_client)
+                return await service.reconcile_stock(db)
+        finally:
+            await redis_client.close()
+
+    return asyncio.run(_process())
+
+
+@shared_task(name="inventory.sweep_expired_holds")
+def sweep_expired_holds():
+    """
+    Trả kho cho các phiên checkout bị bỏ dở (hold đã hết hạn).
+    """
+    async def _process():
+        redis_client = aioredis.from_url(
+            settings.redis_url_cache,
+            encoding="utf-8",
+            decode_responses=True
+        )
+        try:
+            return await InventoryService(redis_client).sweep_expired_holds()
+        finally:
+            await redis_client.close()
+
+    return asyncio.run(_process())
+
+
+@shared_task(name="inventory.consume_stock_events")
+def consume_stock_events():
+    """
+    Xử lý sự kiện ngưỡng tồn kho (sắp hết / hết hàng / có hàng lại) theo batch.
+    """
+    async def _process():
+        redis_client = aioredis.from_url(
+            settings.redis_url_cache,
+            encoding="utf-8",
+            decode_responses=True
+        )
+
+        # Chỉ 1 worker xử lý stream tại 1 thời điểm để mức tồn không bị ghi chồng
+        if not await redis_client.set(InventoryService.KEY_STOCK_EVENTS_LOCK, "1", nx=True, ex=60):
+            await redis_client.close()
+            return "Consumer already running"
+
+        try:
+            async with AsyncSessionLocal() as db:
+                return await InventoryService(redis_client).consume_stock_events(db)
+        finally:
+            await redis_client.delete(InventoryService.KEY_STOCK_EVENTS_LOCK)
+            await redis_client.close()
+
+    return asyncio.run(_process())
@@ -0,0 +1,173 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+from ..config.db import SyncSessionLocal, sync_engine
+from ..config.settings import settings
+from ..schemas.common import OrderStatus
+from ..utils.celery_client import celery_app
+
+
+# Bảng partition theo tháng của order_date (migrations/006_order_partitioning.sql).
+# Thứ tự: order trước, order_item sau (FK (order_id, order_date) từ order_item -> order)
+PARTITIONED_TABLES = {
+    "order": 'public."order"',
+    "order_item": "public.order_item",
+}
+PARTITION_NAME = re.compile(r"^order_y(\d{4})m(\d{2})$")
+ARCHIVED_COMMENT = "archived"
+TERMINAL_STATUSES = (OrderStatus.delivered, OrderStatus.cancelled, OrderStatus.returned)
+
+
+def _add_months(month: datetime, n: int) -> datetime:
+    year, index = divmod(month.month - 1 + n, 12)
+    return datetime(month.year + year, index + 1, 1)
+
+
+def _current_month() -> datetime:
+    now = datetime.now()
+    return datetime(now.year, now.month, 1)
+
+
+def _partition_name(table: str, month: datetime) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def _bounds(month: datetime) -> str:
+    return f"FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+
+
+def _create_month_partition(db, month: datetime):
+    """
+    Tạo partition tháng `month` cho order + order_item trong transaction hiện tại.
+    Đơn lỡ rơi vào partition DEFAULT (chưa có partition lúc đặt) được chuyển sang partition mới:
+    - Tạo bảng rời (LIKE bảng cha), chuyển dòng từ DEFAULT sang (item trước để không kích hoạt ON DELETE CASCADE)
+    - ATTACH order rồi order_item (Postgres kiểm tra lại FK khi attach item)
+    """
+    params = {"start": month, "end": _add_months(month, 1)}
+    for table in reversed(PARTITIONED_TABLES):
+        parent = PARTITIONED_TABLES[table]
+        name = _partition_name(table, month)
+        db.execute(text(
+            f"CREATE TABLE public.{name} (LIKE {parent} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMPRESSION)"
+        ))
+        db.execute(text(
+            f"WITH moved AS ("
+            f"  DELETE FROM public.{table}_default WHERE order_date >= :start AND order_date < :end RETURNING *"
+            f") INSERT INTO public.{name} SELECT * FROM moved"
+        ), params)
+
+    for table, parent in PARTITIONED_TABLES.items():
+        name = _partition_name(table, month)
+        db.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION public.{name} FOR VALUES {_bounds(month)}"))
+
+
+@celery_app.task(name="orders.create_partitions")
+def create_order_partitions(months_ahead: int = None):
+    """
+    Tạo trước partition theo tháng cho order / order_item (tháng hiện tại + `months_ahead` tháng tới).
+    - Chạy định kỳ bằng celery beat và lúc khởi động API; tháng đã có partition thì bỏ qua
+    - Mỗi tháng 1 transaction: lỗi ở 1 tháng không ảnh hưởng các tháng đã tạo
+    Chạy tay: celery -A app.utils.celery_client call orders.create_partitions --kwargs '{"months_ahead": 6}'
+    """
+    if months_ahead is None:
+        months_ahead = settings.ORDER_PARTITION_MONTHS_AHEAD
+    db = SyncSessionLocal()
+    created = []
+    month = _current_month()
+    try:
+        for i in range(months_ahead + 1):
+            month = _add_months(_current_month(), i)
+            exists = db.execute(
+                text("SELECT to_regclass(:name) IS NOT NULL"),
+                {"name": f"public.{_partition_name('order', month)}"}
+            ).scalar()
+            if exists:
+                continue
+
+            _create_month_partition(db, month)
+            db.commit()
+            created.append(f"{month:%Y-%m}")
+            print(f"[ORDER PARTITION] Created partitions for {month:%Y-%m}")
+
+        return {"created": created}
+    except Exception as e:
+        db.rollback()
+        print(f"[ORDER PARTITION ERROR] Stopped at {month:%Y-%m}: {e}")
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="orders.archive_partitions")
+def archive_order_partitions(after_months: int = None):
+    """
+    Lưu trữ partition các tháng cũ hơn `after_months` tháng khi mọi đơn trong tháng đã kết thúc
+    (delivered / cancelled / returned):
+    - fillfactor 100 (không còn UPDATE) rồi ghi lại bảng cho gọn: chuyển sang ORDER_ARCHIVE_TABLESPACE
+      (tablespace trên ổ rẻ/nén) nếu có cấu hình, nếu không thì VACUUM FULL tại chỗ
+    - VACUUM FREEZE để autovacuum không phải quét lại, đánh dấu bằng COMMENT 'archived'
+    - Partition vẫn được attach: lịch sử đơn của buyer vẫn đọc được, truy vấn theo tháng hiện tại
+      đã bị partition pruning loại các partition này
+    - Tháng còn đơn chưa kết thúc -> bỏ qua, lần chạy sau thử lại
+    Chạy tay: celery -A app.utils.celery_client call orders.archive_partitions
+    """
+    if after_months is None:
+        after_months = settings.ORDER_ARCHIVE_AFTER_MONTHS
+    cutoff = _add_months(_current_month(), -after_months)
+    archived, skipped = [], []
+
+    # VACUUM / SET TABLESPACE không chạy được trong transaction
+    with sync_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        tablespace = (
+            conn.dialect.identifier_preparer.quote(settings.ORDER_ARCHIVE_TABLESPACE)
+            if settings.ORDER_ARCHIVE_TABLESPACE else None
+        )
+        partitions = conn.execute(text(
+            "SELECT c.relname, obj_description(c.oid, 'pg_class') "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'public.\"order\"'::regclass"
+        )).all()
+
+        for relname, comment in sorted(partitions):
+            match = PARTITION_NAME.match(relname)
+            if not match or comment == ARCHIVED_COMMENT:
+                continue
+            month = datetime(int(match.group(1)), int(match.group(2)), 1)
+            if month >= cutoff:
+                continue
+
+            try:
+                open_orders = conn.execute(
+                    text(f"SELECT count(*) FROM public.{relname} WHERE NOT (order_status::text = ANY(:statuses))"),
+                    {"statuses": [s.value for s in TERMINAL_STATUSES]}
+                ).scalar()
+                if open_orders:
+                    skipped.append(f"{month:%Y-%m}")
+                    print(f"[ORDER ARCHIVE] Skip {month:%Y-%m}: {open_orders} order(s) not finished")
+                    continue
+
+                for table in PARTITIONED_TABLES:
+                    name = _partition_name(table, month)
+                    conn.execute(text(f"ALTER TABLE public.{name} SET (fillfactor = 100)"))
+                    if tablespace:
+                        conn.execute(text(f"ALTER TABLE public.{name} SET TABLESPACE {tablespace}"))
+                        indexes = conn.execute(
+                            text("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = CAST(:name AS regclass)"),
+                            {"name": f"public.{name}"}
+                        ).scalars().all()
+                        for index in indexes:
+                            conn.execute(text(f"ALTER INDEX {index} SET TABLESPACE {tablespace}"))
+                        conn.execute(text(f"VACUUM (FREEZE, ANALYZE) public.{name}"))
+                    else:
+                        conn.execute(text(f"VACUUM (FULL, FREEZE, ANALYZE) public.{name}"))
+                    conn.execute(text(f"COMMENT ON TABLE public.{name} IS '{ARCHIVED_COMMENT}'"))
+
+                archived.append(f"{month:%Y-%m}")
+                print(f"[ORDER ARCHIVE] Archived partitions for {month:%Y-%m}")
+            except Exception as e:
+                print(f"[ORDER ARCHIVE ERROR] {month:%Y-%m}: {e}")
+                raise
+
+    return {"archived": archived, "skipped": skipped}
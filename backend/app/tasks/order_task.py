@@ -0,0 +1,285 @@
+import asyncio
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import redis.asyncio as aioredis
+from sqlalchemy import func, insert, select, tuple_, update
+from ..config.db import SyncSessionLocal
+from ..config.settings import settings
+from ..models import DiscountUsageDelta, Order, OrderItem, OutboxMessage, Product, ProductImage, ProductSize, ProductVariant, Seller
+from ..schemas.common import OrderStatus
+from ..services.common.discount_usage_service import DiscountUsageService
+from ..services.common.inventory_service import InventoryService
+from ..services.common.order_tab_cache import OrderTabCountCache
+from ..services.common.order_transition_service import ORDER_TRANSITIONS, order_transition_service
+from ..services.common.outbox_service import outbox_service
+from ..utils.celery_client import celery_app
+from .inventory import apply_stock_deltas
+from .notification_task import task_send_notification
+from .seller_dashboard_task import task_seller_recalc_dashboard
+
+
+@celery_app.task(name="orders.backfill_order_item_snapshot")
+def backfill_order_item_snapshot(batch_size: int = 1000):
+    """
+    Migration job: điền snapshot (tên sản phẩm, phân loại, size, ảnh, giá gốc, tên shop)
+    cho các order_item tạo trước khi lưu snapshot lúc đặt hàng.
+    - Mỗi batch là 1 câu UPDATE ... FROM (join product/variant/size/seller + ảnh primary), commit từng batch.
+    - Dữ liệu lấy theo catalog hiện tại, là giá trị gần nhất còn lại của các đơn cũ.
+    - Chạy lại nhiều lần vẫn an toàn: chỉ xử lý các item còn product_name IS NULL.
+    Chạy: celery -A app.utils.celery_client call orders.backfill_order_item_snapshot
+    """
+    db = SyncSessionLocal()
+    last_id = 0
+    updated = 0
+    try:
+        while True:
+            item_ids = db.execute(
+                select(OrderItem.order_item_id)
+                .where(OrderItem.product_name.is_(None), OrderItem.order_item_id > last_id)
+                .order_by(OrderItem.order_item_id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not item_ids:
+                break
+
+            # Ảnh primary (hoặc ảnh đầu tiên) của các sản phẩm trong batch
+            image = (
+                select(ProductImage.product_id, ProductImage.image_url)
+                .where(ProductImage.product_id.in_(
+                    select(OrderItem.product_id).where(OrderItem.order_item_id.in_(item_ids))
+                ))
+                .order_by(ProductImage.product_id, ProductImage.is_primary.desc(), ProductImage.product_image_id)
+                .distinct(ProductImage.product_id)
+                .subquery()
+            )
+            snapshot = (
+                select(
+                    OrderItem.order_item_id,
+                    Product.name.label("product_name"),
+                    ProductVariant.variant_name,
+                    ProductSize.size_name,
+                    image.c.image_url,
+                    (Product.base_price + func.coalesce(ProductVariant.price_adjustment, 0)).label("list_price"),
+                    Seller.shop_name,
+                )
+                .join(Product, Product.product_id == OrderItem.product_id)
+                .outerjoin(ProductVariant, ProductVariant.variant_id == OrderItem.variant_id)
+                .outerjoin(ProductSize, ProductSize.size_id == OrderItem.size_id)
+                .outerjoin(Seller, Seller.seller_id == Product.seller_id)
+                .outerjoin(image, image.c.product_id == OrderItem.product_id)
+                .where(OrderItem.order_item_id.in_(item_ids))
+                .subquery()
+            )
+            result = db.execute(
+                update(OrderItem)
+                .where(OrderItem.order_item_id == snapshot.c.order_item_id)
+                .values(
+                    product_name=snapshot.c.product_name,
+                    variant_name=snapshot.c.variant_name,
+                    size_name=snapshot.c.size_name,
+                    image_url=snapshot.c.image_url,
+                    list_price=snapshot.c.list_price,
+                    shop_name=snapshot.c.shop_name,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            updated += result.rowcount
+            last_id = item_ids[-1]
+            print(f"[ORDER BACKFILL] item snapshot filled up to order_item #{last_id} ({updated} items)")
+
+        return {"updated": updated}
+    except Exception as e:
+        db.rollback()
+        print(f"[ORDER BACKFILL ERROR] Stopped after order_item #{last_id}: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def _expired_notifications(role: str, user_orders: dict[int, list[int]]) -> list[dict]:
+    """1 thông báo cho mỗi buyer / seller, gộp mọi đơn bị huỷ của người đó trong batch"""
+    messages = []
+    for user_id, order_ids in user_orders.items():
+        if len(order_ids) == 1:
+            text = f"Đơn hàng #{order_ids[0]} đã tự động bị hủy do quá hạn xác nhận/thanh toán."
+        else:
+            text = f"{len(order_ids)} đơn hàng đã tự động bị hủy do quá hạn xác nhận/thanh toán."
+        messages.append(outbox_service.task(
+            task_send_notification,
+            user_id=user_id,
+            role=role,
+            title="Đơn hàng đã bị hủy",
+            message=(text + " Kho đã được hoàn trả.") if role == "seller" else text,
+            event_type="ORDER_EXPIRED",
+            data={"order_ids": order_ids}
+        ))
+    return messages
+
+
+async def _release_reservations(release_id: str, items: list, discount_ids: list[int]):
+    """Hoàn kho + trả lượt mã giảm giá trên Redis, mỗi release_id chỉ áp dụng 1 lần"""
+    redis_client = aioredis.from_url(
+        settings.redis_url_cache,
+        encoding="utf-8",
+        decode_responses=True
+    )
+    try:
+        await InventoryService(redis_client).release_items(items, release_id=release_id)
+        await DiscountUsageService(redis_client).release_once(release_id, discount_ids)
+    finally:
+        await redis_client.close()
+
+
+@celery_app.task(
+    bind=True,
+    max_retries=None,
+    default_retry_delay=30,
+    name="orders.release_reservations"
+)
+def task_release_reservations(self, release_id: str, items: list, discount_ids: list[int] = None):
+    """
+    Hoàn kho / trả lượt mã giảm giá trên Redis cho đơn đã huỷ (DB đã commit việc huỷ, delta kho / lượt dùng).
+    - Ghi vào outbox cùng transaction huỷ đơn: Redis lỗi hoặc process chết sau commit thì vẫn được gửi
+    - Redis lỗi -> retry tới khi thành công, không bỏ qua (job đối soát không tự tăng tồn kho Redis)
+    - Mỗi release_id chỉ được cộng 1 lần (key đánh dấu set trong cùng Lua script): đường nhanh ngay sau commit,
+      outbox gửi trùng hay retry gọi lại đều an toàn
+    """
+    try:
+        asyncio.run(_release_reservations(release_id, items, discount_ids or []))
+        return f"Released {release_id}"
+    except Exception as e:
+        print(f"[CELERY ERROR] Release {release_id} failed, retrying: {e}")
+        raise self.retry(exc=e)
+
+
+async def _release_expired_redis(
+    release_id: str, restored: list[tuple[int, int]], discount_ids: list[int], buyer_ids: set[int]
+):
+    """
+    Sau commit: hoàn kho + trả lượt mã trên Redis ngay (không chờ outbox relay),
+    xoá cache số đơn theo tab của các buyer
+    """
+    await _release_reservations(release_id, restored, discount_ids)
+    redis_client = aioredis.from_url(
+        settings.redis_url_cache,
+        encoding="utf-8",
+        decode_responses=True
+    )
+    try:
+        await OrderTabCountCache(redis_client).invalidate(*buyer_ids)
+    finally:
+        await redis_client.close()
+
+
+@celery_app.task(name="orders.expire_pending")
+def expire_pending_orders(batch_size: int = None, max_batches: int = 50):
+    """
+    Tự huỷ các đơn pending quá ORDER_PENDING_EXPIRE_HOURS giờ (shop chưa xác nhận, chuyển khoản chưa trả tiền)
+    để trả lại kho đang bị giữ.
+    - Mỗi batch 1 transaction: khoá đơn bằng FOR UPDATE SKIP LOCKED (đơn buyer/seller đang thao tác thì bỏ qua,
+      lần chạy sau xét lại) và huỷ bằng 1 câu UPDATE ... RETURNING
+    - Hoàn kho DB: gộp số lượng theo size, 1 câu UPDATE ... FROM (VALUES) trong cùng transaction;
+      Redis hoàn sau commit bằng 1 Lua script, kèm message orders.release_reservations trong outbox để thử lại
+      nếu Redis lỗi (mỗi batch 1 release_id, chỉ được cộng 1 lần)
+    - Trả lượt mã giảm giá của checkout đã bị huỷ hết đơn: delta -1 vào discount_usage_delta cùng transaction,
+      bộ đếm Redis trả sau commit cùng lượt hoàn kho
+    - Outbox: mỗi buyer / seller 1 thông báo cho cả batch, tính lại dashboard của seller
+      (dashboard admin chỉ cộng khi đơn hoàn tất -> không có gì để trừ)
+    Chạy tay: celery -A app.utils.celery_client call orders.expire_pending
+    """
+    batch_size = batch_size or settings.ORDER_EXPIRE_BATCH_SIZE
+    cutoff = datetime.now() - timedelta(hours=settings.ORDER_PENDING_EXPIRE_HOURS)
+    rule = ORDER_TRANSITIONS["buyer_cancel"]
+    db = SyncSessionLocal()
+    expired = 0
+    try:
+        for _ in range(max_batches):
+            locked = (
+                select(Order.order_id, Order.order_date)
+                .where(Order.order_status == OrderStatus.pending, Order.order_date < cutoff)
+                .order_by(Order.order_date)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .cte("expired")
+            )
+            orders = db.execute(
+                update(Order)
+                .where(Order.order_id == locked.c.order_id, Order.order_date == locked.c.order_date)
+                .values(
+                    order_status=OrderStatus.cancelled.value,
+                    payment_status=rule["values"]["payment_status"],
+                    notes=func.concat(func.coalesce(Order.notes, ""), " | [Hệ thống]: Quá hạn xác nhận/thanh toán")
+                )
+                .returning(
+                    Order.order_id, Order.order_date, Order.buyer_id, Order.seller_id,
+                    Order.checkout_id, Order.discount_id
+                )
+                .execution_options(synchronize_session=False)
+            ).all()
+            if not orders:
+                break
+
+            # Hoàn kho: tổng số lượng theo size của mọi item trong batch
+            restored = [
+                (size_id, int(quantity))
+                for size_id, quantity in db.execute(
+                    select(OrderItem.size_id, func.sum(OrderItem.quantity))
+                    .where(
+                        tuple_(OrderItem.order_id, OrderItem.order_date).in_(
+                            [(o.order_id, o.order_date) for o in orders]
+                        ),
+                        OrderItem.size_id.is_not(None)
+                    )
+                    .group_by(OrderItem.size_id)
+                    .order_by(OrderItem.size_id)
+                )
+            ]
+            apply_stock_deltas(db, restored)
+            discount_ids = order_transition_service.released_discounts_sync(db, orders)
+            if discount_ids:
+                db.execute(
+                    insert(DiscountUsageDelta),
+                    [{"discount_id": discount_id, "delta": -1} for discount_id in discount_ids]
+                )
+
+            buyer_orders, seller_orders = defaultdict(list), defaultdict(list)
+            for order in orders:
+                buyer_orders[order.buyer_id].append(order.order_id)
+                if order.seller_id:
+                    seller_orders[order.seller_id].append(order.order_id)
+
+            release_id = f"expire:{uuid.uuid4().hex}"
+            messages = (
+                _expired_notifications("buyer", buyer_orders)
+                + _expired_notifications("seller", seller_orders)
+                + [outbox_service.task(task_seller_recalc_dashboard, seller_id) for seller_id in seller_orders]
+                + [outbox_service.task(task_release_reservations, release_id, restored, discount_ids)]
+            )
+            db.execute(insert(OutboxMessage), messages)
+            db.commit()
+
+            try:
+                asyncio.run(_release_expired_redis(release_id, restored, discount_ids, set(buyer_orders)))
+            except Exception as e:
+                # Message orders.release_reservations trong outbox (cùng transaction) sẽ hoàn lại trên Redis
+                print(f"[ORDER EXPIRE ERROR] Redis stock / discount release failed, left to outbox retry: {e}")
+
+            expired += len(orders)
+            print(
+                f"[ORDER EXPIRE] Cancelled {len(orders)} pending order(s), restored {len(restored)} size(s), "
+                f"released {len(discount_ids)} discount use(s)"
+            )
+            if len(orders) < batch_size:
+                break
+
+        return {"expired": expired}
+    except Exception as e:
+        db.rollback()
+        print(f"[ORDER EXPIRE ERROR] Stopped after {expired} order(s): {e}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+from ..config.db import SyncSessionLocal
+from ..config.settings import settings
+from ..models import OutboxMessage
+from ..utils.celery_client import celery_app
+
+
+@celery_app.task(name="outbox.relay")
+def relay_outbox(batch_size: int = None):
+    """
+    Đẩy các message trong outbox_message lên broker theo batch.
+    - FOR UPDATE SKIP LOCKED: nhiều worker chạy song song không gửi trùng 1 batch
+    - Dùng chung 1 producer/connection cho cả batch thay vì mỗi task 1 round trip riêng
+    - Gửi lỗi -> tăng attempts, để lần chạy sau thử lại (bỏ qua sau OUTBOX_MAX_ATTEMPTS lần)
+    - Dọn các message đã gửi quá OUTBOX_RETENTION_HOURS
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    db = SyncSessionLocal()
+    published, failed = [], {}
+    try:
+        messages = db.execute(
+            select(OutboxMessage)
+            .where(
+                OutboxMessage.published_at.is_(None),
+                OutboxMessage.attempts < settings.OUTBOX_MAX_ATTEMPTS
+            )
+            .order_by(OutboxMessage.outbox_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        if messages:
+            with celery_app.producer_or_acquire() as producer:
+                for message in messages:
+                    try:
+                        celery_app.send_task(
+                            message.task_name,
+                            args=message.args,
+                            kwargs=message.kwargs,
+                            producer=producer
+                        )
+                        published.append(message.outbox_id)
+                    except Exception as e:
+                        failed[message.outbox_id] = str(e)
+
+            now = datetime.now()
+            if published:
+                db.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.outbox_id.in_(published))
+                    .values(published_at=now, attempts=OutboxMessage.attempts + 1)
+                )
+            for outbox_id, error in failed.items():
+                db.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.outbox_id == outbox_id)
+                    .values(attempts=OutboxMessage.attempts + 1, last_error=error)
+                )
+
+        db.execute(
+            delete(OutboxMessage)
+            .where(OutboxMessage.published_at < datetime.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS))
+        )
+        db.commit()
+
+        if failed:
+            print(f"[OUTBOX] {len(failed)} message(s) failed to publish, will retry")
+        return {"published": len(published), "failed": len(failed)}
+    except Exception as e:
+        db.rollback()
+        print(f"[OUTBOX ERROR] Relay failed: {e}")
+        raise
+    finally:
+        db.close()
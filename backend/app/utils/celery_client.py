@@ -1,7 +1,22 @@
-from celery import Celery
+from celery import Celery, Task
 from ..config.celery import celery_settings
+from .task_dispatcher import task_dispatcher
 
-celery_app = Celery("HUS_Ecommerce_Worker")
+
+class DispatchedTask(Task):
+    """
+    `.delay()` trong API server không publish trực tiếp (I/O chặn event loop)
+    mà đẩy vào task_dispatcher để background task publish theo batch.
+    Ngoài API server (worker, beat, script) dispatcher không chạy -> publish như bình thường.
+    """
+
+    def delay(self, *args, **kwargs):
+        if task_dispatcher.enqueue(self.name, args, kwargs):
+            return None
+        return super().delay(*args, **kwargs)
+
+
+celery_app = Celery("HUS_Ecommerce_Worker", task_cls=DispatchedTask)
 celery_app.config_from_object(celery_settings)
 
 celery_app.conf.imports = [
@@ -10,4 +25,8 @@ celery_app.conf.imports = [
     'app.tasks.notification_task',
     'app.tasks.admin_dashboard_task',
     'app.tasks.seller_dashboard_task',
-]
\ No newline at end of file
+    'app.tasks.order_task',
+    'app.tasks.outbox_task',
+    'app.tasks.order_partition_task',
+    'app.tasks.discount_task',
+]
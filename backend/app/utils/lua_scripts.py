@@ -1,13 +1,393 @@
+# Các script thay đổi tồn kho ghi sự kiện ngưỡng vào Redis Stream.
+# Quy ước: KEYS cuối = stream sự kiện, 2 ARGV cuối = ngưỡng sắp hết hàng, MAXLEN của stream.
+STOCK_EVENT_LUA = """
+    local function emit_stock_event(key, before, after)
+        local threshold = tonumber(ARGV[#ARGV - 1])
+        local event = nil
+        if after < before then
+            if after <= 0 then
+                event = 'sold_out'
+            elseif after <= threshold then
+                event = 'low_stock'
+            end
+        elseif after > before and before <= threshold then
+            event = 'restocked'
+        end
+        if event then
+            redis.call('xadd', KEYS[#KEYS], 'MAXLEN', '~', ARGV[#ARGV], '*',
+                'key', key, 'event', event, 'stock', after)
+        end
+    end
+"""
+
+
 def get_decr_stock_script() -> str:
-    return """
+    return STOCK_EVENT_LUA + """
     local current_stock = tonumber(redis.call('get', KEYS[1]))
     if current_stock == nil then
         return -1
     end
     if current_stock >= tonumber(ARGV[1]) then
-        redis.call('decrby', KEYS[1], ARGV[1])
-        return tonumber(redis.call('get', KEYS[1]))
+        local after = redis.call('decrby', KEYS[1], ARGV[1])
+        emit_stock_event(KEYS[1], current_stock, after)
+        return after
     else
         return -2
     end
-    """
\ No newline at end of file
+    """
+
+
+def get_reserve_multi_stock_script() -> str:
+    """
+    Trừ kho nhiều size cùng lúc (all-or-nothing).
+    KEYS[i] = stock_size:{size_id}, ARGV[i] = số lượng cần trừ, KEYS cuối = stream sự kiện.
+    - Thành công: trả về {1}
+    - Thất bại: trả về {0, i1, stock1, i2, stock2, ...}
+      (i = vị trí key bị thiếu hàng, stock = tồn kho hiện tại, -1 nếu key chưa có)
+    """
+    return STOCK_EVENT_LUA + """
+    local n = #KEYS - 1
+    local shortfalls = {}
+    for i = 1, n do
+        local current_stock = tonumber(redis.call('get', KEYS[i]))
+        if current_stock == nil then
+            table.insert(shortfalls, i)
+            table.insert(shortfalls, -1)
+        elseif current_stock < tonumber(ARGV[i]) then
+            table.insert(shortfalls, i)
+            table.insert(shortfalls, current_stock)
+        end
+    end
+
+    if #shortfalls > 0 then
+        table.insert(shortfalls, 1, 0)
+        return shortfalls
+    end
+
+    for i = 1, n do
+        local after = redis.call('decrby', KEYS[i], ARGV[i])
+        emit_stock_event(KEYS[i], after + tonumber(ARGV[i]), after)
+    end
+    return {1}
+    """
+
+
+def get_restore_multi_stock_script() -> str:
+    """
+    Hoàn kho nhiều size cùng lúc.
+    Bỏ qua key chưa tồn tại để không tạo ra số tồn kho sai lệch.
+    Trả về số key đã được hoàn.
+    """
+    return STOCK_EVENT_LUA + """
+    local restored = 0
+    for i = 1, #KEYS - 1 do
+        if redis.call('exists', KEYS[i]) == 1 then
+            local after = redis.call('incrby', KEYS[i], ARGV[i])
+            emit_stock_event(KEYS[i], after - tonumber(ARGV[i]), after)
+            restored = restored + 1
+        end
+    end
+    return restored
+    """
+
+
+def get_restore_multi_stock_once_script() -> str:
+    """
+    Hoàn kho nhiều size đúng 1 lần cho 1 lượt hoàn (release_id) của đơn đã huỷ:
+    task retry / outbox gửi trùng gọi lại không cộng thêm.
+    KEYS[1] = key đánh dấu release_id, KEYS[2..] = stock keys, KEYS cuối = stream
+    ARGV[1] = TTL key đánh dấu (giây), ARGV[2..] = số lượng tương ứng KEYS[2..]
+    Trả về -1 nếu release_id đã được hoàn, ngược lại số key đã hoàn (bỏ qua key chưa tồn tại).
+    """
+    return STOCK_EVENT_LUA + """
+    if not redis.call('set', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+        return -1
+    end
+    local restored = 0
+    for i = 2, #KEYS - 1 do
+        if redis.call('exists', KEYS[i]) == 1 then
+            local after = redis.call('incrby', KEYS[i], ARGV[i])
+            emit_stock_event(KEYS[i], after - tonumber(ARGV[i]), after)
+            restored = restored + 1
+        end
+    end
+    return restored
+    """
+
+
+def get_create_hold_script() -> str:
+    """
+    Giữ kho tạm cho 1 phiên checkout (all-or-nothing).
+    KEYS[1] = zset holds, KEYS[2] = hash hold, KEYS[3] = hash held, KEYS[4..] = stock keys, KEYS cuối = stream
+    ARGV[1] = hold_id, ARGV[2] = expire_at, ARGV[3..] = size_id, quantity, size_id, quantity, ...
+    n cặp đầu tương ứng KEYS[4..] (kiểm tra + trừ kho), các cặp còn lại đã được trừ
+    trước (size chia shard) nên chỉ ghi nhận vào hold.
+    Trả về giống reserve multi: {1} hoặc {0, i1, stock1, ...}
+    """
+    return STOCK_EVENT_LUA + """
+    local n = #KEYS - 4
+    local shortfalls = {}
+    for i = 1, n do
+        local current_stock = tonumber(redis.call('get', KEYS[i + 3]))
+        local quantity = tonumber(ARGV[2 + i * 2])
+        if current_stock == nil then
+            table.insert(shortfalls, i)
+            table.insert(shortfalls, -1)
+        elseif current_stock < quantity then
+            table.insert(shortfalls, i)
+            table.insert(shortfalls, current_stock)
+        end
+    end
+
+    if #shortfalls > 0 then
+        table.insert(shortfalls, 1, 0)
+        return shortfalls
+    end
+
+    for i = 1, n do
+        local quantity = tonumber(ARGV[2 + i * 2])
+        local after = redis.call('decrby', KEYS[i + 3], quantity)
+        emit_stock_event(KEYS[i + 3], after + quantity, after)
+    end
+    for i = 1, (#ARGV - 4) / 2 do
+        local size_id = ARGV[1 + i * 2]
+        local quantity = ARGV[2 + i * 2]
+        redis.call('hincrby', KEYS[3], size_id, quantity)
+        redis.call('hset', KEYS[2], size_id, quantity)
+    end
+    redis.call('zadd', KEYS[1], ARGV[2], ARGV[1])
+    return {1}
+    """
+
+
+def get_release_hold_script() -> str:
+    """
+    Trả kho của 1 hold (hết hạn hoặc buyer bỏ checkout).
+    KEYS[1] = zset holds, KEYS[2] = hash hold, KEYS[3] = hash held, KEYS[4..] = stock keys, KEYS cuối = stream
+    ARGV[1] = hold_id, ARGV[2..] = size_id, quantity, ...
+    ZREM dùng để "giành" hold: chỉ 1 bên (sweeper / place_order) xử lý được.
+    """
+    return STOCK_EVENT_LUA + """
+    if redis.call('zrem', KEYS[1], ARGV[1]) == 0 then
+        return 0
+    end
+    for i = 1, #KEYS - 4 do
+        local size_id = ARGV[i * 2]
+        local quantity = tonumber(ARGV[i * 2 + 1])
+        if redis.call('exists', KEYS[i + 3]) == 1 then
+            local after = redis.call('incrby', KEYS[i + 3], quantity)
+            emit_stock_event(KEYS[i + 3], after - quantity, after)
+        end
+        redis.call('hincrby', KEYS[3], size_id, -quantity)
+    end
+    redis.call('del', KEYS[2])
+    return 1
+    """
+
+
+def get_commit_hold_script() -> str:
+    """
+    Chuyển hold thành trừ kho chính thức (kho đã bị trừ lúc tạo hold, chỉ xóa hold).
+    KEYS[1] = zset holds, KEYS[2] = hash hold, KEYS[3] = hash held
+    ARGV[1] = hold_id, ARGV[2] = now
+    Trả về {size_id, quantity, ...}, rỗng nếu hold không tồn tại hoặc đã hết hạn.
+    """
+    return """
+    local expire_at = redis.call('zscore', KEYS[1], ARGV[1])
+    if not expire_at or tonumber(expire_at) < tonumber(ARGV[2]) then
+        return {}
+    end
+    redis.call('zrem', KEYS[1], ARGV[1])
+    local items = redis.call('hgetall', KEYS[2])
+    for i = 1, #items, 2 do
+        redis.call('hincrby', KEYS[3], items[i], -tonumber(items[i + 1]))
+    end
+    redis.call('del', KEYS[2])
+    return items
+    """
+
+
+def get_take_shard_stock_script() -> str:
+    """
+    Trừ kho trên 1 shard của size đang chia shard.
+    KEYS[1] = shard key, KEYS[2] = stream sự kiện
+    ARGV[1] = số lượng cần trừ, ARGV[2] = 1 nếu cho phép lấy một phần.
+    Trả về số lượng đã trừ (0 nếu không đủ), -1 nếu shard chưa có key.
+    """
+    return STOCK_EVENT_LUA + """
+    local current_stock = tonumber(redis.call('get', KEYS[1]))
+    if current_stock == nil then
+        return -1
+    end
+    local quantity = tonumber(ARGV[1])
+    if current_stock < quantity then
+        if ARGV[2] ~= '1' or current_stock <= 0 then
+            return 0
+        end
+        quantity = current_stock
+    end
+    local after = redis.call('decrby', KEYS[1], quantity)
+    emit_stock_event(KEYS[1], current_stock, after)
+    return quantity
+    """
+
+
+def get_enable_shards_script() -> str:
+    """
+    Chia tồn kho của 1 size ra N shard.
+    KEYS[1] = stock key gốc, KEYS[2] = hash cấu hình shard, KEYS[3..] = shard keys
+    ARGV[1] = size_id
+    Trả về tổng tồn kho, -1 nếu key gốc chưa có.
+    """
+    return """
+    local total = tonumber(redis.call('get', KEYS[1]))
+    if total == nil then
+        return -1
+    end
+    local n = #KEYS - 2
+    local base = math.floor(total / n)
+    local remainder = total - base * n
+    for i = 1, n do
+        local value = base
+        if i <= remainder then
+            value = value + 1
+        end
+        redis.call('set', KEYS[i + 2], value)
+    end
+    redis.call('del', KEYS[1])
+    redis.call('hset', KEYS[2], ARGV[1], n)
+    return total
+    """
+
+
+def get_disable_shards_script() -> str:
+    """
+    Gộp các shard của 1 size về lại key gốc.
+    KEYS[1] = stock key gốc, KEYS[2] = hash cấu hình shard, KEYS[3..] = shard keys
+    ARGV[1] = size_id
+    Trả về tổng tồn kho sau khi gộp.
+    """
+    return """
+    local total = 0
+    for i = 3, #KEYS do
+        total = total + (tonumber(redis.call('get', KEYS[i])) or 0)
+        redis.call('del', KEYS[i])
+    end
+    redis.call('incrby', KEYS[1], total)
+    redis.call('hdel', KEYS[2], ARGV[1])
+    return tonumber(redis.call('get', KEYS[1]))
+    """
+
+
+
+# Nạp bộ đếm lượt dùng còn thiếu. Quy ước: KEYS[1] = hash lượt dùng
+SEED_DISCOUNT_USAGE_LUA = """
+    local function seed_usage(discount_id, used_count)
+        if redis.call('hexists', KEYS[1], discount_id) == 1 then
+            return 0
+        end
+        redis.call('hset', KEYS[1], discount_id, used_count)
+        return 1
+    end
+"""
+
+
+def get_seed_discount_usage_script() -> str:
+    """
+    Nạp bộ đếm lượt dùng cho các mã chưa có (không ghi đè lượt đang được cộng).
+    KEYS[1] = hash lượt dùng
+    ARGV = discount_id1, used1, discount_id2, used2, ... (used = used_count + lượt chờ ghi trong discount_usage_delta)
+    Trả về số mã được nạp.
+    """
+    return SEED_DISCOUNT_USAGE_LUA + """
+    local seeded = 0
+    for i = 1, #ARGV, 2 do
+        seeded = seeded + seed_usage(ARGV[i], ARGV[i + 1])
+    end
+    return seeded
+    """
+
+
+def get_redeem_discount_script() -> str:
+    """
+    Dùng 1 lượt mã giảm giá (kiểm tra usage_limit + cộng lượt trong 1 bước, không khoá dòng discount).
+    KEYS[1] = hash lượt dùng
+    ARGV[1] = discount_id, ARGV[2] = usage_limit (-1: không giới hạn),
+    ARGV[3] = lượt đã dùng theo DB (used_count + delta chờ ghi, nạp nếu chưa có)
+    Trả về lượt dùng sau khi cộng, -1 nếu đã hết lượt.
+    """
+    return SEED_DISCOUNT_USAGE_LUA + """
+    seed_usage(ARGV[1], ARGV[3])
+    local used = tonumber(redis.call('hget', KEYS[1], ARGV[1]))
+    local limit = tonumber(ARGV[2])
+    if limit >= 0 and used >= limit then
+        return -1
+    end
+    return redis.call('hincrby', KEYS[1], ARGV[1], 1)
+    """
+
+
+def get_release_discount_script() -> str:
+    """
+    Trả lại 1 lượt đã dùng trên bộ đếm (bù trừ cho get_redeem_discount_script).
+    KEYS[1] = hash lượt dùng, ARGV[1] = discount_id
+    """
+    return """
+    if redis.call('hexists', KEYS[1], ARGV[1]) == 1 then
+        redis.call('hincrby', KEYS[1], ARGV[1], -1)
+    end
+    return 1
+    """
+
+
+def get_release_discount_once_script() -> str:
+    """
+    Trả lượt mã giảm giá đúng 1 lần cho 1 lượt hoàn (release_id) của đơn đã huỷ.
+    KEYS[1] = key đánh dấu release_id, KEYS[2] = hash lượt dùng
+    ARGV[1] = TTL key đánh dấu (giây), ARGV[2..] = discount_id (mỗi phần tử trả 1 lượt)
+    Trả về -1 nếu release_id đã được trả, ngược lại 1.
+    """
+    return """
+    if not redis.call('set', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+        return -1
+    end
+    for i = 2, #ARGV do
+        if redis.call('hexists', KEYS[2], ARGV[i]) == 1 then
+            redis.call('hincrby', KEYS[2], ARGV[i], -1)
+        end
+    end
+    return 1
+    """
+
+
+def get_refresh_idempotency_lock_script() -> str:
+    """
+    Gia hạn bản ghi "processing" của Idempotency-Key khi handler vẫn đang chạy.
+    KEYS[1] = key, ARGV[1] = bản ghi processing (có token của request đang giữ), ARGV[2] = TTL (giây)
+    Trả về 0 nếu key đã bị request khác giữ / đã có kết quả.
+    """
+    return """
+    if redis.call('get', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    return redis.call('expire', KEYS[1], ARGV[2])
+    """
+
+
+def get_finish_idempotency_script() -> str:
+    """
+    Kết thúc 1 Idempotency-Key: chỉ ghi khi key vẫn đang giữ đúng bản ghi "processing" của request này.
+    KEYS[1] = key, ARGV[1] = bản ghi processing, ARGV[2] = kết quả ('' -> xoá key), ARGV[3] = TTL của kết quả
+    Trả về 0 nếu key đã đổi chủ (không ghi đè).
+    """
+    return """
+    if redis.call('get', KEYS[1]) ~= ARGV[1] then
+        return 0
+    end
+    if ARGV[2] == '' then
+        redis.call('del', KEYS[1])
+    else
+        redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    end
+    return 1
+    """
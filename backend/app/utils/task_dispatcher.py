@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+
+class TaskDispatcher:
+    """
+    Gửi task Celery từ event loop của API mà không chặn loop.
+
+    - `.delay()` / `send_task()` trong API chỉ đẩy message vào asyncio.Queue trong process (O(1), không I/O)
+    - 1 background task gom message theo batch, publish trong thread pool bằng 1 producer dùng chung
+    - Publish lỗi -> thử lại với backoff, quá số lần thì bỏ và ghi log
+    - Chưa start (Celery worker, script) hoặc không có event loop -> caller tự publish trực tiếp như cũ
+    """
+    BATCH_SIZE = 100
+    MAX_ATTEMPTS = 5
+    RETRY_BASE_DELAY = 0.2
+    SHUTDOWN_TIMEOUT = 5.0
+
+    def __init__(self):
+        self._app = None
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._worker: asyncio.Task | None = None
+        self._metrics = {
+            "enqueued": 0,
+            "published": 0,
+            "retried": 0,
+            "dropped": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "last_publish_ms": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    # ===================== VÒNG ĐỜI =====================
+    def start(self, app):
+        """Gọi trong lifespan của FastAPI, sau khi event loop đã chạy"""
+        if self.is_running():
+            return
+        self._app = app
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Publish nốt các message còn trong hàng đợi (có timeout) rồi dừng background task"""
+        if not self.is_running():
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            print(f"[TASK DISPATCHER] Shutdown with {self._queue.qsize()} message(s) not published")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    # ===================== ENQUEUE =====================
+    def enqueue(self, name: str, args=None, kwargs=None, options=None) -> bool:
+        """
+        Đưa 1 task vào hàng đợi. Trả về False nếu dispatcher không chạy (caller tự publish).
+        Gọi được cả từ thread khác (endpoint sync chạy trong threadpool).
+        """
+        if not self.is_running():
+            return False
+
+        message = (name, tuple(args or ()), dict(kwargs or {}), dict(options or {}), 1)
+        if self._in_loop_thread():
+            self._put(message)
+        else:
+            self._loop.call_soon_threadsafe(self._put, message)
+        return True
+
+    def send_task(self, name: str, args=None, kwargs=None, **options):
+        """Giống celery_app.send_task nhưng không chặn event loop"""
+        if not self.enqueue(name, args, kwargs, options):
+            return self._app_or_default().send_task(name, args=args, kwargs=kwargs, **options)
+        return None
+
+    def _in_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _put(self, message):
+        self._queue.put_nowait(message)
+        self._metrics["enqueued"] += 1
+        self._metrics["max_queue_depth"] = max(self._metrics["max_queue_depth"], self._queue.qsize())
+
+    def _app_or_default(self):
+        if self._app is None:
+            from .celery_client import celery_app
+            self._app = celery_app
+        return self._app
+
+    # ===================== PUBLISH =====================
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._publish_with_retry(batch)
+            except Exception as e:
+                self._metrics["dropped"] += len(batch)
+                print(f"[TASK DISPATCHER ERROR] Dropped {len(batch)} message(s): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _publish_with_retry(self, batch: list):
+        pending = batch
+        while pending:
+            started = time.perf_counter()
+            failed = await asyncio.to_thread(self._publish_batch, pending)
+            self._metrics["batches"] += 1
+            self._metrics["last_batch_size"] = len(pending)
+            self._metrics["last_publish_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self._metrics["published"] += len(pending) - len(failed)
+
+            retry = []
+            for (name, args, kwargs, options, attempt), error in failed:
+                if attempt >= self.MAX_ATTEMPTS:
+                    self._metrics["dropped"] += 1
+                    print(f"[TASK DISPATCHER ERROR] Give up {name} after {attempt} attempts: {error}")
+                else:
+                    retry.append((name, args, kwargs, options, attempt + 1))
+
+            if retry:
+                self._metrics["retried"] += len(retry)
+                await asyncio.sleep(self.RETRY_BASE_DELAY * 2 ** (retry[0][4] - 2))
+            pending = retry
+
+    def _publish_batch(self, batch: list) -> list:
+        """Chạy trong thread pool: publish cả batch qua 1 producer/connection"""
+        app = self._app_or_default()
+        failed = []
+        sent = 0
+        try:
+            with app.producer_or_acquire() as producer:
+                for message in batch:
+                    name, args, kwargs, options, _ = message
+                    try:
+                        app.send_task(name, args=args, kwargs=kwargs, producer=producer, **options)
+                    except Exception as e:
+                        failed.append((message, str(e)))
+                    sent += 1
+        except Exception as e:
+            # Không lấy được connection tới broker -> cả phần còn lại của batch coi như lỗi
+            failed.extend((message, str(e)) for message in batch[sent:])
+        return failed
+
+    # ===================== METRICS =====================
+    def get_metrics(self) -> dict:
+        return {
+            "running": self.is_running(),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            **self._metrics,
+        }
+
+
+task_dispatcher = TaskDispatcher()
@@ -0,0 +1,71 @@
+"""
+Tiện ích dùng chung cho các script đo hiệu năng trong thư mục benchmarks/.
+Các script cần Postgres + Redis theo backend/.env (docker compose up -d db redis), chạy từ thư mục backend:
+    python -m benchmarks.<tên script> --help
+"""
+import asyncio
+import time
+
+import redis.asyncio as aioredis
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.config.settings import settings
+
+
+def make_session_factory(pool_size: int):
+    """
+    Engine riêng cho benchmark: có pool, không echo SQL như engine của app.
+    Số request đồng thời có thể lớn hơn pool -> chờ kết nối lâu hơn pool_timeout mặc định (30s) vẫn không lỗi.
+    """
+    engine = create_async_engine(settings.DATABASE_URL, pool_size=pool_size, max_overflow=0, pool_timeout=600)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+def make_redis() -> aioredis.Redis:
+    return aioredis.from_url(settings.redis_url_cache, encoding="utf-8", decode_responses=True)
+
+
+async def run_concurrent(worker, total: int, concurrency: int) -> dict:
+    """Gọi `await worker(i)` với i = 0..total-1, tối đa `concurrency` lời gọi cùng lúc"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await worker(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+    return {
+        "ops": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "ops_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def print_results(title: str, results: dict[str, dict]):
+    """In bảng kết quả: mỗi dòng 1 phương án"""
+    columns = ["ops", "elapsed_s", "ops_per_s", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    extra = sorted({k for r in results.values() for k in r} - set(columns))
+    header = ["variant"] + columns + extra
+    rows = [[name] + [str(r.get(c, "")) for c in columns + extra] for name, r in results.items()]
+    widths = [max(len(h), *(len(row[i]) for row in rows)) for i, h in enumerate(header)]
+
+    print(f"\n{title}")
+    print("  ".join(h.ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
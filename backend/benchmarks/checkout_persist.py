@@ -0,0 +1,172 @@
+"""
+Đo phần ghi DB của place_order với N dòng sản phẩm.
+
+- orm_per_row: cách cũ, session.add(Order) + flush, đọc lại các dòng giỏ hàng,
+  session.add từng OrderItem, session.delete từng dòng giỏ hàng, flush + refresh(order)
+- fixed_statements: cách hiện tại, INSERT order ... RETURNING, 1 INSERT nhiều dòng order_item,
+  DELETE shopping_cart_item WHERE id = ANY(:ids)
+
+Mỗi lần đo chạy trong 1 transaction bị rollback (không để lại dữ liệu): dọn giỏ hàng của buyer,
+thêm N dòng giỏ hàng (không tính giờ) rồi đo phần ghi đơn. Cột statements = số câu SQL gửi tới Postgres.
+Cần DB đã có buyer kèm địa chỉ, carrier và sản phẩm có size (dữ liệu mẫu trong database.sql).
+
+    python -m benchmarks.checkout_persist --lines 10 --iterations 200
+"""
+import argparse
+import asyncio
+import time
+from decimal import Decimal
+
+from sqlalchemy import Integer, any_, delete, event, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.models import BuyerAddress, Carrier, Order, OrderItem, Product, ProductSize, ProductVariant, ShoppingCart, ShoppingCartItem
+from app.schemas.common import OrderStatus, PaymentStatus
+from ._common import make_session_factory, print_results, summarize
+
+
+async def _fixture(db, lines: int) -> dict:
+    """buyer + địa chỉ, carrier, N size của seller có nhiều size nhất"""
+    address = (await db.execute(select(BuyerAddress.buyer_id, BuyerAddress.buyer_address_id).limit(1))).one()
+    carrier_id = (await db.execute(select(Carrier.carrier_id).limit(1))).scalar_one()
+    seller_id = (await db.execute(
+        select(Product.seller_id)
+        .join(ProductVariant, ProductVariant.product_id == Product.product_id)
+        .join(ProductSize, ProductSize.variant_id == ProductVariant.variant_id)
+        .group_by(Product.seller_id)
+        .order_by(func.count(ProductSize.size_id).desc(), Product.seller_id)
+        .limit(1)
+    )).scalar_one()
+    sizes = (await db.execute(
+        select(Product.product_id, ProductVariant.variant_id, ProductSize.size_id, Product.base_price)
+        .join(ProductVariant, ProductVariant.product_id == Product.product_id)
+        .join(ProductSize, ProductSize.variant_id == ProductVariant.variant_id)
+        .where(Product.seller_id == seller_id)
+        .order_by(ProductSize.size_id)
+        .limit(lines)
+    )).all()
+    if len(sizes) < lines:
+        raise SystemExit(f"Seller {seller_id} chỉ có {len(sizes)} size, giảm --lines")
+    return {
+        "buyer_id": address.buyer_id,
+        "buyer_address_id": address.buyer_address_id,
+        "carrier_id": carrier_id,
+        "seller_id": seller_id,
+        "sizes": sizes,
+    }
+
+
+async def _prepare_cart(db, fx: dict) -> list[int]:
+    """Trong transaction đang mở: giỏ hàng của buyer chỉ còn N dòng của benchmark"""
+    cart_id = (await db.execute(
+        select(ShoppingCart.shopping_cart_id).where(ShoppingCart.buyer_id == fx["buyer_id"])
+    )).scalar_one_or_none()
+    if cart_id is None:
+        cart_id = (await db.execute(
+            insert(ShoppingCart).values(buyer_id=fx["buyer_id"]).returning(ShoppingCart.shopping_cart_id)
+        )).scalar_one()
+    await db.execute(delete(ShoppingCartItem).where(ShoppingCartItem.shopping_cart_id == cart_id))
+    return (await db.execute(
+        insert(ShoppingCartItem).returning(ShoppingCartItem.shopping_cart_item_id),
+        [
+            {"shopping_cart_id": cart_id, "product_id": s.product_id, "variant_id": s.variant_id,
+             "size_id": s.size_id, "quantity": 1}
+            for s in fx["sizes"]
+        ]
+    )).scalars().all()
+
+
+def _order_values(fx: dict) -> dict:
+    subtotal = sum(Decimal(s.base_price) for s in fx["sizes"])
+    return {
+        "buyer_id": fx["buyer_id"],
+        "seller_id": fx["seller_id"],
+        "buyer_address_id": fx["buyer_address_id"],
+        "carrier_id": fx["carrier_id"],
+        "payment_method": "cod",
+        "subtotal": subtotal,
+        "shipping_price": Decimal(0),
+        "discount_amount": Decimal(0),
+        "total_price": subtotal,
+        "order_status": OrderStatus.pending,
+        "payment_status": PaymentStatus.pending,
+    }
+
+
+async def orm_per_row(db, fx: dict, cart_item_ids: list[int]):
+    order = Order(**_order_values(fx))
+    db.add(order)
+    await db.flush()
+
+    items = (await db.execute(
+        select(ShoppingCartItem).where(ShoppingCartItem.shopping_cart_item_id.in_(cart_item_ids))
+    )).scalars().all()
+    prices = {s.size_id: Decimal(s.base_price) for s in fx["sizes"]}
+    for item in items:
+        db.add(OrderItem(
+            order_id=order.order_id, order_date=order.order_date,
+            product_id=item.product_id, variant_id=item.variant_id, size_id=item.size_id,
+            quantity=item.quantity, unit_price=prices[item.size_id], total_price=prices[item.size_id] * item.quantity
+        ))
+    for item in items:
+        await db.delete(item)
+    await db.flush()
+    await db.refresh(order)
+
+
+async def fixed_statements(db, fx: dict, cart_item_ids: list[int]):
+    order = (await db.execute(insert(Order).values(**_order_values(fx)).returning(Order))).scalar_one()
+    await db.execute(insert(OrderItem).values([
+        {
+            "order_id": order.order_id, "order_date": order.order_date,
+            "product_id": s.product_id, "variant_id": s.variant_id, "size_id": s.size_id,
+            "quantity": 1, "unit_price": s.base_price, "total_price": s.base_price
+        }
+        for s in fx["sizes"]
+    ]))
+    await db.execute(
+        delete(ShoppingCartItem)
+        .where(ShoppingCartItem.shopping_cart_item_id == any_(literal(cart_item_ids, ARRAY(Integer))))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def main(lines: int, iterations: int):
+    engine, Session = make_session_factory(1)
+    statements = {"count": 0}
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count(*_):
+        statements["count"] += 1
+
+    try:
+        async with Session() as db:
+            fx = await _fixture(db, lines)
+
+        results = {}
+        for name, persist in (("orm_per_row", orm_per_row), ("fixed_statements", fixed_statements)):
+            latencies, counted = [], 0
+            started_all = time.perf_counter()
+            for _ in range(iterations):
+                async with Session() as db:
+                    await db.begin()
+                    cart_item_ids = await _prepare_cart(db, fx)
+                    before = statements["count"]
+                    started = time.perf_counter()
+                    await persist(db, fx, cart_item_ids)
+                    latencies.append(time.perf_counter() - started)
+                    counted += statements["count"] - before
+                    await db.rollback()
+            results[name] = summarize(latencies, time.perf_counter() - started_all)
+            results[name]["statements"] = round(counted / iterations, 1)
+
+        print_results(f"Checkout persist: {lines} line(s), {iterations} iteration(s), rolled back", results)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.lines, args.iterations))
@@ -0,0 +1,113 @@
+"""
+Đo thời gian dùng lượt mã giảm giá khi nhiều đơn cùng dùng 1 mã.
+
+- db_row_lock: cách cũ, UPDATE discount SET used_count = used_count + 1 có điều kiện usage_limit
+  trong transaction đặt hàng -> dòng discount bị khoá tới lúc commit
+- redis_lua: discount_usage_service.redeem (Lua trên Redis, không khoá dòng discount)
+  + INSERT discount_usage_delta trong transaction như place_order
+
+Phần còn lại của transaction đặt hàng được mô phỏng bằng --hold-ms (sleep trước commit).
+usage_limit = orders - 10: mỗi phương án phải dùng đúng usage_limit lượt, lệch -> dừng với lỗi.
+--concurrency buyer cùng lúc (mặc định 1000) dùng chung pool --pool-size kết nối Postgres (mặc định 50,
+dưới max_connections = 100 mặc định của Postgres), giống app chạy với pool giới hạn: request chờ kết nối
+được tính vào thời gian.
+Tạo 1 mã tạm (BENCH-...) và key Redis prefix bench:, xoá sau khi chạy.
+
+    python -m benchmarks.discount_redeem --orders 2000 --concurrency 1000 --pool-size 50 --hold-ms 5
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import delete, insert, text
+from app.models import Discount
+from app.services.common.discount_usage_service import DiscountUsageService
+from ._common import make_redis, make_session_factory, print_results, run_concurrent
+
+
+class BenchDiscountUsage(DiscountUsageService):
+    KEY_USED = "bench:discount:used"
+
+
+async def main(orders: int, concurrency: int, pool_size: int, hold_ms: float):
+    engine, Session = make_session_factory(pool_size)
+    redis_client = make_redis()
+    usage = BenchDiscountUsage(redis_client)
+    usage_limit = max(orders - 10, 1)
+    hold = hold_ms / 1000
+
+    async with Session() as db:
+        discount_id = (await db.execute(
+            insert(Discount)
+            .values(
+                code=f"BENCH-{uuid.uuid4().hex[:12].upper()}",
+                discount_percent=10,
+                min_order_value=0,
+                start_date=date.today() - timedelta(days=1),
+                end_date=date.today() + timedelta(days=1),
+                usage_limit=usage_limit,
+                used_count=0,
+                is_active=False,
+            )
+            .returning(Discount.discount_id)
+        )).scalar_one()
+        await db.commit()
+
+    redeemed = {"db_row_lock": 0, "redis_lua": 0}
+
+    async def db_row_lock(_):
+        async with Session() as db:
+            row = (await db.execute(
+                text(
+                    "UPDATE discount SET used_count = used_count + 1 "
+                    "WHERE discount_id = :id AND (usage_limit IS NULL OR used_count < usage_limit) "
+                    "RETURNING used_count"
+                ),
+                {"id": discount_id}
+            )).first()
+            await asyncio.sleep(hold)
+            await db.commit()
+            if row is not None:
+                redeemed["db_row_lock"] += 1
+
+    async def redis_lua(_):
+        async with Session() as db:
+            if await usage.redeem(discount_id, usage_limit, 0):
+                await usage.queue_usage_deltas(db, [(discount_id, 1)])
+                redeemed["redis_lua"] += 1
+            else:
+                await db.execute(text("SELECT 1"))
+            await asyncio.sleep(hold)
+            await db.commit()
+
+    try:
+        results = {}
+        for name, worker in (("db_row_lock", db_row_lock), ("redis_lua", redis_lua)):
+            results[name] = await run_concurrent(worker, orders, concurrency)
+            results[name]["redeemed"] = redeemed[name]
+        print_results(
+            f"Discount redeem: {orders} orders, concurrency {concurrency}, pool {pool_size}, "
+            f"hold {hold_ms}ms, usage_limit {usage_limit}",
+            results
+        )
+        for name, count in redeemed.items():
+            if count != min(usage_limit, orders):
+                raise SystemExit(f"{name}: dùng {count} lượt, usage_limit {usage_limit}")
+    finally:
+        async with Session() as db:
+            await db.execute(delete(Discount).where(Discount.discount_id == discount_id))
+            await db.commit()
+        await redis_client.delete(usage.KEY_USED)
+        await redis_client.close()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--pool-size", type=int, default=50)
+    parser.add_argument("--hold-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.orders, args.concurrency, args.pool_size, args.hold_ms))
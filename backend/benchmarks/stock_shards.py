@@ -0,0 +1,89 @@
+"""
+Đo reserve_items trên 1 size "flash sale" khi chia tồn kho ra N shard.
+
+- shards=1: mọi request cùng trừ 1 key tồn kho
+- shards=N: trừ lần lượt qua N key shard, bắt đầu từ shard ngẫu nhiên
+
+Mỗi lượt đặt lại tồn kho = --stock, gửi --orders request (mỗi request lấy 1 sản phẩm) với --concurrency
+request cùng lúc, rồi kiểm tra không bán quá số tồn (số request thành công = min(stock, orders)).
+Dùng size_id giả, mọi key (tồn kho, shard, cấu hình shard, stream sự kiện) có prefix bench:, không đụng Postgres.
+Trên 1 node Redis, shard chỉ thêm round trip; lợi ích (tản hot key ra nhiều slot) chỉ thấy được khi chạy với Redis Cluster.
+
+    python -m benchmarks.stock_shards --shards 8 --orders 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+
+from app.services.common.inventory_service import InventoryService
+from ._common import make_redis, print_results, run_concurrent
+
+SIZE_ID = 999000001
+
+
+class BenchInventory(InventoryService):
+    """Tách key tồn kho, shard, cấu hình shard và stream sự kiện khỏi key thật"""
+    KEY_SHARDS = "bench:stock:shards"
+    KEY_STOCK_EVENTS = "bench:stock:events"
+
+    @staticmethod
+    def _stock_key(size_id: int) -> str:
+        return f"bench:stock_size:{size_id}"
+
+    @staticmethod
+    def _shard_key(size_id: int, index: int) -> str:
+        return f"bench:stock_size:{size_id}:s{index}"
+
+
+async def _cleanup(redis_client, max_shards: int):
+    await redis_client.delete(
+        BenchInventory.KEY_SHARDS,
+        BenchInventory.KEY_STOCK_EVENTS,
+        BenchInventory._stock_key(SIZE_ID),
+        *(BenchInventory._shard_key(SIZE_ID, k) for k in range(max_shards))
+    )
+
+
+async def run(redis_client, shards: int, stock: int, orders: int, concurrency: int) -> dict:
+    service = BenchInventory(redis_client)
+    await _cleanup(redis_client, shards)
+    await redis_client.set(BenchInventory._stock_key(SIZE_ID), stock)
+    if shards > 1:
+        # Key gốc đã có -> không cần db
+        await service.set_stock_shards(None, SIZE_ID, shards)
+
+    sold = 0
+
+    async def worker(_):
+        nonlocal sold
+        if not await service.reserve_items([(SIZE_ID, 1)]):
+            sold += 1
+
+    result = await run_concurrent(worker, orders, concurrency)
+    result["sold"] = sold
+    if sold != min(stock, orders):
+        raise SystemExit(f"shards={shards}: bán {sold}, tồn kho {stock}")
+    return result
+
+
+async def main(shards: int, stock: int, orders: int, concurrency: int):
+    redis_client = make_redis()
+    try:
+        results = {}
+        for n in sorted({1, shards}):
+            results[f"shards={n}"] = await run(redis_client, n, stock, orders, concurrency)
+        print_results(
+            f"Reserve 1 unit: stock={stock}, {orders} order(s), concurrency {concurrency}", results
+        )
+    finally:
+        await _cleanup(redis_client, shards)
+        await redis_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--stock", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.shards, args.stock, args.orders, args.concurrency))
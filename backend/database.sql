@@ -302,6 +302,40 @@ ALTER TABLE public.category ALTER COLUMN category_id ADD GENERATED BY DEFAULT AS
 );
 
 
+--
+-- Name: checkout; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.checkout (
+    checkout_id integer NOT NULL,
+    buyer_id integer NOT NULL,
+    payment_method public.payment_method_enum NOT NULL,
+    subtotal numeric(10,2) NOT NULL,
+    shipping_price numeric(10,2) DEFAULT 0 NOT NULL,
+    discount_amount numeric(10,2) DEFAULT 0 NOT NULL,
+    total_price numeric(10,2) NOT NULL,
+    discount_id integer,
+    created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT ck_checkout_total_logic CHECK ((total_price = ((subtotal + shipping_price) - discount_amount)))
+);
+
+
+ALTER TABLE public.checkout OWNER TO mywebsite;
+
+--
+-- Name: checkout_checkout_id_seq; Type: SEQUENCE; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public.checkout ALTER COLUMN checkout_id ADD GENERATED BY DEFAULT AS IDENTITY (
+    SEQUENCE NAME public.checkout_checkout_id_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1
+);
+
+
 --
 -- Name: discount; Type: TABLE; Schema: public; Owner: mywebsite
 --
@@ -316,7 +350,8 @@ CREATE TABLE public.discount (
     end_date date NOT NULL,
     usage_limit integer,
     used_count integer DEFAULT 0 NOT NULL,
-    is_active boolean DEFAULT true NOT NULL
+    is_active boolean DEFAULT true NOT NULL,
+    campaign character varying(100)
 );
 
 
@@ -336,6 +371,34 @@ ALTER TABLE public.discount ALTER COLUMN discount_id ADD GENERATED BY DEFAULT AS
 );
 
 
+--
+-- Name: discount_usage_delta; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.discount_usage_delta (
+    delta_id bigint NOT NULL,
+    discount_id integer NOT NULL,
+    delta integer NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+
+ALTER TABLE public.discount_usage_delta OWNER TO mywebsite;
+
+--
+-- Name: discount_usage_delta_delta_id_seq; Type: SEQUENCE; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public.discount_usage_delta ALTER COLUMN delta_id ADD GENERATED BY DEFAULT AS IDENTITY (
+    SEQUENCE NAME public.discount_usage_delta_delta_id_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1
+);
+
+
 --
 -- Name: order; Type: TABLE; Schema: public; Owner: mywebsite
 --
@@ -349,18 +412,48 @@ CREATE TABLE public."order" (
     shipping_price numeric(10,2) DEFAULT 0 NOT NULL,
     discount_amount numeric(10,2) DEFAULT 0 NOT NULL,
     total_price numeric(10,2) NOT NULL,
-    order_date timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    order_date timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL,
     delivery_date timestamp without time zone,
     order_status public.order_status_enum DEFAULT 'pending'::public.order_status_enum NOT NULL,
     payment_status public.payment_status_enum DEFAULT 'pending'::public.payment_status_enum NOT NULL,
     discount_id integer,
     carrier_id integer NOT NULL,
-    notes text
-);
+    notes text,
+    checkout_id integer,
+    seller_id integer NOT NULL
+)
+PARTITION BY RANGE (order_date);
 
 
 ALTER TABLE public."order" OWNER TO mywebsite;
 
+--
+-- Name: order_y2025m12; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.order_y2025m12 PARTITION OF public."order" FOR VALUES FROM ('2025-12-01 00:00:00') TO ('2026-01-01 00:00:00');
+
+
+ALTER TABLE public.order_y2025m12 OWNER TO mywebsite;
+
+--
+-- Name: order_y2026m01; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.order_y2026m01 PARTITION OF public."order" FOR VALUES FROM ('2026-01-01 00:00:00') TO ('2026-02-01 00:00:00');
+
+
+ALTER TABLE public.order_y2026m01 OWNER TO mywebsite;
+
+--
+-- Name: order_default; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.order_default PARTITION OF public."order" DEFAULT;
+
+
+ALTER TABLE public.order_default OWNER TO mywebsite;
+
 --
 -- Name: order_item; Type: TABLE; Schema: public; Owner: mywebsite
 --
@@ -373,32 +466,129 @@ CREATE TABLE public.order_item (
     size_id integer,
     quantity integer NOT NULL,
     unit_price numeric(10,2) NOT NULL,
-    total_price numeric(10,2) NOT NULL
-);
+    total_price numeric(10,2) NOT NULL,
+    product_name character varying(255),
+    variant_name character varying(100),
+    size_name character varying(20),
+    image_url character varying(500),
+    list_price numeric(10,2),
+    shop_name character varying(255),
+    order_date timestamp without time zone NOT NULL
+)
+PARTITION BY RANGE (order_date);
 
 
 ALTER TABLE public.order_item OWNER TO mywebsite;
 
+--
+-- Name: order_item_y2025m12; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.order_item_y2025m12 PARTITION OF public.order_item FOR VALUES FROM ('2025-12-01 00:00:00') TO ('2026-01-01 00:00:00');
+
+
+ALTER TABLE public.order_item_y2025m12 OWNER TO mywebsite;
+
+--
+-- Name: order_item_y2026m01; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.order_item_y2026m01 PARTITION OF public.order_item FOR VALUES FROM ('2026-01-01 00:00:00') TO ('2026-02-01 00:00:00');
+
+
+ALTER TABLE public.order_item_y2026m01 OWNER TO mywebsite;
+
+--
+-- Name: order_item_default; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.order_item_default PARTITION OF public.order_item DEFAULT;
+
+
+ALTER TABLE public.order_item_default OWNER TO mywebsite;
+
 --
 -- Name: order_item_order_item_id_seq; Type: SEQUENCE; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE public.order_item ALTER COLUMN order_item_id ADD GENERATED BY DEFAULT AS IDENTITY (
-    SEQUENCE NAME public.order_item_order_item_id_seq
+CREATE SEQUENCE public.order_item_order_item_id_seq
+    AS integer
     START WITH 1
     INCREMENT BY 1
     NO MINVALUE
     NO MAXVALUE
-    CACHE 1
-);
+    CACHE 1;
+
+
+ALTER SEQUENCE public.order_item_order_item_id_seq OWNER TO mywebsite;
+
+--
+-- Name: order_item_order_item_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: mywebsite
+--
+
+ALTER SEQUENCE public.order_item_order_item_id_seq OWNED BY public.order_item.order_item_id;
+
+
+--
+-- Name: order_item order_item_id; Type: DEFAULT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public.order_item ALTER COLUMN order_item_id SET DEFAULT nextval('public.order_item_order_item_id_seq'::regclass);
 
 
 --
 -- Name: order_order_id_seq; Type: SEQUENCE; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE public."order" ALTER COLUMN order_id ADD GENERATED BY DEFAULT AS IDENTITY (
-    SEQUENCE NAME public.order_order_id_seq
+CREATE SEQUENCE public.order_order_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+
+ALTER SEQUENCE public.order_order_id_seq OWNER TO mywebsite;
+
+--
+-- Name: order_order_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: mywebsite
+--
+
+ALTER SEQUENCE public.order_order_id_seq OWNED BY public."order".order_id;
+
+
+--
+-- Name: order order_id; Type: DEFAULT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public."order" ALTER COLUMN order_id SET DEFAULT nextval('public.order_order_id_seq'::regclass);
+
+
+--
+-- Name: outbox_message; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.outbox_message (
+    outbox_id bigint NOT NULL,
+    task_name character varying(255) NOT NULL,
+    args jsonb DEFAULT '[]'::jsonb NOT NULL,
+    kwargs jsonb DEFAULT '{}'::jsonb NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL,
+    published_at timestamp without time zone,
+    attempts integer DEFAULT 0 NOT NULL,
+    last_error text
+);
+
+
+ALTER TABLE public.outbox_message OWNER TO mywebsite;
+
+--
+-- Name: outbox_message_outbox_id_seq; Type: SEQUENCE; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public.outbox_message ALTER COLUMN outbox_id ADD GENERATED BY DEFAULT AS IDENTITY (
+    SEQUENCE NAME public.outbox_message_outbox_id_seq
     START WITH 1
     INCREMENT BY 1
     NO MINVALUE
@@ -655,6 +845,34 @@ ALTER TABLE public.shopping_cart ALTER COLUMN shopping_cart_id ADD GENERATED BY
 );
 
 
+--
+-- Name: stock_delta; Type: TABLE; Schema: public; Owner: mywebsite
+--
+
+CREATE TABLE public.stock_delta (
+    delta_id bigint NOT NULL,
+    size_id integer NOT NULL,
+    delta integer NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+
+ALTER TABLE public.stock_delta OWNER TO mywebsite;
+
+--
+-- Name: stock_delta_delta_id_seq; Type: SEQUENCE; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public.stock_delta ALTER COLUMN delta_id ADD GENERATED BY DEFAULT AS IDENTITY (
+    SEQUENCE NAME public.stock_delta_delta_id_seq
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1
+);
+
+
 --
 -- Data for Name: address; Type: TABLE DATA; Schema: public; Owner: mywebsite
 --
@@ -773,40 +991,40 @@ COPY public.discount (discount_id, code, discount_percent, min_order_value, max_
 -- Data for Name: order; Type: TABLE DATA; Schema: public; Owner: mywebsite
 --
 
-COPY public."order" (order_id, buyer_id, buyer_address_id, payment_method, subtotal, shipping_price, discount_amount, total_price, order_date, delivery_date, order_status, payment_status, discount_id, carrier_id, notes) FROM stdin;
-32	1	1	cod	189000.00	13780.00	0.00	202780.00	2026-01-04 09:39:01.742896	\N	processing	pending	\N	1	\N
-2	1	1	cod	210000.00	13760.00	21000.00	202760.00	2025-12-22 08:14:41.558677	2025-12-29 12:29:05.535055	delivered	paid	2	2	khong
-3	1	1	cod	239000.00	14320.00	23900.00	229420.00	2025-12-31 15:34:58.36119	\N	cancelled	failed	1	1	string
-4	1	1	cod	48300.00	12640.00	4830.00	56110.00	2025-12-31 16:03:42.911717	\N	cancelled	failed	1	1	string
-5	1	1	cod	48300.00	12640.00	4830.00	56110.00	2026-01-02 12:15:13.565391	2026-01-02 12:17:42.608482	delivered	paid	1	1	\N
-6	1	1	bank_transfer	1187000.00	37600.00	100000.00	1124600.00	2026-01-02 16:30:03.146113	2026-01-02 16:59:06.185287	delivered	paid	1	1	\N
-7	1	1	cod	322000.00	19280.00	32200.00	309080.00	2026-01-02 17:19:05.247571	2026-01-02 17:24:35.62047	delivered	paid	1	2	\N
-8	1	1	cod	75000.00	9260.00	0.00	84260.00	2026-01-02 17:30:16.937357	\N	pending	pending	\N	4	\N
-10	1	1	cod	157500.00	12720.00	0.00	170220.00	2026-01-03 02:43:21.130949	\N	pending	pending	\N	2	\N
-12	1	1	cod	187000.00	20080.00	0.00	207080.00	2026-01-03 02:47:11.665841	2026-01-03 03:04:04.867018	delivered	paid	\N	1	\N
-13	1	1	cod	135000.00	20020.00	0.00	155020.00	2026-01-03 03:10:48.909826	2026-01-03 03:12:44.082384	delivered	paid	\N	1	\N
-11	1	1	cod	499000.00	18160.00	0.00	517160.00	2026-01-03 02:44:32.805565	2026-01-03 03:26:40.760823	delivered	paid	\N	2	\N
-9	1	1	cod	505000.00	18520.00	0.00	523520.00	2026-01-02 17:32:09.246119	2026-01-03 03:28:12.78548	delivered	paid	\N	1	\N
-14	1	1	cod	738000.00	19010.00	73800.00	683210.00	2026-01-03 14:17:17.212759	\N	pending	pending	1	5	\N
-15	1	1	cod	499000.00	19240.00	49900.00	468340.00	2026-01-03 14:26:44.570271	\N	pending	pending	1	1	\N
-16	1	1	cod	322000.00	20920.00	0.00	342920.00	2026-01-03 14:46:11.537554	\N	pending	pending	\N	1	\N
-17	1	1	bank_transfer	389000.00	15650.00	0.00	404650.00	2026-01-03 14:57:39.530826	\N	pending	pending	\N	5	\N
-18	1	1	cod	499000.00	19240.00	0.00	518240.00	2026-01-03 15:25:56.878421	\N	pending	pending	\N	1	\N
-19	1	1	cod	499000.00	19240.00	0.00	518240.00	2026-01-03 15:49:01.800599	\N	pending	pending	\N	1	\N
-21	1	1	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 07:25:22.977335	\N	processing	pending	\N	1	\N
-20	1	1	cod	96600.00	15280.00	0.00	111880.00	2026-01-04 07:21:58.371537	\N	processing	pending	\N	1	\N
-22	1	1	cod	83220.00	14740.00	0.00	97960.00	2026-01-04 07:27:51.076387	\N	processing	pending	\N	1	\N
-23	1	1	cod	79380.00	11310.00	0.00	90690.00	2026-01-04 07:29:26.451882	\N	processing	pending	\N	5	\N
-24	1	1	cod	239000.00	14320.00	0.00	253320.00	2026-01-04 07:40:43.560314	\N	processing	pending	\N	1	\N
-25	1	1	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 08:34:45.667943	\N	cancelled	failed	\N	1	\N
-26	10	8	cod	239000.00	14320.00	0.00	253320.00	2026-01-04 08:37:35.09458	\N	pending	pending	\N	1	\N
-27	10	8	cod	89000.00	11440.00	0.00	100440.00	2026-01-04 08:43:02.045952	\N	pending	pending	\N	1	\N
-28	2	9	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 08:57:59.882778	\N	cancelled	failed	\N	1	\N
-29	2	9	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 09:00:33.96176	2026-01-04 09:01:25.399338	delivered	paid	\N	1	\N
-30	2	9	cod	322000.00	20920.00	0.00	342920.00	2026-01-04 09:04:20.950784	\N	cancelled	failed	\N	1	\N
-31	1	1	cod	189000.00	13780.00	0.00	202780.00	2026-01-04 09:23:27.076688	\N	processing	pending	\N	1	\N
-33	1	1	cod	738000.00	18580.00	73800.00	682780.00	2026-01-04 15:24:23.154832	\N	pending	pending	1	1	\N
-34	1	1	cod	145270.00	16060.00	14527.00	146803.00	2026-01-04 15:26:24.369283	\N	pending	pending	1	1	\N
+COPY public."order" (order_id, buyer_id, buyer_address_id, payment_method, subtotal, shipping_price, discount_amount, total_price, order_date, delivery_date, order_status, payment_status, discount_id, carrier_id, notes, seller_id) FROM stdin;
+32	1	1	cod	189000.00	13780.00	0.00	202780.00	2026-01-04 09:39:01.742896	\N	processing	pending	\N	1	\N	4
+2	1	1	cod	210000.00	13760.00	21000.00	202760.00	2025-12-22 08:14:41.558677	2025-12-29 12:29:05.535055	delivered	paid	2	2	khong	4
+3	1	1	cod	239000.00	14320.00	23900.00	229420.00	2025-12-31 15:34:58.36119	\N	cancelled	failed	1	1	string	4
+4	1	1	cod	48300.00	12640.00	4830.00	56110.00	2025-12-31 16:03:42.911717	\N	cancelled	failed	1	1	string	4
+5	1	1	cod	48300.00	12640.00	4830.00	56110.00	2026-01-02 12:15:13.565391	2026-01-02 12:17:42.608482	delivered	paid	1	1	\N	4
+6	1	1	bank_transfer	1187000.00	37600.00	100000.00	1124600.00	2026-01-02 16:30:03.146113	2026-01-02 16:59:06.185287	delivered	paid	1	1	\N	8
+7	1	1	cod	322000.00	19280.00	32200.00	309080.00	2026-01-02 17:19:05.247571	2026-01-02 17:24:35.62047	delivered	paid	1	2	\N	8
+8	1	1	cod	75000.00	9260.00	0.00	84260.00	2026-01-02 17:30:16.937357	\N	pending	pending	\N	4	\N	7
+10	1	1	cod	157500.00	12720.00	0.00	170220.00	2026-01-03 02:43:21.130949	\N	pending	pending	\N	2	\N	7
+12	1	1	cod	187000.00	20080.00	0.00	207080.00	2026-01-03 02:47:11.665841	2026-01-03 03:04:04.867018	delivered	paid	\N	1	\N	8
+13	1	1	cod	135000.00	20020.00	0.00	155020.00	2026-01-03 03:10:48.909826	2026-01-03 03:12:44.082384	delivered	paid	\N	1	\N	8
+11	1	1	cod	499000.00	18160.00	0.00	517160.00	2026-01-03 02:44:32.805565	2026-01-03 03:26:40.760823	delivered	paid	\N	2	\N	8
+9	1	1	cod	505000.00	18520.00	0.00	523520.00	2026-01-02 17:32:09.246119	2026-01-03 03:28:12.78548	delivered	paid	\N	1	\N	8
+14	1	1	cod	738000.00	19010.00	73800.00	683210.00	2026-01-03 14:17:17.212759	\N	pending	pending	1	5	\N	8
+15	1	1	cod	499000.00	19240.00	49900.00	468340.00	2026-01-03 14:26:44.570271	\N	pending	pending	1	1	\N	8
+16	1	1	cod	322000.00	20920.00	0.00	342920.00	2026-01-03 14:46:11.537554	\N	pending	pending	\N	1	\N	8
+17	1	1	bank_transfer	389000.00	15650.00	0.00	404650.00	2026-01-03 14:57:39.530826	\N	pending	pending	\N	5	\N	8
+18	1	1	cod	499000.00	19240.00	0.00	518240.00	2026-01-03 15:25:56.878421	\N	pending	pending	\N	1	\N	8
+19	1	1	cod	499000.00	19240.00	0.00	518240.00	2026-01-03 15:49:01.800599	\N	pending	pending	\N	1	\N	8
+21	1	1	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 07:25:22.977335	\N	processing	pending	\N	1	\N	4
+20	1	1	cod	96600.00	15280.00	0.00	111880.00	2026-01-04 07:21:58.371537	\N	processing	pending	\N	1	\N	4
+22	1	1	cod	83220.00	14740.00	0.00	97960.00	2026-01-04 07:27:51.076387	\N	processing	pending	\N	1	\N	4
+23	1	1	cod	79380.00	11310.00	0.00	90690.00	2026-01-04 07:29:26.451882	\N	processing	pending	\N	5	\N	4
+24	1	1	cod	239000.00	14320.00	0.00	253320.00	2026-01-04 07:40:43.560314	\N	processing	pending	\N	1	\N	4
+25	1	1	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 08:34:45.667943	\N	cancelled	failed	\N	1	\N	4
+26	10	8	cod	239000.00	14320.00	0.00	253320.00	2026-01-04 08:37:35.09458	\N	pending	pending	\N	1	\N	4
+27	10	8	cod	89000.00	11440.00	0.00	100440.00	2026-01-04 08:43:02.045952	\N	pending	pending	\N	1	\N	4
+28	2	9	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 08:57:59.882778	\N	cancelled	failed	\N	1	\N	4
+29	2	9	cod	180000.00	14380.00	0.00	194380.00	2026-01-04 09:00:33.96176	2026-01-04 09:01:25.399338	delivered	paid	\N	1	\N	4
+30	2	9	cod	322000.00	20920.00	0.00	342920.00	2026-01-04 09:04:20.950784	\N	cancelled	failed	\N	1	\N	8
+31	1	1	cod	189000.00	13780.00	0.00	202780.00	2026-01-04 09:23:27.076688	\N	processing	pending	\N	1	\N	4
+33	1	1	cod	738000.00	18580.00	73800.00	682780.00	2026-01-04 15:24:23.154832	\N	pending	pending	1	1	\N	8
+34	1	1	cod	145270.00	16060.00	14527.00	146803.00	2026-01-04 15:26:24.369283	\N	pending	pending	1	1	\N	5
 \.
 
 
@@ -814,43 +1032,43 @@ COPY public."order" (order_id, buyer_id, buyer_address_id, payment_method, subto
 -- Data for Name: order_item; Type: TABLE DATA; Schema: public; Owner: mywebsite
 --
 
-COPY public.order_item (order_item_id, order_id, product_id, variant_id, size_id, quantity, unit_price, total_price) FROM stdin;
-1	2	39	9	17	1	210000.00	210000.00
-2	3	38	7	8	1	239000.00	239000.00
-3	4	39	9	18	1	48300.00	48300.00
-4	5	39	10	21	1	48300.00	48300.00
-5	6	69	78	171	1	200000.00	200000.00
-6	6	67	80	174	1	322000.00	322000.00
-7	6	65	82	178	1	389000.00	389000.00
-8	6	64	83	180	1	276000.00	276000.00
-9	7	67	80	174	1	322000.00	322000.00
-10	8	58	30	36	1	75000.00	75000.00
-11	9	68	79	173	1	505000.00	505000.00
-12	10	61	85	182	1	157500.00	157500.00
-13	11	63	33	41	1	499000.00	499000.00
-14	12	62	32	38	1	187000.00	187000.00
-15	13	66	81	176	1	135000.00	135000.00
-16	14	71	74	167	1	738000.00	738000.00
-17	15	63	33	41	1	499000.00	499000.00
-18	16	67	80	174	1	322000.00	322000.00
-19	17	65	82	178	1	389000.00	389000.00
-20	18	63	33	41	1	499000.00	499000.00
-21	19	63	33	41	1	499000.00	499000.00
-22	20	39	9	17	2	48300.00	96600.00
-23	21	44	44	63	1	180000.00	180000.00
-24	22	43	47	66	1	83220.00	83220.00
-25	23	41	54	85	1	79380.00	79380.00
-26	24	38	7	9	1	239000.00	239000.00
-27	25	44	44	63	1	180000.00	180000.00
-28	26	38	7	10	1	239000.00	239000.00
-29	27	47	39	43	1	89000.00	89000.00
-30	28	44	44	63	1	180000.00	180000.00
-31	29	44	45	64	1	180000.00	180000.00
-32	30	67	80	174	1	322000.00	322000.00
-33	31	45	43	61	1	189000.00	189000.00
-34	32	45	43	61	1	189000.00	189000.00
-35	33	71	74	167	1	738000.00	738000.00
-36	34	34	64	129	1	145270.00	145270.00
+COPY public.order_item (order_item_id, order_id, product_id, variant_id, size_id, quantity, unit_price, total_price, order_date) FROM stdin;
+1	2	39	9	17	1	210000.00	210000.00	2025-12-22 08:14:41.558677
+2	3	38	7	8	1	239000.00	239000.00	2025-12-31 15:34:58.36119
+3	4	39	9	18	1	48300.00	48300.00	2025-12-31 16:03:42.911717
+4	5	39	10	21	1	48300.00	48300.00	2026-01-02 12:15:13.565391
+5	6	69	78	171	1	200000.00	200000.00	2026-01-02 16:30:03.146113
+6	6	67	80	174	1	322000.00	322000.00	2026-01-02 16:30:03.146113
+7	6	65	82	178	1	389000.00	389000.00	2026-01-02 16:30:03.146113
+8	6	64	83	180	1	276000.00	276000.00	2026-01-02 16:30:03.146113
+9	7	67	80	174	1	322000.00	322000.00	2026-01-02 17:19:05.247571
+10	8	58	30	36	1	75000.00	75000.00	2026-01-02 17:30:16.937357
+11	9	68	79	173	1	505000.00	505000.00	2026-01-02 17:32:09.246119
+12	10	61	85	182	1	157500.00	157500.00	2026-01-03 02:43:21.130949
+13	11	63	33	41	1	499000.00	499000.00	2026-01-03 02:44:32.805565
+14	12	62	32	38	1	187000.00	187000.00	2026-01-03 02:47:11.665841
+15	13	66	81	176	1	135000.00	135000.00	2026-01-03 03:10:48.909826
+16	14	71	74	167	1	738000.00	738000.00	2026-01-03 14:17:17.212759
+17	15	63	33	41	1	499000.00	499000.00	2026-01-03 14:26:44.570271
+18	16	67	80	174	1	322000.00	322000.00	2026-01-03 14:46:11.537554
+19	17	65	82	178	1	389000.00	389000.00	2026-01-03 14:57:39.530826
+20	18	63	33	41	1	499000.00	499000.00	2026-01-03 15:25:56.878421
+21	19	63	33	41	1	499000.00	499000.00	2026-01-03 15:49:01.800599
+22	20	39	9	17	2	48300.00	96600.00	2026-01-04 07:21:58.371537
+23	21	44	44	63	1	180000.00	180000.00	2026-01-04 07:25:22.977335
+24	22	43	47	66	1	83220.00	83220.00	2026-01-04 07:27:51.076387
+25	23	41	54	85	1	79380.00	79380.00	2026-01-04 07:29:26.451882
+26	24	38	7	9	1	239000.00	239000.00	2026-01-04 07:40:43.560314
+27	25	44	44	63	1	180000.00	180000.00	2026-01-04 08:34:45.667943
+28	26	38	7	10	1	239000.00	239000.00	2026-01-04 08:37:35.09458
+29	27	47	39	43	1	89000.00	89000.00	2026-01-04 08:43:02.045952
+30	28	44	44	63	1	180000.00	180000.00	2026-01-04 08:57:59.882778
+31	29	44	45	64	1	180000.00	180000.00	2026-01-04 09:00:33.96176
+32	30	67	80	174	1	322000.00	322000.00	2026-01-04 09:04:20.950784
+33	31	45	43	61	1	189000.00	189000.00	2026-01-04 09:23:27.076688
+34	32	45	43	61	1	189000.00	189000.00	2026-01-04 09:39:01.742896
+35	33	71	74	167	1	738000.00	738000.00	2026-01-04 15:24:23.154832
+36	34	34	64	129	1	145270.00	145270.00	2026-01-04 15:26:24.369283
 \.
 
 
@@ -1741,6 +1959,14 @@ ALTER TABLE ONLY public.category
     ADD CONSTRAINT category_pkey PRIMARY KEY (category_id);
 
 
+--
+-- Name: checkout checkout_pkey; Type: CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.checkout
+    ADD CONSTRAINT checkout_pkey PRIMARY KEY (checkout_id);
+
+
 --
 -- Name: discount discount_code_key; Type: CONSTRAINT; Schema: public; Owner: mywebsite
 --
@@ -1757,20 +1983,36 @@ ALTER TABLE ONLY public.discount
     ADD CONSTRAINT discount_pkey PRIMARY KEY (discount_id);
 
 
+--
+-- Name: discount_usage_delta discount_usage_delta_pkey; Type: CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.discount_usage_delta
+    ADD CONSTRAINT discount_usage_delta_pkey PRIMARY KEY (delta_id);
+
+
 --
 -- Name: order_item order_item_pkey; Type: CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public.order_item
-    ADD CONSTRAINT order_item_pkey PRIMARY KEY (order_item_id);
+ALTER TABLE public.order_item
+    ADD CONSTRAINT order_item_pkey PRIMARY KEY (order_item_id, order_date);
 
 
 --
 -- Name: order order_pkey; Type: CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public."order"
-    ADD CONSTRAINT order_pkey PRIMARY KEY (order_id);
+ALTER TABLE public."order"
+    ADD CONSTRAINT order_pkey PRIMARY KEY (order_id, order_date);
+
+
+--
+-- Name: outbox_message outbox_message_pkey; Type: CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.outbox_message
+    ADD CONSTRAINT outbox_message_pkey PRIMARY KEY (outbox_id);
 
 
 --
@@ -1853,6 +2095,14 @@ ALTER TABLE ONLY public.shopping_cart
     ADD CONSTRAINT shopping_cart_pkey PRIMARY KEY (shopping_cart_id);
 
 
+--
+-- Name: stock_delta stock_delta_pkey; Type: CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.stock_delta
+    ADD CONSTRAINT stock_delta_pkey PRIMARY KEY (delta_id);
+
+
 --
 -- Name: product_variant uq_product_variant_name; Type: CONSTRAINT; Schema: public; Owner: mywebsite
 --
@@ -1911,6 +2161,62 @@ CREATE INDEX idx_buyer_email ON public.buyer USING btree (email);
 CREATE INDEX idx_buyer_phone ON public.buyer USING btree (phone);
 
 
+--
+-- Name: idx_discount_campaign; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_discount_campaign ON public.discount USING btree (campaign) WHERE (campaign IS NOT NULL);
+
+
+--
+-- Name: idx_discount_usage_delta_discount; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_discount_usage_delta_discount ON public.discount_usage_delta USING btree (discount_id);
+
+
+--
+-- Name: idx_order_buyer_date; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_order_buyer_date ON public."order" USING btree (buyer_id, order_date DESC, order_id DESC);
+
+
+--
+-- Name: idx_order_item_order_id; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_order_item_order_id ON public.order_item USING btree (order_id, order_item_id);
+
+
+--
+-- Name: idx_order_pending_date; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_order_pending_date ON public."order" USING btree (order_date) WHERE (order_status = 'pending'::public.order_status_enum);
+
+
+--
+-- Name: idx_order_seller_date; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_order_seller_date ON public."order" USING btree (seller_id, order_date DESC);
+
+
+--
+-- Name: idx_order_seller_status_date; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_order_seller_status_date ON public."order" USING btree (seller_id, order_status, order_date DESC);
+
+
+--
+-- Name: idx_outbox_message_pending; Type: INDEX; Schema: public; Owner: mywebsite
+--
+
+CREATE INDEX idx_outbox_message_pending ON public.outbox_message USING btree (outbox_id) WHERE (published_at IS NULL);
+
+
 --
 -- Name: idx_product_size_variant_id; Type: INDEX; Schema: public; Owner: mywebsite
 --
@@ -1962,11 +2268,27 @@ ALTER TABLE ONLY public.buyer_address
     ADD CONSTRAINT buyer_address_buyer_id_fkey FOREIGN KEY (buyer_id) REFERENCES public.buyer(buyer_id) ON DELETE CASCADE;
 
 
+--
+-- Name: checkout checkout_buyer_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.checkout
+    ADD CONSTRAINT checkout_buyer_id_fkey FOREIGN KEY (buyer_id) REFERENCES public.buyer(buyer_id);
+
+
+--
+-- Name: checkout checkout_discount_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.checkout
+    ADD CONSTRAINT checkout_discount_id_fkey FOREIGN KEY (discount_id) REFERENCES public.discount(discount_id);
+
+
 --
 -- Name: order order_buyer_address_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public."order"
+ALTER TABLE public."order"
     ADD CONSTRAINT order_buyer_address_id_fkey FOREIGN KEY (buyer_address_id) REFERENCES public.buyer_address(buyer_address_id);
 
 
@@ -1974,7 +2296,7 @@ ALTER TABLE ONLY public."order"
 -- Name: order order_buyer_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public."order"
+ALTER TABLE public."order"
     ADD CONSTRAINT order_buyer_id_fkey FOREIGN KEY (buyer_id) REFERENCES public.buyer(buyer_id);
 
 
@@ -1982,31 +2304,55 @@ ALTER TABLE ONLY public."order"
 -- Name: order order_carrier_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public."order"
+ALTER TABLE public."order"
     ADD CONSTRAINT order_carrier_id_fkey FOREIGN KEY (carrier_id) REFERENCES public.carrier(carrier_id);
 
 
+--
+-- Name: order order_checkout_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public."order"
+    ADD CONSTRAINT order_checkout_id_fkey FOREIGN KEY (checkout_id) REFERENCES public.checkout(checkout_id);
+
+
+--
+-- Name: discount_usage_delta discount_usage_delta_discount_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.discount_usage_delta
+    ADD CONSTRAINT discount_usage_delta_discount_id_fkey FOREIGN KEY (discount_id) REFERENCES public.discount(discount_id) ON DELETE CASCADE;
+
+
 --
 -- Name: order order_discount_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public."order"
+ALTER TABLE public."order"
     ADD CONSTRAINT order_discount_id_fkey FOREIGN KEY (discount_id) REFERENCES public.discount(discount_id);
 
 
+--
+-- Name: order order_seller_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE public."order"
+    ADD CONSTRAINT order_seller_id_fkey FOREIGN KEY (seller_id) REFERENCES public.seller(seller_id);
+
+
 --
 -- Name: order_item order_item_order_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public.order_item
-    ADD CONSTRAINT order_item_order_id_fkey FOREIGN KEY (order_id) REFERENCES public."order"(order_id) ON DELETE CASCADE;
+ALTER TABLE public.order_item
+    ADD CONSTRAINT order_item_order_id_fkey FOREIGN KEY (order_id, order_date) REFERENCES public."order"(order_id, order_date) ON DELETE CASCADE;
 
 
 --
 -- Name: order_item order_item_product_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public.order_item
+ALTER TABLE public.order_item
     ADD CONSTRAINT order_item_product_id_fkey FOREIGN KEY (product_id) REFERENCES public.product(product_id);
 
 
@@ -2014,7 +2360,7 @@ ALTER TABLE ONLY public.order_item
 -- Name: order_item order_item_size_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public.order_item
+ALTER TABLE public.order_item
     ADD CONSTRAINT order_item_size_id_fkey FOREIGN KEY (size_id) REFERENCES public.product_size(size_id);
 
 
@@ -2022,7 +2368,7 @@ ALTER TABLE ONLY public.order_item
 -- Name: order_item order_item_variant_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
 --
 
-ALTER TABLE ONLY public.order_item
+ALTER TABLE public.order_item
     ADD CONSTRAINT order_item_variant_id_fkey FOREIGN KEY (variant_id) REFERENCES public.product_variant(variant_id);
 
 
@@ -2122,6 +2468,14 @@ ALTER TABLE ONLY public.shopping_cart_item
     ADD CONSTRAINT shopping_cart_item_variant_id_fkey FOREIGN KEY (variant_id) REFERENCES public.product_variant(variant_id) ON DELETE CASCADE;
 
 
+--
+-- Name: stock_delta stock_delta_size_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: mywebsite
+--
+
+ALTER TABLE ONLY public.stock_delta
+    ADD CONSTRAINT stock_delta_size_id_fkey FOREIGN KEY (size_id) REFERENCES public.product_size(size_id) ON DELETE CASCADE;
+
+
 --
 -- Name: pub_all; Type: PUBLICATION; Schema: -; Owner: mywebsite
 --
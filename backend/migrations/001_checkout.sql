@@ -0,0 +1,18 @@
+-- Tách 1 lần đặt hàng thành nhiều đơn theo seller: bảng checkout + order.checkout_id
+-- Chạy trên DB đã khởi tạo từ database.sql trước đó (DB mới đã có sẵn các thay đổi này).
+
+CREATE TABLE IF NOT EXISTS public.checkout (
+    checkout_id integer GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    buyer_id integer NOT NULL REFERENCES public.buyer(buyer_id),
+    payment_method public.payment_method_enum NOT NULL,
+    subtotal numeric(10,2) NOT NULL,
+    shipping_price numeric(10,2) DEFAULT 0 NOT NULL,
+    discount_amount numeric(10,2) DEFAULT 0 NOT NULL,
+    total_price numeric(10,2) NOT NULL,
+    discount_id integer REFERENCES public.discount(discount_id),
+    created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT ck_checkout_total_logic CHECK ((total_price = ((subtotal + shipping_price) - discount_amount)))
+);
+
+ALTER TABLE public."order"
+    ADD COLUMN IF NOT EXISTS checkout_id integer REFERENCES public.checkout(checkout_id);
@@ -0,0 +1,13 @@
+-- Lưu seller_id trực tiếp trên order để truy vấn phía seller không phải join order_item -> product.
+-- Chạy từng câu ngoài transaction (psql -f, không dùng -1) vì CREATE INDEX CONCURRENTLY.
+-- Điền seller_id cho các đơn cũ và đặt NOT NULL: migrations/010_order_seller_not_null.sql
+-- (phải chạy xong trước khi deploy code lọc đơn theo seller_id)
+
+ALTER TABLE public."order"
+    ADD COLUMN IF NOT EXISTS seller_id integer REFERENCES public.seller(seller_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_seller_status_date
+    ON public."order" USING btree (seller_id, order_status, order_date DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_seller_date
+    ON public."order" USING btree (seller_id, order_date DESC);
@@ -0,0 +1,8 @@
+-- Phân trang keyset cho trang "Đơn mua" của buyer và lấy item đầu tiên của mỗi đơn.
+-- Chạy từng câu ngoài transaction (psql -f, không dùng -1) vì CREATE INDEX CONCURRENTLY.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_buyer_date
+    ON public."order" USING btree (buyer_id, order_date DESC, order_id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_order_item_order_id
+    ON public.order_item USING btree (order_id, order_item_id);
@@ -0,0 +1,11 @@
+-- Snapshot thông tin sản phẩm trên order_item lúc đặt hàng (tên, phân loại, ảnh, giá gốc, shop).
+-- Sau khi chạy, điền snapshot cho các item cũ bằng job:
+--   celery -A app.utils.celery_client call orders.backfill_order_item_snapshot
+
+ALTER TABLE public.order_item
+    ADD COLUMN IF NOT EXISTS product_name character varying(255),
+    ADD COLUMN IF NOT EXISTS variant_name character varying(100),
+    ADD COLUMN IF NOT EXISTS size_name character varying(20),
+    ADD COLUMN IF NOT EXISTS image_url character varying(500),
+    ADD COLUMN IF NOT EXISTS list_price numeric(10,2),
+    ADD COLUMN IF NOT EXISTS shop_name character varying(255);
@@ -0,0 +1,16 @@
+-- Transactional outbox cho các task Celery phát sinh khi đơn hàng thay đổi.
+-- Relay: task outbox.relay (celery beat, mỗi OUTBOX_RELAY_INTERVAL_SECONDS giây).
+
+CREATE TABLE IF NOT EXISTS public.outbox_message (
+    outbox_id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    task_name character varying(255) NOT NULL,
+    args jsonb DEFAULT '[]'::jsonb NOT NULL,
+    kwargs jsonb DEFAULT '{}'::jsonb NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL,
+    published_at timestamp without time zone,
+    attempts integer DEFAULT 0 NOT NULL,
+    last_error text
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_message_pending
+    ON public.outbox_message USING btree (outbox_id) WHERE (published_at IS NULL);
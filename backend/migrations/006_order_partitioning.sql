@@ -0,0 +1,154 @@
+-- Chia "order" và order_item thành partition theo tháng của order_date (RANGE, mỗi tháng 1 partition).
+-- - Truy vấn có điều kiện order_date (dashboard theo tháng/năm, trang "Đơn mua") chỉ quét các partition liên quan
+-- - order_item lưu kèm order_date của đơn để partition cùng khoá với "order" (FK (order_id, order_date))
+-- - Khoá chính phải chứa khoá partition -> (order_id, order_date) / (order_item_id, order_date);
+--   order_id / order_item_id vẫn duy nhất nhờ sequence
+-- - Postgres 16 chưa cho identity trên bảng partition -> dùng sequence + DEFAULT nextval (giữ tên sequence cũ)
+-- - Partition DEFAULT chỉ để hứng dữ liệu ngoài khoảng; job orders.create_partitions tạo trước các tháng tới
+--   và chuyển dòng lỡ rơi vào DEFAULT sang đúng partition
+--
+-- Chạy 1 lần, trong 1 transaction (khoá ghi "order"/order_item trong lúc copy):
+--   psql -1 -f migrations/006_order_partitioning.sql
+-- Sau đó tạo partition các tháng tới và lưu trữ partition cũ bằng job:
+--   celery -A app.utils.celery_client call orders.create_partitions
+--   celery -A app.utils.celery_client call orders.archive_partitions
+
+LOCK TABLE public."order", public.order_item IN ACCESS EXCLUSIVE MODE;
+
+-- Khoá partition không được NULL
+UPDATE public."order" SET order_date = COALESCE(delivery_date, CURRENT_TIMESTAMP) WHERE order_date IS NULL;
+
+ALTER TABLE public.order_item RENAME TO order_item_legacy;
+ALTER TABLE public."order" RENAME TO order_legacy;
+
+-- Bỏ identity (xoá luôn sequence cũ) để tạo lại sequence cùng tên cho bảng mới
+ALTER TABLE public.order_item_legacy ALTER COLUMN order_item_id DROP IDENTITY IF EXISTS;
+ALTER TABLE public.order_legacy ALTER COLUMN order_id DROP IDENTITY IF EXISTS;
+
+CREATE TABLE public."order" (
+    order_id integer NOT NULL,
+    buyer_id integer NOT NULL,
+    buyer_address_id integer NOT NULL,
+    payment_method public.payment_method_enum NOT NULL,
+    subtotal numeric(10,2) NOT NULL,
+    shipping_price numeric(10,2) DEFAULT 0 NOT NULL,
+    discount_amount numeric(10,2) DEFAULT 0 NOT NULL,
+    total_price numeric(10,2) NOT NULL,
+    order_date timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    delivery_date timestamp without time zone,
+    order_status public.order_status_enum DEFAULT 'pending'::public.order_status_enum NOT NULL,
+    payment_status public.payment_status_enum DEFAULT 'pending'::public.payment_status_enum NOT NULL,
+    discount_id integer,
+    carrier_id integer NOT NULL,
+    notes text,
+    checkout_id integer,
+    seller_id integer
+)
+PARTITION BY RANGE (order_date);
+
+CREATE TABLE public.order_item (
+    order_item_id integer NOT NULL,
+    order_id integer NOT NULL,
+    product_id integer NOT NULL,
+    variant_id integer,
+    size_id integer,
+    quantity integer NOT NULL,
+    unit_price numeric(10,2) NOT NULL,
+    total_price numeric(10,2) NOT NULL,
+    product_name character varying(255),
+    variant_name character varying(100),
+    size_name character varying(20),
+    image_url character varying(500),
+    list_price numeric(10,2),
+    shop_name character varying(255),
+    order_date timestamp without time zone NOT NULL
+)
+PARTITION BY RANGE (order_date);
+
+CREATE SEQUENCE public.order_order_id_seq AS integer OWNED BY public."order".order_id;
+CREATE SEQUENCE public.order_item_order_item_id_seq AS integer OWNED BY public.order_item.order_item_id;
+ALTER TABLE public."order" ALTER COLUMN order_id SET DEFAULT nextval('public.order_order_id_seq'::regclass);
+ALTER TABLE public.order_item ALTER COLUMN order_item_id SET DEFAULT nextval('public.order_item_order_item_id_seq'::regclass);
+
+-- Partition cho mọi tháng đã có đơn tới hết tháng hiện tại + 3 tháng, và partition DEFAULT
+DO $$
+DECLARE
+    month_start timestamp;
+    last_month timestamp := date_trunc('month', CURRENT_TIMESTAMP) + interval '3 months';
+    suffix text;
+BEGIN
+    SELECT date_trunc('month', COALESCE(min(order_date), CURRENT_TIMESTAMP))
+    INTO month_start FROM public.order_legacy;
+
+    WHILE month_start <= last_month LOOP
+        suffix := to_char(month_start, '"y"YYYY"m"MM');
+        EXECUTE format(
+            'CREATE TABLE public.%I PARTITION OF public."order" FOR VALUES FROM (%L) TO (%L)',
+            'order_' || suffix, month_start, month_start + interval '1 month'
+        );
+        EXECUTE format(
+            'CREATE TABLE public.%I PARTITION OF public.order_item FOR VALUES FROM (%L) TO (%L)',
+            'order_item_' || suffix, month_start, month_start + interval '1 month'
+        );
+        month_start := month_start + interval '1 month';
+    END LOOP;
+END $$;
+
+CREATE TABLE public.order_default PARTITION OF public."order" DEFAULT;
+CREATE TABLE public.order_item_default PARTITION OF public.order_item DEFAULT;
+
+-- Copy dữ liệu (mỗi dòng tự vào đúng partition)
+INSERT INTO public."order" (
+    order_id, buyer_id, buyer_address_id, payment_method, subtotal, shipping_price, discount_amount,
+    total_price, order_date, delivery_date, order_status, payment_status, discount_id, carrier_id,
+    notes, checkout_id, seller_id
+)
+SELECT
+    order_id, buyer_id, buyer_address_id, payment_method, subtotal, shipping_price, discount_amount,
+    total_price, order_date, delivery_date, order_status, payment_status, discount_id, carrier_id,
+    notes, checkout_id, seller_id
+FROM public.order_legacy;
+
+INSERT INTO public.order_item (
+    order_item_id, order_id, product_id, variant_id, size_id, quantity, unit_price, total_price,
+    product_name, variant_name, size_name, image_url, list_price, shop_name, order_date
+)
+SELECT
+    i.order_item_id, i.order_id, i.product_id, i.variant_id, i.size_id, i.quantity, i.unit_price, i.total_price,
+    i.product_name, i.variant_name, i.size_name, i.image_url, i.list_price, i.shop_name, o.order_date
+FROM public.order_item_legacy i
+JOIN public.order_legacy o ON o.order_id = i.order_id;
+
+SELECT setval('public.order_order_id_seq', COALESCE((SELECT max(order_id) FROM public."order"), 0) + 1, false);
+SELECT setval('public.order_item_order_item_id_seq', COALESCE((SELECT max(order_item_id) FROM public.order_item), 0) + 1, false);
+
+-- Bảng cũ giữ tên constraint / index (toàn schema) -> xoá trước khi tạo lại trên bảng mới
+DROP TABLE public.order_item_legacy;
+DROP TABLE public.order_legacy;
+
+ALTER TABLE public."order" ADD CONSTRAINT order_pkey PRIMARY KEY (order_id, order_date);
+ALTER TABLE public.order_item ADD CONSTRAINT order_item_pkey PRIMARY KEY (order_item_id, order_date);
+
+ALTER TABLE public."order"
+    ADD CONSTRAINT order_buyer_address_id_fkey FOREIGN KEY (buyer_address_id) REFERENCES public.buyer_address(buyer_address_id),
+    ADD CONSTRAINT order_buyer_id_fkey FOREIGN KEY (buyer_id) REFERENCES public.buyer(buyer_id),
+    ADD CONSTRAINT order_carrier_id_fkey FOREIGN KEY (carrier_id) REFERENCES public.carrier(carrier_id),
+    ADD CONSTRAINT order_checkout_id_fkey FOREIGN KEY (checkout_id) REFERENCES public.checkout(checkout_id),
+    ADD CONSTRAINT order_discount_id_fkey FOREIGN KEY (discount_id) REFERENCES public.discount(discount_id),
+    ADD CONSTRAINT order_seller_id_fkey FOREIGN KEY (seller_id) REFERENCES public.seller(seller_id);
+
+ALTER TABLE public.order_item
+    ADD CONSTRAINT order_item_order_id_fkey FOREIGN KEY (order_id, order_date)
+        REFERENCES public."order"(order_id, order_date) ON DELETE CASCADE,
+    ADD CONSTRAINT order_item_product_id_fkey FOREIGN KEY (product_id) REFERENCES public.product(product_id),
+    ADD CONSTRAINT order_item_size_id_fkey FOREIGN KEY (size_id) REFERENCES public.product_size(size_id),
+    ADD CONSTRAINT order_item_variant_id_fkey FOREIGN KEY (variant_id) REFERENCES public.product_variant(variant_id);
+
+-- Index tạo trên bảng cha tự tạo cho mọi partition (không dùng được CONCURRENTLY trên bảng cha)
+CREATE INDEX idx_order_buyer_date ON public."order" USING btree (buyer_id, order_date DESC, order_id DESC);
+CREATE INDEX idx_order_seller_date ON public."order" USING btree (seller_id, order_date DESC);
+CREATE INDEX idx_order_seller_status_date ON public."order" USING btree (seller_id, order_status, order_date DESC);
+CREATE INDEX idx_order_item_order_id ON public.order_item USING btree (order_id, order_item_id);
+
+ANALYZE public."order";
+ANALYZE public.order_item;
@@ -0,0 +1,6 @@
+-- Index một phần cho job orders.expire_pending (tự huỷ đơn pending quá ORDER_PENDING_EXPIRE_HOURS giờ):
+-- chỉ chứa các đơn còn pending nên nhỏ, quét theo order_date tăng dần không đụng tới đơn đã xử lý.
+-- "order" là bảng partition -> tạo trên bảng cha (tự tạo cho mọi partition, không dùng được CONCURRENTLY).
+
+CREATE INDEX IF NOT EXISTS idx_order_pending_date
+    ON public."order" USING btree (order_date) WHERE (order_status = 'pending'::public.order_status_enum);
@@ -0,0 +1,7 @@
+-- Mã giảm giá sinh hàng loạt theo chiến dịch (POST /admin/discounts/bulk, task discounts.generate_codes).
+-- Mã có campaign được phát riêng cho từng người: không hiện trong danh sách mã công khai / gợi ý mã tốt nhất.
+
+ALTER TABLE public.discount ADD COLUMN IF NOT EXISTS campaign character varying(100);
+
+CREATE INDEX IF NOT EXISTS idx_discount_campaign
+    ON public.discount USING btree (campaign) WHERE (campaign IS NOT NULL);
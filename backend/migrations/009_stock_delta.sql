@@ -0,0 +1,14 @@
+-- Delta kho write-back ghi vào Postgres cùng transaction với đơn hàng (thay cho hash stock:dirty trên Redis).
+-- - Đặt / huỷ đơn chỉ INSERT thêm dòng (size_id, delta), không khoá dòng product_size đang nóng
+-- - Worker inventory.flush_stock_writeback: DELETE ... RETURNING 1 batch + UPDATE product_size theo net delta
+--   trong cùng 1 transaction -> mỗi delta được áp dụng đúng 1 lần kể cả khi worker chết giữa chừng
+--
+-- Trước khi deploy: để worker cũ flush hết stock:dirty / stock:dirty:flushing trên Redis
+-- (HLEN cả 2 key về 0), sau đó các key này không còn được dùng.
+
+CREATE TABLE IF NOT EXISTS public.stock_delta (
+    delta_id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    size_id integer NOT NULL REFERENCES public.product_size(size_id) ON DELETE CASCADE,
+    delta integer NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL
+);
@@ -0,0 +1,76 @@
+-- Điền seller_id cho các đơn tạo trước khi tách đơn theo seller (002) rồi đặt NOT NULL.
+-- Các truy vấn phía seller (danh sách / chi tiết đơn, export, chuyển trạng thái) lọc theo order.seller_id,
+-- đơn còn NULL sẽ biến mất khỏi trang seller -> phải chạy xong file này trước khi deploy code mới.
+-- - Đơn cũ có sản phẩm của nhiều seller -> gán cho seller của item đầu tiên và ghi vào bảng
+--   order_seller_backfill_review (các seller còn lại không thấy đơn này) để tách đơn / xử lý tay:
+--   SELECT * FROM public.order_seller_backfill_review ORDER BY order_id;
+-- - Batch 1000 đơn theo order_id tăng dần, commit từng batch (không khoá cả bảng order)
+-- - Còn đơn không xác định được seller (không có item) -> dừng với lỗi, không đặt NOT NULL
+--
+-- Chạy ngoài transaction (COMMIT trong DO block): psql -f migrations/010_order_seller_not_null.sql
+
+CREATE TABLE IF NOT EXISTS public.order_seller_backfill_review (
+    order_id integer NOT NULL,
+    order_date timestamp without time zone NOT NULL,
+    assigned_seller_id integer NOT NULL,
+    seller_ids integer[] NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL,
+    PRIMARY KEY (order_id, order_date)
+);
+
+DO $$
+DECLARE
+    last_id integer := 0;
+    batch_ids integer[];
+    multi_seller integer;
+    multi_seller_total integer := 0;
+BEGIN
+    LOOP
+        SELECT array_agg(order_id ORDER BY order_id) INTO batch_ids
+        FROM (
+            SELECT order_id FROM public."order"
+            WHERE seller_id IS NULL AND order_id > last_id
+            ORDER BY order_id
+            LIMIT 1000
+        ) batch;
+        EXIT WHEN batch_ids IS NULL;
+
+        UPDATE public."order" o
+        SET seller_id = first_item.seller_id
+        FROM (
+            SELECT DISTINCT ON (i.order_id) i.order_id, i.order_date, p.seller_id
+            FROM public.order_item i
+            JOIN public.product p ON p.product_id = i.product_id
+            WHERE i.order_id = ANY(batch_ids)
+            ORDER BY i.order_id, i.order_item_id
+        ) first_item
+        WHERE o.order_id = first_item.order_id AND o.order_date = first_item.order_date;
+
+        INSERT INTO public.order_seller_backfill_review (order_id, order_date, assigned_seller_id, seller_ids)
+        SELECT o.order_id, o.order_date, o.seller_id, array_agg(DISTINCT p.seller_id ORDER BY p.seller_id)
+        FROM public."order" o
+        JOIN public.order_item i ON i.order_id = o.order_id AND i.order_date = o.order_date
+        JOIN public.product p ON p.product_id = i.product_id
+        WHERE o.order_id = ANY(batch_ids)
+        GROUP BY o.order_id, o.order_date, o.seller_id
+        HAVING count(DISTINCT p.seller_id) > 1
+        ON CONFLICT DO NOTHING;
+        GET DIAGNOSTICS multi_seller = ROW_COUNT;
+        multi_seller_total := multi_seller_total + multi_seller;
+
+        last_id := batch_ids[array_length(batch_ids, 1)];
+        COMMIT;
+        RAISE NOTICE 'seller_id filled up to order #%', last_id;
+    END LOOP;
+
+    IF multi_seller_total > 0 THEN
+        RAISE NOTICE '% đơn có sản phẩm của nhiều seller, đã gán cho seller của item đầu tiên: xem public.order_seller_backfill_review',
+            multi_seller_total;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM public."order" WHERE seller_id IS NULL) THEN
+        RAISE EXCEPTION 'Còn đơn chưa xác định được seller_id, kiểm tra: SELECT order_id FROM public."order" WHERE seller_id IS NULL';
+    END IF;
+END $$;
+
+ALTER TABLE public."order" ALTER COLUMN seller_id SET NOT NULL;
@@ -0,0 +1,19 @@
+-- Lượt dùng mã giảm giá chờ ghi xuống discount.used_count, ghi vào Postgres cùng transaction với đơn hàng
+-- (thay cho hash discount:used:dirty / discount:used:flushing trên Redis).
+-- - Đặt đơn dùng mã: INSERT (discount_id, +1); huỷ đơn trả lượt: INSERT (discount_id, -1)
+-- - Worker discounts.settle_usage: DELETE ... RETURNING 1 batch + UPDATE discount theo net delta
+--   trong cùng 1 transaction -> mỗi lượt được ghi đúng 1 lần kể cả khi worker chết giữa chừng
+-- - Bộ đếm Redis discount:used nạp từ used_count + SUM(delta) còn chờ (index theo discount_id)
+--
+-- Trước khi deploy: để worker cũ settle hết discount:used:dirty / discount:used:flushing trên Redis
+-- (HLEN cả 2 key về 0), sau đó các key này không còn được dùng.
+
+CREATE TABLE IF NOT EXISTS public.discount_usage_delta (
+    delta_id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    discount_id integer NOT NULL REFERENCES public.discount(discount_id) ON DELETE CASCADE,
+    delta integer NOT NULL,
+    created_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_discount_usage_delta_discount
+    ON public.discount_usage_delta USING btree (discount_id);
@@ -11,6 +11,8 @@ export default function OrderTracking() {
   const navigate = useNavigate();
   const { user, setUser } = useUser();
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('all');
   const [searchQuery, setSearchQuery] = useState('');
@@ -184,10 +186,12 @@ export default function OrderTracking() {
       setLoading(true);
       const tabParam = activeTab === 'all' ? null : activeTab;
       const data = await api.order.getOrdersTracking(tabParam);
-      setOrders(data || []);
+      setOrders(data?.items || []);
+      setNextCursor(data?.has_more ? data.next_cursor : null);
     } catch (error) {
       console.error('Error loading orders:', error);
       setOrders([]);
+      setNextCursor(null);
       if (error.message.includes('401')) {
         navigate('/login');
       }
@@ -196,6 +200,21 @@ export default function OrderTracking() {
     }
   };
 
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const tabParam = activeTab === 'all' ? null : activeTab;
+      const data = await api.order.getOrdersTracking(tabParam, nextCursor);
+      setOrders(prev => [...prev, ...(data?.items || [])]);
+      setNextCursor(data?.has_more ? data.next_cursor : null);
+    } catch (error) {
+      console.error('Error loading more orders:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadOrderDetail = async (orderId) => {
     try {
       setDetailLoading(true);
@@ -720,6 +739,15 @@ export default function OrderTracking() {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  className="btn-load-more"
+                  onClick={loadMoreOrders}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Đang tải...' : 'Xem thêm đơn hàng'}
+                </button>
+              )}
             </div>
           )}
         </main>
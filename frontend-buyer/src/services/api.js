@@ -374,9 +374,9 @@ export const cartAPI = {
 };
 
 export const orderAPI = {
-  getOrdersTracking: (tab = null) => {
-    const params = tab ? `?tab=${tab}` : '';
-    return apiCall(`/buyer/orders/tracking${params}`);
+  getOrdersTracking: (tab = null, cursor = null, limit = 20) => {
+    const query = new URLSearchParams({ limit, ...(tab && { tab }), ...(cursor && { cursor }) });
+    return apiCall(`/buyer/orders/tracking?${query}`);
   },
   getOrders: (params = {}) => {
     const query = new URLSearchParams({ limit: params.limit || 10, offset: params.offset || 0, ...(params.status && { status: params.status }) });